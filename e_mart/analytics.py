@@ -10,13 +10,176 @@ from datetime import datetime, timedelta
 
 import frappe
 from frappe import _
-from frappe.utils import add_days, get_datetime, getdate
+from frappe.utils import add_days, add_months, flt, get_datetime, getdate
+
+from e_mart.cache import cached
+from e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup import get_rollup_totals
+
+BUCKET_SQL = {
+	"mariadb": {
+		"day": "{field}",
+		"week": "DATE_SUB({field}, INTERVAL WEEKDAY({field}) DAY)",
+		"month": "DATE_SUB({field}, INTERVAL (DAYOFMONTH({field}) - 1) DAY)",
+		"quarter": "MAKEDATE(YEAR({field}), 1) + INTERVAL (QUARTER({field}) - 1) QUARTER",
+	},
+	"postgres": {
+		"day": "{field}",
+		"week": "CAST(DATE_TRUNC('week', {field}) AS DATE)",
+		"month": "CAST(DATE_TRUNC('month', {field}) AS DATE)",
+		"quarter": "CAST(DATE_TRUNC('quarter', {field}) AS DATE)",
+	},
+}
+
+AGGREGATES = ("SUM", "COUNT", "AVG", "MIN", "MAX")
+
+# Doctypes whose changes invalidate cached dashboard data
+DASHBOARD_TAGS = ("Sales Invoice", "Purchase Invoice", "Payment Entry", "Bin", "Monthly Commission Log")
+
+
+class TimeBucketAggregator:
+	"""Single-query time bucketed aggregation with zero-filled buckets"""
+
+	@staticmethod
+	def bucket_start(date, bucket):
+		"""Get the first day of the bucket containing `date`"""
+		date = getdate(date)
+		if bucket == "day":
+			return date
+		if bucket == "week":
+			return add_days(date, -date.weekday())
+		if bucket == "month":
+			return date.replace(day=1)
+		if bucket == "quarter":
+			return date.replace(month=3 * ((date.month - 1) // 3) + 1, day=1)
+		frappe.throw(_("Unsupported time bucket: {0}").format(bucket))
+
+	@staticmethod
+	def next_bucket(date, bucket):
+		"""Get the first day of the bucket following the one starting at `date`"""
+		if bucket == "day":
+			return add_days(date, 1)
+		if bucket == "week":
+			return add_days(date, 7)
+		if bucket == "month":
+			return add_months(date, 1)
+		return add_months(date, 3)
+
+	@staticmethod
+	def get_buckets(from_date, to_date, bucket="month"):
+		"""
+		Get the start dates of every bucket between two dates
+
+		Args:
+			from_date: Period start
+			to_date: Period end
+			bucket (str): "day", "week", "month" or "quarter"
+
+		Returns:
+			list: Bucket start dates, oldest first
+		"""
+		buckets = []
+		current = TimeBucketAggregator.bucket_start(from_date, bucket)
+		to_date = getdate(to_date)
+		while current <= to_date:
+			buckets.append(current)
+			current = getdate(TimeBucketAggregator.next_bucket(current, bucket))
+		return buckets
+
+	@staticmethod
+	def aggregate(
+		doctype,
+		value_field="grand_total",
+		from_date=None,
+		to_date=None,
+		bucket="month",
+		aggregate="SUM",
+		date_field="posting_date",
+		filters=None,
+	):
+		"""
+		Aggregate a field per time bucket in one GROUP BY query
+
+		Args:
+			doctype (str): DocType to aggregate
+			value_field (str): Field to aggregate
+			from_date: Period start (defaults to the start of the current bucket)
+			to_date: Period end (defaults to today)
+			bucket (str): "day", "week", "month" or "quarter"
+			aggregate (str): One of SUM, COUNT, AVG, MIN, MAX
+			date_field (str): Date field used for bucketing
+			filters (dict): Additional equality filters (default: {"docstatus": 1})
+
+		Returns:
+			list: [{"bucket": date, "value": float}] for every bucket, oldest first
+		"""
+		to_date = getdate(to_date)
+		from_date = getdate(from_date) if from_date else TimeBucketAggregator.bucket_start(to_date, bucket)
+		aggregate = aggregate.upper()
+
+		if aggregate not in AGGREGATES:
+			frappe.throw(_("Unsupported aggregate: {0}").format(aggregate))
+
+		bucket_sql = BUCKET_SQL.get(frappe.db.db_type, BUCKET_SQL["mariadb"]).get(bucket)
+		if not bucket_sql:
+			frappe.throw(_("Unsupported time bucket: {0}").format(bucket))
+
+		if filters is None:
+			filters = {"docstatus": 1}
+
+		for field in (value_field, date_field, *filters):
+			if not field.isidentifier():
+				frappe.throw(_("Invalid field name: {0}").format(field))
+
+		conditions = [f"`{date_field}` BETWEEN %(from_date)s AND %(to_date)s"]
+		values = {"from_date": from_date, "to_date": to_date}
+		for index, (field, value) in enumerate(filters.items()):
+			conditions.append(f"`{field}` = %(filter_{index})s")
+			values[f"filter_{index}"] = value
+
+		rows = frappe.db.sql(
+			f"""
+			SELECT {bucket_sql.format(field=f"`{date_field}`")} as bucket,
+				{aggregate}(`{value_field}`) as value
+			FROM `tab{doctype}`
+			WHERE {" AND ".join(conditions)}
+			GROUP BY bucket
+		""",
+			values,
+			as_dict=True,
+		)
+
+		totals = {getdate(row.bucket): flt(row.value) for row in rows}
+		return [
+			{"bucket": start, "value": totals.get(start, 0.0)}
+			for start in TimeBucketAggregator.get_buckets(from_date, to_date, bucket)
+		]
+
+	@staticmethod
+	def last_months(doctype, months=12, value_field="grand_total", aggregate="SUM", filters=None):
+		"""
+		Aggregate the last `months` calendar months, including the current one
+
+		Returns:
+			list: [{"bucket": date, "value": float}], oldest first
+		"""
+		today = getdate()
+		from_date = add_months(today.replace(day=1), -(int(months) - 1))
+		return TimeBucketAggregator.aggregate(
+			doctype,
+			value_field=value_field,
+			from_date=from_date,
+			to_date=today,
+			bucket="month",
+			aggregate=aggregate,
+			filters=filters,
+		)
 
 
 class SalesAnalytics:
 	"""Sales analytics and reporting"""
 
 	@staticmethod
+	@cached(ttl=300, tags=("Sales Invoice", "Payment Entry"), stale_ttl=600)
 	def get_sales_summary(from_date=None, to_date=None):
 		"""Get sales summary for the period"""
 		if not from_date:
@@ -24,25 +187,18 @@ class SalesAnalytics:
 		if not to_date:
 			to_date = getdate()
 
-		# Get sales data
-		sales_data = frappe.db.sql(
-			"""
-			SELECT
-				COUNT(*) as total_invoices,
-				SUM(grand_total) as total_sales,
-				SUM(outstanding_amount) as outstanding_amount,
-				AVG(grand_total) as avg_invoice_value
-			FROM `tabSales Invoice`
-			WHERE posting_date BETWEEN %s AND %s
-			AND docstatus = 1
-		""",
-			(from_date, to_date),
-			as_dict=True,
-		)
+		# Read from the daily rollup instead of scanning the invoice table
+		totals = get_rollup_totals("Sales Invoice", from_date, to_date)
 
-		return sales_data[0] if sales_data else {}
+		return {
+			"total_invoices": totals.invoice_count,
+			"total_sales": totals.grand_total,
+			"outstanding_amount": totals.outstanding_amount,
+			"avg_invoice_value": totals.grand_total / totals.invoice_count if totals.invoice_count else 0,
+		}
 
 	@staticmethod
+	@cached(ttl=600, tags=("Sales Invoice",), stale_ttl=1800)
 	def get_emi_analytics():
 		"""Get EMI analytics"""
 		emi_data = frappe.db.sql(
@@ -61,6 +217,7 @@ class SalesAnalytics:
 		return emi_data[0] if emi_data else {}
 
 	@staticmethod
+	@cached(ttl=600, tags=("Sales Invoice",), stale_ttl=1800)
 	def get_top_customers(limit=10):
 		"""Get top customers by sales value"""
 		top_customers = frappe.db.sql(
@@ -87,6 +244,7 @@ class CommissionAnalytics:
 	"""Commission analytics and reporting"""
 
 	@staticmethod
+	@cached(ttl=600, tags=("Monthly Commission Log",), stale_ttl=1800)
 	def get_commission_summary(month=None, year=None):
 		"""Get commission summary for the month"""
 		if not month:
@@ -111,6 +269,7 @@ class CommissionAnalytics:
 		return commission_data[0] if commission_data else {}
 
 	@staticmethod
+	@cached(ttl=600, tags=("Monthly Commission Log",), stale_ttl=1800)
 	def get_top_performers(limit=10):
 		"""Get top performing employees by commission"""
 		top_performers = frappe.db.sql(
@@ -137,6 +296,7 @@ class InventoryAnalytics:
 	"""Inventory analytics and reporting"""
 
 	@staticmethod
+	@cached(ttl=300, tags=("Bin",), stale_ttl=600)
 	def get_stock_summary():
 		"""Get stock summary"""
 		stock_data = frappe.db.sql(
@@ -154,6 +314,7 @@ class InventoryAnalytics:
 		return stock_data[0] if stock_data else {}
 
 	@staticmethod
+	@cached(ttl=300, tags=("Bin",), stale_ttl=600)
 	def get_low_stock_items(threshold=10):
 		"""Get items with low stock"""
 		low_stock_items = frappe.db.sql(
@@ -178,6 +339,7 @@ class FinancialAnalytics:
 	"""Financial analytics and reporting"""
 
 	@staticmethod
+	@cached(ttl=300, tags=("Payment Entry",), stale_ttl=600)
 	def get_cash_flow_summary(from_date=None, to_date=None):
 		"""Get cash flow summary"""
 		if not from_date:
@@ -202,27 +364,22 @@ class FinancialAnalytics:
 		return cash_flow[0] if cash_flow else {}
 
 	@staticmethod
+	@cached(ttl=300, tags=("Sales Invoice", "Payment Entry"), stale_ttl=600)
 	def get_outstanding_summary():
 		"""Get outstanding amounts summary"""
-		outstanding = frappe.db.sql(
-			"""
-			SELECT
-				SUM(outstanding_amount) as total_outstanding,
-				COUNT(*) as outstanding_invoices
-			FROM `tabSales Invoice`
-			WHERE outstanding_amount > 0
-			AND docstatus = 1
-		""",
-			as_dict=True,
-		)
+		totals = get_rollup_totals("Sales Invoice")
 
-		return outstanding[0] if outstanding else {}
+		return {
+			"total_outstanding": totals.positive_outstanding,
+			"outstanding_invoices": totals.outstanding_count,
+		}
 
 
 class DashboardData:
 	"""Dashboard data provider"""
 
 	@staticmethod
+	@cached(ttl=300, tags=DASHBOARD_TAGS, stale_ttl=600, namespace="dashboard")
 	def get_dashboard_data():
 		"""Get comprehensive dashboard data"""
 		today = getdate()
@@ -242,28 +399,13 @@ class DashboardData:
 		}
 
 	@staticmethod
+	@cached(ttl=600, tags=("Sales Invoice",), stale_ttl=1800, namespace="dashboard")
 	def get_chart_data():
 		"""Get chart data for visualizations"""
-		# Last 12 months sales data
-		months = []
-		sales_data = []
-
-		for i in range(12):
-			date = getdate() - timedelta(days=30 * i)
-			month_start = date.replace(day=1)
-			month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-			sales = frappe.db.sql(
-				"""
-				SELECT SUM(grand_total) as total
-				FROM `tabSales Invoice`
-				WHERE posting_date BETWEEN %s AND %s
-				AND docstatus = 1
-			""",
-				(month_start, month_end),
-			)
-
-			months.append(date.strftime("%b %Y"))
-			sales_data.append(float(sales[0][0] or 0))
-
-		return {"months": months, "sales": sales_data}
+		# Last 12 months sales data, most recent month first
+		buckets = TimeBucketAggregator.last_months("Sales Invoice", 12)[::-1]
+
+		return {
+			"months": [row["bucket"].strftime("%b %Y") for row in buckets],
+			"sales": [row["value"] for row in buckets],
+		}
@@ -7,6 +7,12 @@ import frappe
 from frappe import _
 from frappe.utils import flt, getdate, nowdate, now, cint, validate_email_address
 
+from e_mart.cache import cached
+from e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup import get_rollup_totals
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+from e_mart.emi import EmiSchedule
+from e_mart.exporter import DataExporter, queue_export, should_run_in_background
+from e_mart.list_query import INVENTORY_ITEM_LIST, PURCHASE_INVOICE_LIST, SALES_INVOICE_LIST
 from e_mart.series_manager import SeriesManager
 
 
@@ -33,11 +39,7 @@ def get_e_mart_settings():
 def get_ui_config(settings=None):
 	"""Get UI configuration for theme customization"""
 	if not settings:
-		try:
-			doc = frappe.get_single("E-mart Settings")
-			settings = doc.as_dict()
-		except Exception:
-			settings = {}
+		settings = SettingsCache.get_all()
 	
 	return {
 		"theme": settings.get("ui_theme", "Auto"),
@@ -133,11 +135,7 @@ def log_user_action(log_entry):
 		log_entry = json.loads(log_entry)
 	
 	# Check if audit logging is enabled
-	try:
-		settings = frappe.get_single("E-mart Settings")
-		if not settings.get("enable_audit_log"):
-			return
-	except Exception:
+	if not SettingsCache.get_bool("enable_audit_log"):
 		return
 	
 	try:
@@ -177,8 +175,14 @@ def register_push_subscription(subscription):
 
 
 @frappe.whitelist()
-def export_data(doctype, filters=None, fields=None, format="Excel"):
-	"""Export data in various formats"""
+def export_data(doctype, filters=None, fields=None, format="Excel", background=0):
+	"""
+	Export data in various formats (Excel, CSV, JSON, NDJSON)
+
+	Small exports are streamed back as a file download, except JSON which
+	returns {"data": [...], "format": "json"}; large ones (or background=1)
+	are queued and report progress via get_export_status.
+	"""
 	try:
 		if isinstance(filters, str):
 			filters = json.loads(filters)
@@ -190,15 +194,17 @@ def export_data(doctype, filters=None, fields=None, format="Excel"):
 		if not frappe.has_permission(doctype, "read"):
 			frappe.throw(_("Not permitted to export {0}").format(doctype))
 		
-		# Get data
-		data = frappe.get_all(doctype, filters=filters, fields=fields or ["*"], limit=1000)
-		
-		if format.lower() == "excel":
-			# Return data for frontend processing
-			return {"data": data, "format": "excel"}
-		else:
-			# Return JSON data
-			return {"data": data, "format": "json"}
+		DataExporter.get_format(format)
+		DataExporter.get_fields(doctype, fields)
+
+		if should_run_in_background(doctype, filters, background):
+			job_id = queue_export(doctype, filters, fields, format)
+			return {"status": "queued", "job_id": job_id}
+
+		if format.lower() == "json":
+			return DataExporter.export_to_json(doctype, filters, fields)
+
+		return DataExporter.export_to_response(doctype, filters, fields, format)
 		
 	except Exception as e:
 		frappe.log_error(f"Failed to export data: {str(e)}")
@@ -209,9 +215,8 @@ def export_data(doctype, filters=None, fields=None, format="Excel"):
 def validate_password_strength(password):
 	"""Validate password strength against settings"""
 	try:
-		settings = frappe.get_single("E-mart Settings")
-		min_length = settings.get("min_password_length", 8)
-		require_special = settings.get("require_special_characters", 1)
+		min_length = SettingsCache.get_int("min_password_length", 8)
+		require_special = SettingsCache.get_bool("require_special_characters", True)
 		
 		errors = []
 		
@@ -288,6 +293,17 @@ def get_emi_schedule(sales_invoice):
 		return {"status": "error", "message": str(e)}
 
 
+@frappe.whitelist()
+def get_emi_projection(months=12, from_date=None, company=None):
+	"""Get EMI receivables falling due per month of the invoices the user can read"""
+	frappe.has_permission("Sales Invoice", "read", throw=True)
+	try:
+		return {"status": "success", "data": EmiSchedule.project_receivables(from_date, months, company)}
+	except Exception as e:
+		frappe.log_error(f"EMI projection error: {e!s}")
+		return {"status": "error", "message": str(e)}
+
+
 @frappe.whitelist()
 def create_sales_invoice_api(customer, items, emi_schedule=False, emi_duration=None):
 	"""Create sales invoice via API"""
@@ -504,42 +520,11 @@ def reset_series(series_type, start_number):
 
 
 @frappe.whitelist()
-def get_purchase_invoices(filters=None):
-	"""Get purchase invoices with filters"""
+def get_purchase_invoices(filters=None, fields=None, cursor=None, limit=None):
+	"""Get purchase invoices with filters, paginated by `next_cursor`"""
 	try:
-		if filters:
-			filters = json.loads(filters)
-		else:
-			filters = {}
-
-		# Build query
-		conditions = []
-		if filters.get("supplier"):
-			conditions.append(f"supplier = '{filters['supplier']}'")
-		if filters.get("from_date"):
-			conditions.append(f"posting_date >= '{filters['from_date']}'")
-		if filters.get("to_date"):
-			conditions.append(f"posting_date <= '{filters['to_date']}'")
-		if filters.get("status"):
-			conditions.append(f"status = '{filters['status']}'")
-
-		where_clause = " AND ".join(conditions) if conditions else "1=1"
-
-		# Get invoices
-		invoices = frappe.db.sql(
-			f"""
-            SELECT
-                name, supplier, posting_date, grand_total, status,
-                series_number, purchase_category, special_purchase_scheme
-            FROM `tabPurchase Invoice`
-            WHERE {where_clause}
-            ORDER BY posting_date DESC
-            LIMIT 50
-        """,
-			as_dict=True,
-		)
-
-		return {"success": True, "data": invoices}
+		page = PURCHASE_INVOICE_LIST.run(filters, fields=fields, cursor=cursor, limit=limit)
+		return {"success": True, **page}
 	except Exception as e:
 		frappe.log_error(f"Get purchase invoices error: {e!s}")
 		return {"success": False, "data": []}
@@ -550,28 +535,7 @@ def create_purchase_invoice(data):
 	"""Create new purchase invoice"""
 	try:
 		data = json.loads(data) if isinstance(data, str) else data
-
-		# Create purchase invoice
-		doc = frappe.new_doc("Purchase Invoice")
-		doc.supplier = data.get("supplier")
-		doc.posting_date = data.get("posting_date", nowdate())
-		doc.purchase_category = data.get("purchase_category", "Normal")
-		doc.special_purchase_scheme = data.get("special_purchase_scheme")
-
-		# Add items
-		for item in data.get("items", []):
-			doc.append(
-				"items",
-				{
-					"item_code": item.get("item_code"),
-					"qty": item.get("qty"),
-					"rate": item.get("rate"),
-					"amount": flt(item.get("qty", 0)) * flt(item.get("rate", 0)),
-				},
-			)
-
-		doc.insert()
-		doc.submit()
+		doc = make_purchase_invoice(data)
 
 		return {"success": True, "data": {"name": doc.name, "series_number": doc.series_number}}
 	except Exception as e:
@@ -579,42 +543,37 @@ def create_purchase_invoice(data):
 		return {"success": False, "message": str(e)}
 
 
-@frappe.whitelist()
-def get_sales_invoices(filters=None):
-	"""Get sales invoices with filters"""
-	try:
-		if filters:
-			filters = json.loads(filters)
-		else:
-			filters = {}
+def make_purchase_invoice(data):
+	"""Insert and submit a purchase invoice from API data, raising on failure"""
+	doc = frappe.new_doc("Purchase Invoice")
+	doc.supplier = data.get("supplier")
+	doc.posting_date = data.get("posting_date", nowdate())
+	doc.purchase_category = data.get("purchase_category", "Normal")
+	doc.special_purchase_scheme = data.get("special_purchase_scheme")
 
-		# Build query
-		conditions = []
-		if filters.get("customer"):
-			conditions.append(f"customer = '{filters['customer']}'")
-		if filters.get("from_date"):
-			conditions.append(f"posting_date >= '{filters['from_date']}'")
-		if filters.get("to_date"):
-			conditions.append(f"posting_date <= '{filters['to_date']}'")
-		if filters.get("status"):
-			conditions.append(f"status = '{filters['status']}'")
-
-		where_clause = " AND ".join(conditions) if conditions else "1=1"
-
-		# Get invoices
-		invoices = frappe.db.sql(
-			f"""
-            SELECT
-                name, customer, posting_date, grand_total, status
-            FROM `tabSales Invoice`
-            WHERE {where_clause}
-            ORDER BY posting_date DESC
-            LIMIT 50
-        """,
-			as_dict=True,
+	# Add items
+	for item in data.get("items", []):
+		doc.append(
+			"items",
+			{
+				"item_code": item.get("item_code"),
+				"qty": item.get("qty"),
+				"rate": item.get("rate"),
+				"amount": flt(item.get("qty", 0)) * flt(item.get("rate", 0)),
+			},
 		)
 
-		return {"success": True, "data": invoices}
+	doc.insert()
+	doc.submit()
+	return doc
+
+
+@frappe.whitelist()
+def get_sales_invoices(filters=None, fields=None, cursor=None, limit=None):
+	"""Get sales invoices with filters, paginated by `next_cursor`"""
+	try:
+		page = SALES_INVOICE_LIST.run(filters, fields=fields, cursor=cursor, limit=limit)
+		return {"success": True, **page}
 	except Exception as e:
 		frappe.log_error(f"Get sales invoices error: {e!s}")
 		return {"success": False, "data": []}
@@ -625,26 +584,7 @@ def create_sales_invoice(data):
 	"""Create new sales invoice"""
 	try:
 		data = json.loads(data) if isinstance(data, str) else data
-
-		# Create sales invoice
-		doc = frappe.new_doc("Sales Invoice")
-		doc.customer = data.get("customer")
-		doc.posting_date = data.get("posting_date", nowdate())
-
-		# Add items
-		for item in data.get("items", []):
-			doc.append(
-				"items",
-				{
-					"item_code": item.get("item_code"),
-					"qty": item.get("qty"),
-					"rate": item.get("rate"),
-					"amount": flt(item.get("qty", 0)) * flt(item.get("rate", 0)),
-				},
-			)
-
-		doc.insert()
-		doc.submit()
+		doc = make_sales_invoice(data)
 
 		return {"success": True, "data": {"name": doc.name}}
 	except Exception as e:
@@ -652,43 +592,35 @@ def create_sales_invoice(data):
 		return {"success": False, "message": str(e)}
 
 
-@frappe.whitelist()
-def get_inventory_items(filters=None):
-	"""Get inventory items with filters"""
-	try:
-		if filters:
-			filters = json.loads(filters)
-		else:
-			filters = {}
+def make_sales_invoice(data):
+	"""Insert and submit a sales invoice from API data, raising on failure"""
+	doc = frappe.new_doc("Sales Invoice")
+	doc.customer = data.get("customer")
+	doc.posting_date = data.get("posting_date", nowdate())
 
-		# Build query
-		conditions = ["is_stock_item = 1"]
-		if filters.get("item_group"):
-			conditions.append(f"item_group = '{filters['item_group']}'")
-		if filters.get("brand"):
-			conditions.append(f"brand = '{filters['brand']}'")
-		if filters.get("search"):
-			search_term = f"%{filters['search']}%"
-			conditions.append(f"(item_name LIKE '{search_term}' OR item_code LIKE '{search_term}')")
-
-		where_clause = " AND ".join(conditions)
-
-		# Get items
-		items = frappe.db.sql(
-			f"""
-            SELECT
-                item_code, item_name, item_group, brand,
-                stock_uom, actual_qty, reserved_qty,
-                (actual_qty - reserved_qty) as available_qty
-            FROM `tabItem`
-            WHERE {where_clause}
-            ORDER BY item_name
-            LIMIT 100
-        """,
-			as_dict=True,
+	# Add items
+	for item in data.get("items", []):
+		doc.append(
+			"items",
+			{
+				"item_code": item.get("item_code"),
+				"qty": item.get("qty"),
+				"rate": item.get("rate"),
+				"amount": flt(item.get("qty", 0)) * flt(item.get("rate", 0)),
+			},
 		)
 
-		return {"success": True, "data": items}
+	doc.insert()
+	doc.submit()
+	return doc
+
+
+@frappe.whitelist()
+def get_inventory_items(filters=None, fields=None, cursor=None, limit=None):
+	"""Get inventory items with filters, paginated by `next_cursor`"""
+	try:
+		page = INVENTORY_ITEM_LIST.run(filters, fields=fields, cursor=cursor, limit=limit)
+		return {"success": True, **page}
 	except Exception as e:
 		frappe.log_error(f"Get inventory items error: {e!s}")
 		return {"success": False, "data": []}
@@ -886,47 +818,7 @@ def auto_save_series_settings(data):
 def get_dashboard_analytics():
 	"""Get analytics data for dashboard"""
 	try:
-		# Sales analytics
-		today = getdate()
-		this_month_start = today.replace(day=1)
-		
-		sales_today = frappe.db.sql("""
-			SELECT COUNT(*) as count, SUM(grand_total) as total
-			FROM `tabSales Invoice`
-			WHERE DATE(posting_date) = %s AND docstatus = 1
-		""", (today,), as_dict=True)[0]
-		
-		sales_this_month = frappe.db.sql("""
-			SELECT COUNT(*) as count, SUM(grand_total) as total
-			FROM `tabSales Invoice`
-			WHERE posting_date >= %s AND docstatus = 1
-		""", (this_month_start,), as_dict=True)[0]
-		
-		# Purchase analytics
-		purchases_today = frappe.db.sql("""
-			SELECT COUNT(*) as count, SUM(grand_total) as total
-			FROM `tabPurchase Invoice`
-			WHERE DATE(posting_date) = %s AND docstatus = 1
-		""", (today,), as_dict=True)[0]
-		
-		return {
-			"sales": {
-				"today": {
-					"count": sales_today.get("count", 0),
-					"total": flt(sales_today.get("total", 0))
-				},
-				"this_month": {
-					"count": sales_this_month.get("count", 0),
-					"total": flt(sales_this_month.get("total", 0))
-				}
-			},
-			"purchases": {
-				"today": {
-					"count": purchases_today.get("count", 0),
-					"total": flt(purchases_today.get("total", 0))
-				}
-			}
-		}
+		return get_dashboard_analytics_data()
 	except Exception as e:
 		frappe.log_error(f"Failed to get dashboard analytics: {str(e)}")
 		return {}
@@ -1083,66 +975,100 @@ def update_app_settings(settings):
 
 
 @frappe.whitelist()
-def sync_offline_data(offline_data):
-	"""Sync offline data"""
+def sync_offline_data(offline_data, device_id=None, background=0):
+	"""
+	Sync offline data
+
+	Each record is created at most once per idempotency key; records sent
+	without a key or client timestamp are synced without deduplication. Large
+	batches are queued; their results can be fetched with
+	`e_mart.offline_sync.get_sync_results`.
+	"""
+	from e_mart.offline_sync import BACKGROUND_THRESHOLD, OfflineSyncEngine
+
 	try:
 		offline_data = json.loads(offline_data) if isinstance(offline_data, str) else offline_data
 
-		synced_count = 0
-
-		for data_item in offline_data:
-			try:
-				if data_item.get("type") == "purchase_invoice":
-					# Create purchase invoice from offline data
-					create_purchase_invoice(data_item.get("data"))
-					synced_count += 1
-				elif data_item.get("type") == "sales_invoice":
-					# Create sales invoice from offline data
-					create_sales_invoice(data_item.get("data"))
-					synced_count += 1
-			except Exception as e:
-				frappe.log_error(f"Sync item error: {e!s}")
-				continue
-
-		return {"success": True, "message": f"Synced {synced_count} items successfully"}
+		if cint(background) or len(offline_data) > BACKGROUND_THRESHOLD:
+			frappe.enqueue(
+				"e_mart.offline_sync.run_sync_job",
+				queue="long",
+				records=offline_data,
+				device_id=device_id,
+				user=frappe.session.user,
+			)
+			keys = [OfflineSyncEngine.get_idempotency_key(record, device_id) for record in offline_data]
+			return {"success": True, "queued": True, "idempotency_keys": keys}
+
+		results = OfflineSyncEngine.sync(offline_data, device_id)
+		synced_count = sum(1 for result in results.values() if result["status"] in ("Synced", "Duplicate"))
+
+		return {
+			"success": bool(synced_count) or not results,
+			"message": f"Synced {synced_count} of {len(results)} items",
+			"results": results,
+		}
 	except Exception as e:
 		frappe.log_error(f"Sync offline data error: {e!s}")
 		return {"success": False, "message": str(e)}
 
 
 # Helper functions
+@cached(ttl=120, tags=("Sales Invoice", "Purchase Invoice", "Payment Entry"), stale_ttl=300, namespace="dashboard")
+def get_dashboard_analytics_data():
+	"""Today's and this month's invoice totals from the daily rollup"""
+	# Sales analytics
+	today = getdate()
+	this_month_start = today.replace(day=1)
+
+	sales_today = get_rollup_totals("Sales Invoice", today, today)
+	sales_this_month = get_rollup_totals("Sales Invoice", this_month_start, today)
+
+	# Purchase analytics
+	purchases_today = get_rollup_totals("Purchase Invoice", today, today)
+
+	return {
+		"sales": {
+			"today": {
+				"count": sales_today.invoice_count,
+				"total": sales_today.grand_total
+			},
+			"this_month": {
+				"count": sales_this_month.invoice_count,
+				"total": sales_this_month.grand_total
+			}
+		},
+		"purchases": {
+			"today": {
+				"count": purchases_today.invoice_count,
+				"total": purchases_today.grand_total
+			}
+		}
+	}
+
+
 def get_total_sales():
 	"""Get total sales amount"""
-	result = frappe.db.sql("""
-        SELECT COALESCE(SUM(grand_total), 0)
-        FROM `tabSales Invoice`
-        WHERE docstatus = 1
-    """)
-	return flt(result[0][0]) if result else 0
+	return get_rollup_totals("Sales Invoice").grand_total
 
 
 def get_total_purchases():
 	"""Get total purchases amount"""
-	result = frappe.db.sql("""
-        SELECT COALESCE(SUM(grand_total), 0)
-        FROM `tabPurchase Invoice`
-        WHERE docstatus = 1
-    """)
-	return flt(result[0][0]) if result else 0
+	return get_rollup_totals("Purchase Invoice").grand_total
 
 
 def get_total_invoices():
 	"""Get total invoice count"""
-	sales_count = frappe.db.count("Sales Invoice", filters={"docstatus": 1})
-	purchase_count = frappe.db.count("Purchase Invoice", filters={"docstatus": 1})
-	return sales_count + purchase_count
+	return get_rollup_totals("Sales Invoice").invoice_count + get_rollup_totals("Purchase Invoice").invoice_count
 
 
+@cached(ttl=900, stale_ttl=1800, namespace="dashboard")
 def get_total_items():
 	"""Get total items count"""
 	return frappe.db.count("Item", filters={"is_stock_item": 1})
 
 
+@cached(ttl=120, tags=("Sales Invoice", "Purchase Invoice"), stale_ttl=300, namespace="dashboard")
 def get_recent_activity():
 	"""Get recent activity"""
 	activities = []
@@ -1193,50 +1119,20 @@ def get_recent_activity():
 	return activities
 
 
+@cached(ttl=600, tags=("Sales Invoice",), stale_ttl=1800, namespace="dashboard")
 def get_sales_chart_data():
 	"""Get sales chart data for last 6 months"""
-	data = []
-	for i in range(6):
-		date = datetime.now() - timedelta(days=30 * i)
-		month_start = date.replace(day=1)
-		month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-		result = frappe.db.sql(
-			"""
-            SELECT COALESCE(SUM(grand_total), 0)
-            FROM `tabSales Invoice`
-            WHERE docstatus = 1
-            AND posting_date BETWEEN %s AND %s
-        """,
-			(month_start.date(), month_end.date()),
-		)
-
-		data.append(flt(result[0][0]) if result else 0)
+	from .analytics import TimeBucketAggregator
 
-	return data[::-1]  # Reverse to show oldest first
+	return [row["value"] for row in TimeBucketAggregator.last_months("Sales Invoice", 6)]
 
 
+@cached(ttl=600, tags=("Purchase Invoice",), stale_ttl=1800, namespace="dashboard")
 def get_purchase_chart_data():
 	"""Get purchase chart data for last 6 months"""
-	data = []
-	for i in range(6):
-		date = datetime.now() - timedelta(days=30 * i)
-		month_start = date.replace(day=1)
-		month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-		result = frappe.db.sql(
-			"""
-            SELECT COALESCE(SUM(grand_total), 0)
-            FROM `tabPurchase Invoice`
-            WHERE docstatus = 1
-            AND posting_date BETWEEN %s AND %s
-        """,
-			(month_start.date(), month_end.date()),
-		)
-
-		data.append(flt(result[0][0]) if result else 0)
+	from .analytics import TimeBucketAggregator
 
-	return data[::-1]  # Reverse to show oldest first
+	return [row["value"] for row in TimeBucketAggregator.last_months("Purchase Invoice", 6)]
 
 
 def get_current_series(series_type):
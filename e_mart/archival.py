@@ -0,0 +1,484 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Log archival module for E Mart app
+Moves old log documents together with their child rows out of the live
+tables in small primary-key batches, into archive tables or gzipped NDJSON
+files, and restores them on demand
+"""
+
+import glob
+import gzip
+import json
+import os
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, getdate, now_datetime
+
+BATCH_SIZE = 500
+THROTTLE_SECONDS = 0.2
+TARGETS = ("table", "ndjson")
+
+# {doctype: extra condition on `doc` selecting the rows that may be archived}
+ARCHIVE_POLICIES = {
+	"Monthly Commission Log": "doc.docstatus != 0",
+	# Pending debit notes are still being worked on
+	"Debit Note Log": "doc.status != 'Pending'",
+}
+
+# {doctype: [(downstream doctype, condition matching its rows to the log)]}.
+# Logs are only archived once every downstream document is cancelled, so
+# Journal Entries and Additional Salaries never point at a missing log.
+# Additional Salaries carry no log reference, so they match by employee and month.
+DOWNSTREAM_LINKS = {
+	"Monthly Commission Log": [
+		(
+			"Additional Salary",
+			"downstream.employee = doc.employee"
+			" AND downstream.payroll_date BETWEEN doc.start_date AND doc.end_date",
+		),
+	],
+	"Debit Note Log": [("Journal Entry", "downstream.name = doc.jv_reference")],
+}
+
+# {doctype: fields whose values stay looked up after archival}, e.g. so a
+# Purchase Invoice never gets a second Debit Note Log once its first is archived
+TOMBSTONE_FIELDS = {
+	"Debit Note Log": ("purchase_invoice",),
+}
+TOMBSTONE_TABLE = "_em_archive_keys"
+
+
+class LogArchiver:
+	"""Batched archival and restore of log documents"""
+
+	@staticmethod
+	def get_archive_table(doctype):
+		"""Archive table of a doctype; outside the `tab` namespace so trim-tables leaves it alone"""
+		return f"_em_archive_{frappe.scrub(doctype)}"
+
+	@staticmethod
+	def get_child_doctypes(doctype):
+		"""Child doctypes of a parent, once each"""
+		return list(dict.fromkeys(df.options for df in frappe.get_meta(doctype).get_table_fields()))
+
+	@staticmethod
+	def get_schema():
+		"""SQL expression of the site's own schema, so other sites' tables are never matched"""
+		return "DATABASE()" if frappe.db.db_type != "postgres" else "current_schema()"
+
+	@staticmethod
+	def get_columns(table):
+		"""Column names of a table"""
+		return frappe.db.sql_list(
+			f"""
+			SELECT column_name FROM information_schema.columns
+			WHERE table_schema = {LogArchiver.get_schema()} AND table_name = %s
+			ORDER BY ordinal_position
+		""",
+			table,
+		)
+
+	@staticmethod
+	def table_exists(table):
+		"""Whether a table exists in the site's schema"""
+		return bool(
+			frappe.db.sql(
+				f"""
+				SELECT 1 FROM information_schema.tables
+				WHERE table_schema = {LogArchiver.get_schema()} AND table_name = %s
+			""",
+				table,
+			)
+		)
+
+	@staticmethod
+	def ensure_archive_table(doctype):
+		"""
+		Create the archive table of a doctype, or add columns the live table gained since
+
+		Returns:
+			list: Columns shared by the live and archive tables
+		"""
+		source = f"tab{doctype}"
+		archive = LogArchiver.get_archive_table(doctype)
+
+		if frappe.db.db_type == "postgres":
+			frappe.db.sql_ddl(f'CREATE TABLE IF NOT EXISTS "{archive}" (LIKE "{source}" INCLUDING DEFAULTS)')
+		else:
+			frappe.db.sql_ddl(f"CREATE TABLE IF NOT EXISTS `{archive}` LIKE `{source}`")
+
+		source_columns = LogArchiver.get_columns(source)
+		archive_columns = set(LogArchiver.get_columns(archive))
+		text_type = "TEXT" if frappe.db.db_type == "postgres" else "LONGTEXT"
+		for column in source_columns:
+			if column not in archive_columns:
+				frappe.db.sql_ddl(f"ALTER TABLE `{archive}` ADD COLUMN `{column}` {text_type}")
+
+		return source_columns
+
+	@staticmethod
+	def get_conditions(doctype):
+		"""
+		Conditions on `doc` selecting the archivable rows of a doctype
+
+		Downstream doctypes that are not installed, e.g. Additional Salary
+		without HRMS, cannot reference a log and are left out.
+		"""
+		conditions = [ARCHIVE_POLICIES[doctype]] if ARCHIVE_POLICIES.get(doctype) else []
+		for downstream, match in DOWNSTREAM_LINKS.get(doctype, ()):
+			if not frappe.db.table_exists(downstream):
+				continue
+			conditions.append(
+				f"""NOT EXISTS (
+					SELECT 1 FROM `tab{downstream}` downstream WHERE {match} AND downstream.docstatus != 2
+				)"""
+			)
+		return conditions
+
+	@staticmethod
+	def get_batch(doctype, cutoff, after, batch_size):
+		"""Names of the next batch of archivable documents, by primary key"""
+		conditions = ["doc.name > %(after)s", "doc.creation < %(cutoff)s"]
+		conditions += LogArchiver.get_conditions(doctype)
+		return frappe.db.sql_list(
+			f"""
+			SELECT doc.name FROM `tab{doctype}` doc
+			WHERE {" AND ".join(conditions)}
+			ORDER BY doc.name
+			LIMIT %(limit)s
+		""",
+			{"after": after, "cutoff": cutoff, "limit": cint(batch_size)},
+		)
+
+	@staticmethod
+	def archive(
+		doctype, days=90, target="table", batch_size=BATCH_SIZE, throttle=THROTTLE_SECONDS, dry_run=False
+	):
+		"""
+		Archive documents older than `days`
+
+		Every batch copies the parents and their child rows, deletes them from
+		the live tables and commits, so locks are held for one batch only.
+
+		Args:
+			doctype (str): A doctype of ARCHIVE_POLICIES
+			days (int): Archive documents created more than this many days ago
+			target (str): "table" or "ndjson"
+			batch_size (int): Documents per transaction
+			throttle (float): Seconds to sleep between batches
+			dry_run (bool): Only count the documents that would be archived
+
+		Returns:
+			dict: {"doctype", "archived", "batches", "target"}
+		"""
+		if doctype not in ARCHIVE_POLICIES:
+			frappe.throw(_("{0} has no archive policy").format(doctype))
+		if target not in TARGETS:
+			frappe.throw(_("Archive target must be one of {0}").format(", ".join(TARGETS)))
+
+		cutoff = add_days(now_datetime(), -cint(days))
+		children = LogArchiver.get_child_doctypes(doctype)
+		summary = {"doctype": doctype, "archived": 0, "batches": 0, "target": target}
+
+		if target == "table" and not dry_run:
+			columns = {dt: LogArchiver.ensure_archive_table(dt) for dt in [doctype, *children]}
+		if doctype in TOMBSTONE_FIELDS and not dry_run:
+			LogArchiver.ensure_tombstone_table()
+		run_id = now_datetime().strftime("%Y%m%d%H%M%S")
+
+		after = ""
+		while True:
+			names = LogArchiver.get_batch(doctype, cutoff, after, batch_size)
+			if not names:
+				break
+			after = names[-1]
+
+			if not dry_run:
+				if target == "table":
+					LogArchiver.copy_to_tables(doctype, children, names, columns)
+				else:
+					LogArchiver.write_ndjson(doctype, children, names, run_id, summary["batches"])
+				LogArchiver.write_tombstones(doctype, names)
+				LogArchiver.delete_rows(doctype, children, names)
+				frappe.db.commit()
+				time.sleep(flt(throttle))
+
+			summary["archived"] += len(names)
+			summary["batches"] += 1
+
+		frappe.logger().info(f"E Mart archival: {summary}")
+		return summary
+
+	@staticmethod
+	def copy_to_tables(doctype, children, names, columns):
+		"""Copy a batch of parents and their child rows into the archive tables"""
+		for dt, key in [(doctype, "name"), *[(child, "parent") for child in children]]:
+			column_list = ", ".join(f"`{column}`" for column in columns[dt])
+			condition = "`parenttype` = %(parenttype)s AND " if key == "parent" else ""
+			frappe.db.sql(
+				f"""
+				INSERT INTO `{LogArchiver.get_archive_table(dt)}` ({column_list})
+				SELECT {column_list} FROM `tab{dt}`
+				WHERE {condition}`{key}` IN %(names)s
+			""",
+				{"names": tuple(names), "parenttype": doctype},
+			)
+
+	@staticmethod
+	def write_ndjson(doctype, children, names, run_id, batch):
+		"""
+		Write a batch as one gzipped NDJSON file, one document per line
+
+		The file is flushed to disk before the rows are deleted.
+		"""
+		rows = {}
+		for child in children:
+			for row in frappe.db.sql(
+				f"SELECT * FROM `tab{child}` WHERE parenttype = %s AND parent IN %s ORDER BY parent, idx",
+				(doctype, tuple(names)),
+				as_dict=True,
+			):
+				rows.setdefault(row.parent, {}).setdefault(child, []).append(row)
+
+		directory = frappe.get_site_path("private", "archives", frappe.scrub(doctype))
+		os.makedirs(directory, exist_ok=True)
+		path = os.path.join(directory, f"{run_id}-{batch:05d}.ndjson.gz")
+
+		with open(path, "wb") as raw:
+			with gzip.open(raw, "wt") as file:
+				for doc in frappe.db.sql(
+					f"SELECT * FROM `tab{doctype}` WHERE name IN %s ORDER BY name",
+					(tuple(names),),
+					as_dict=True,
+				):
+					record = {"doctype": doctype, "doc": doc, "children": rows.get(doc.name, {})}
+					file.write(json.dumps(record, default=str) + "\n")
+			raw.flush()
+			os.fsync(raw.fileno())
+
+		return path
+
+	@staticmethod
+	def delete_rows(doctype, children, names):
+		"""Delete a batch of parents and their child rows from the live tables"""
+		for child in children:
+			frappe.db.sql(
+				f"DELETE FROM `tab{child}` WHERE parenttype = %s AND parent IN %s", (doctype, tuple(names))
+			)
+		frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE name IN %s", (tuple(names),))
+
+	@staticmethod
+	def ensure_tombstone_table():
+		"""
+		Create the table of values that archived documents held in TOMBSTONE_FIELDS
+
+		Runs on install and migrate, so `is_archived` can query the table
+		without checking that it exists.
+		"""
+		frappe.db.sql_ddl(
+			f"""
+			CREATE TABLE IF NOT EXISTS `{TOMBSTONE_TABLE}` (
+				`doctype` VARCHAR(140) NOT NULL,
+				`fieldname` VARCHAR(140) NOT NULL,
+				`value` VARCHAR(140) NOT NULL,
+				`docname` VARCHAR(140) NOT NULL,
+				PRIMARY KEY (`doctype`, `fieldname`, `value`, `docname`)
+			)
+		"""
+		)
+
+	@staticmethod
+	def write_tombstones(doctype, names):
+		"""Record the TOMBSTONE_FIELDS values of a batch before it leaves the live table"""
+		for fieldname in TOMBSTONE_FIELDS.get(doctype, ()):
+			frappe.db.sql(
+				f"""
+				INSERT INTO `{TOMBSTONE_TABLE}` (`doctype`, `fieldname`, `value`, `docname`)
+				SELECT %(doctype)s, %(fieldname)s, `{fieldname}`, name FROM `tab{doctype}`
+				WHERE name IN %(names)s AND `{fieldname}` IS NOT NULL AND `{fieldname}` != ''
+			""",
+				{"doctype": doctype, "fieldname": fieldname, "names": tuple(names)},
+			)
+
+	@staticmethod
+	def backfill_tombstones():
+		"""Record tombstones of documents archived to tables before tombstones were kept"""
+		LogArchiver.ensure_tombstone_table()
+		for doctype, fieldnames in TOMBSTONE_FIELDS.items():
+			archive = LogArchiver.get_archive_table(doctype)
+			if not LogArchiver.table_exists(archive):
+				continue
+			for fieldname in fieldnames:
+				insert, on_conflict = (
+					("INSERT", "ON CONFLICT DO NOTHING")
+					if frappe.db.db_type == "postgres"
+					else ("INSERT IGNORE", "")
+				)
+				frappe.db.sql(
+					f"""
+					{insert} INTO `{TOMBSTONE_TABLE}` (`doctype`, `fieldname`, `value`, `docname`)
+					SELECT %(doctype)s, %(fieldname)s, `{fieldname}`, name FROM `{archive}`
+					WHERE `{fieldname}` IS NOT NULL AND `{fieldname}` != ''
+					{on_conflict}
+				""",
+					{"doctype": doctype, "fieldname": fieldname},
+				)
+
+	@staticmethod
+	def delete_tombstones(doctype, names):
+		"""Drop the tombstones of documents that are back in the live table"""
+		if doctype not in TOMBSTONE_FIELDS or not names:
+			return
+		frappe.db.sql(
+			f"DELETE FROM `{TOMBSTONE_TABLE}` WHERE `doctype` = %s AND `docname` IN %s",
+			(doctype, tuple(names)),
+		)
+
+	@staticmethod
+	def is_archived(doctype, fieldname, value):
+		"""
+		Whether an archived document of `doctype` had `value` in `fieldname`
+
+		Only fields of TOMBSTONE_FIELDS are tracked. Called on every Purchase
+		Invoice submit, so it is a single primary-key lookup: the tombstone
+		table is created on install and migrate, and documents archived before
+		tombstones were kept are backfilled by a patch.
+		"""
+		if fieldname not in TOMBSTONE_FIELDS.get(doctype, ()):
+			return False
+
+		return bool(
+			frappe.db.sql(
+				f"""
+				SELECT 1 FROM `{TOMBSTONE_TABLE}`
+				WHERE `doctype` = %s AND `fieldname` = %s AND `value` = %s
+				LIMIT 1
+			""",
+				(doctype, fieldname, value),
+			)
+		)
+
+	@staticmethod
+	def restore(doctype, names=None, from_date=None, to_date=None, batch_size=BATCH_SIZE):
+		"""
+		Move documents back from the archive tables
+
+		Args:
+			doctype (str): Archived doctype
+			names (list): Documents to restore (default: all matching the dates)
+			from_date: First creation date (optional)
+			to_date: Last creation date (optional)
+			batch_size (int): Documents per transaction
+
+		Returns:
+			int: Number of documents restored
+		"""
+		archive = LogArchiver.get_archive_table(doctype)
+		if not LogArchiver.table_exists(archive):
+			frappe.throw(_("{0} has no archive table").format(doctype))
+
+		conditions = ["name > %(after)s"]
+		values = {"after": "", "limit": cint(batch_size)}
+		if names:
+			conditions.append("name IN %(names)s")
+			values["names"] = tuple(names)
+		if from_date:
+			conditions.append("creation >= %(from_date)s")
+			values["from_date"] = getdate(from_date)
+		if to_date:
+			conditions.append("creation < %(to_date)s")
+			values["to_date"] = add_days(getdate(to_date), 1)
+
+		children = LogArchiver.get_child_doctypes(doctype)
+		live_columns = {dt: set(LogArchiver.get_columns(f"tab{dt}")) for dt in [doctype, *children]}
+
+		restored = 0
+		while True:
+			batch = frappe.db.sql_list(
+				f"SELECT name FROM `{archive}` WHERE {' AND '.join(conditions)} ORDER BY name LIMIT %(limit)s",
+				values,
+			)
+			if not batch:
+				break
+			values["after"] = batch[-1]
+
+			for dt, key in [(doctype, "name"), *[(child, "parent") for child in children]]:
+				source = LogArchiver.get_archive_table(dt)
+				columns = [column for column in LogArchiver.get_columns(source) if column in live_columns[dt]]
+				column_list = ", ".join(f"`{column}`" for column in columns)
+				condition = "`parenttype` = %(parenttype)s AND " if key == "parent" else ""
+				params = {"names": tuple(batch), "parenttype": doctype}
+				frappe.db.sql(
+					f"""
+					INSERT INTO `tab{dt}` ({column_list})
+					SELECT {column_list} FROM `{source}`
+					WHERE {condition}`{key}` IN %(names)s
+				""",
+					params,
+				)
+				frappe.db.sql(f"DELETE FROM `{source}` WHERE {condition}`{key}` IN %(names)s", params)
+
+			LogArchiver.delete_tombstones(doctype, batch)
+			frappe.db.commit()
+			restored += len(batch)
+
+		return restored
+
+	@staticmethod
+	def restore_files(path):
+		"""
+		Restore documents from NDJSON archive files
+
+		Rows that already exist are skipped, so a file can be restored again
+		after an interrupted run.
+
+		Args:
+			path (str): An .ndjson.gz file or a directory of them
+
+		Returns:
+			int: Number of documents read
+		"""
+		files = sorted(glob.glob(os.path.join(path, "*.ndjson.gz"))) if os.path.isdir(path) else [path]
+
+		restored = 0
+		for file_path in files:
+			tables = {}
+			with gzip.open(file_path, "rt") as file:
+				for line in file:
+					record = json.loads(line)
+					tables.setdefault(record["doctype"], []).append(record["doc"])
+					for child, rows in record["children"].items():
+						tables.setdefault(child, []).extend(rows)
+					restored += 1
+
+			for doctype, rows in tables.items():
+				columns = [column for column in LogArchiver.get_columns(f"tab{doctype}") if column in rows[0]]
+				frappe.db.bulk_insert(
+					doctype,
+					columns,
+					[[row.get(column) for column in columns] for row in rows],
+					ignore_duplicates=True,
+				)
+				LogArchiver.delete_tombstones(doctype, [row["name"] for row in rows])
+			frappe.db.commit()
+
+		return restored
+
+
+def archive_old_logs(
+	days=90, target="table", batch_size=BATCH_SIZE, throttle=THROTTLE_SECONDS, dry_run=False
+):
+	"""
+	Archive every doctype of ARCHIVE_POLICIES
+
+	Returns:
+		list: Summary per doctype
+	"""
+	return [
+		LogArchiver.archive(doctype, days, target, batch_size, throttle, dry_run)
+		for doctype in ARCHIVE_POLICIES
+	]
@@ -0,0 +1,496 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Synthetic data generator for E Mart benchmarks
+
+Writes customers, suppliers, items, bins, series mappings and submitted
+Sales/Purchase Invoices (with sales teams, buyback items and EMI schedules)
+straight into the tables with bulk INSERTs, so millions of invoices can be
+generated in minutes. Every generated name starts with NAME_PREFIX and
+`purge` removes them again. Use a dedicated benchmark site.
+
+Usage:
+	bench --site <site> execute e_mart.benchmarks.data_generator.generate \
+		--kwargs "{'scale': 'small'}"
+	bench --site <site> execute e_mart.benchmarks.data_generator.purge
+"""
+
+import random
+import time
+
+import frappe
+from frappe.utils import add_days, cint, flt, getdate, now
+
+from e_mart.emi import EmiSchedule
+
+NAME_PREFIX = "BENCH-"
+
+# Sales Invoices per scale; everything else is derived from it
+SCALES = {
+	"small": 10_000,
+	"medium": 100_000,
+	"large": 1_000_000,
+	"xlarge": 5_000_000,
+}
+
+CHUNK_SIZE = 5000
+
+# Parent doctype -> child (doctype, parentfield) tables written by the generator
+CHILD_TABLES = {
+	"Sales Invoice": [
+		("Sales Invoice Item", "items"),
+		("Sales Team", "sales_team"),
+		("Buyback Item", "buyback_items"),
+		("EMI Duration", "emi_duration"),
+	],
+	"Purchase Invoice": [("Purchase Invoice Item", "items")],
+}
+
+
+class SyntheticDataGenerator:
+	"""Deterministic bulk data generator"""
+
+	def __init__(self, invoices, seed=42, days=730, company=None):
+		self.invoices = cint(invoices)
+		self.rng = random.Random(seed)
+		self.days = cint(days)
+		self.company = company or frappe.defaults.get_global_default("company")
+		if not self.company:
+			frappe.throw("Set a default company before generating benchmark data")
+
+		self.customers = max(self.invoices // 10, 100)
+		self.suppliers = max(self.invoices // 1000, 20)
+		self.items = max(min(self.invoices // 20, 50_000), 200)
+		self.purchase_invoices = max(self.invoices // 5, 100)
+
+		self.defaults = self.get_defaults()
+		self.templates = {}
+		self.timestamp = now()
+
+	def get_defaults(self):
+		"""Masters and accounts the generated rows point at"""
+		company = frappe.get_cached_value(
+			"Company",
+			self.company,
+			[
+				"default_currency",
+				"default_receivable_account",
+				"default_payable_account",
+				"default_income_account",
+				"default_expense_account",
+			],
+			as_dict=True,
+		)
+		warehouse = frappe.db.get_value("Warehouse", {"company": self.company, "is_group": 0}, "name")
+		if not warehouse:
+			frappe.throw(f"Company {self.company} has no warehouse")
+
+		return frappe._dict(
+			currency=company.default_currency,
+			debit_to=company.default_receivable_account,
+			credit_to=company.default_payable_account,
+			income_account=company.default_income_account,
+			expense_account=company.default_expense_account,
+			warehouse=warehouse,
+			customer_group=frappe.db.get_value("Customer Group", {"is_group": 0}, "name"),
+			supplier_group=frappe.db.get_value("Supplier Group", {"is_group": 0}, "name"),
+			territory=frappe.db.get_value("Territory", {"is_group": 0}, "name"),
+			item_group=frappe.db.get_value("Item Group", {"is_group": 0}, "name"),
+			uom=frappe.db.get_value("UOM", "Nos", "name") or frappe.db.get_value("UOM", {}, "name"),
+			sales_persons=frappe.get_all("Sales Person", filters={"is_group": 0}, pluck="name", limit=20),
+		)
+
+	def generate(self):
+		"""
+		Generate the whole dataset
+
+		Returns:
+			dict: Rows inserted per doctype and elapsed seconds
+		"""
+		start = time.perf_counter()
+		counts = {}
+		counts["Purchase Series Mapping"] = self.ensure_series_mappings()
+		counts["Customer"] = self.generate_customers()
+		counts["Supplier"] = self.generate_suppliers()
+		counts["Item"], counts["Bin"] = self.generate_items()
+		counts["Sales Invoice"] = self.generate_sales_invoices()
+		counts["Purchase Invoice"] = self.generate_purchase_invoices()
+
+		from e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup import rebuild_invoice_rollup
+
+		rebuild_invoice_rollup(from_date=add_days(getdate(), -self.days))
+		frappe.db.commit()
+
+		counts["elapsed_sec"] = round(time.perf_counter() - start, 1)
+		return counts
+
+	def ensure_series_mappings(self):
+		"""Add a series mapping to E-mart Settings for every purchase category that has none"""
+		settings = frappe.get_single("E-mart Settings")
+		existing = {row.purchase_category for row in settings.purchase_series_mapping}
+		missing = [category for category in ("Normal", "Special") if category not in existing]
+		for category in missing:
+			settings.append(
+				"purchase_series_mapping",
+				{
+					"purchase_category": category,
+					"series_prefix": f"{NAME_PREFIX}{category[0]}",
+					"series_start": 1,
+					"series_current": 1,
+					"series_format": "####",
+				},
+			)
+		if missing:
+			settings.save(ignore_permissions=True)
+			frappe.db.commit()
+		return len(missing)
+
+	def generate_customers(self):
+		return self.insert_in_chunks(
+			"Customer",
+			self.customers,
+			lambda i: {
+				"name": self.customer_name(i),
+				"customer_name": f"Benchmark Customer {i}",
+				"customer_type": "Individual",
+				"customer_group": self.defaults.customer_group,
+				"territory": self.defaults.territory,
+			},
+		)
+
+	def generate_suppliers(self):
+		return self.insert_in_chunks(
+			"Supplier",
+			self.suppliers,
+			lambda i: {
+				"name": self.supplier_name(i),
+				"supplier_name": f"Benchmark Supplier {i}",
+				"supplier_group": self.defaults.supplier_group,
+			},
+		)
+
+	def generate_items(self):
+		"""Insert items and one Bin per item in the company warehouse"""
+		self.item_rates = [round(self.rng.uniform(100, 50_000), 2) for _ in range(self.items)]
+
+		items = self.insert_in_chunks(
+			"Item",
+			self.items,
+			lambda i: {
+				"name": self.item_name(i),
+				"item_code": self.item_name(i),
+				"item_name": f"Benchmark Item {i}",
+				"item_group": self.defaults.item_group,
+				"stock_uom": self.defaults.uom,
+				"is_stock_item": 1,
+				"standard_rate": self.item_rates[i],
+			},
+		)
+
+		def bin_row(i):
+			qty = self.rng.randint(0, 500)
+			return {
+				"name": f"{NAME_PREFIX}BIN-{i:06d}",
+				"item_code": self.item_name(i),
+				"warehouse": self.defaults.warehouse,
+				"stock_uom": self.defaults.uom,
+				"actual_qty": qty,
+				"projected_qty": qty,
+				"valuation_rate": self.item_rates[i] * 0.8,
+				"stock_value": qty * self.item_rates[i] * 0.8,
+			}
+
+		return items, self.insert_in_chunks("Bin", self.items, bin_row)
+
+	def generate_sales_invoices(self):
+		"""Insert submitted Sales Invoices with items, sales team, buyback and EMI rows"""
+		return self.insert_invoices("Sales Invoice", self.invoices, self.build_sales_invoice)
+
+	def generate_purchase_invoices(self):
+		return self.insert_invoices("Purchase Invoice", self.purchase_invoices, self.build_purchase_invoice)
+
+	def build_sales_invoice(self, i):
+		"""
+		Build one Sales Invoice and its child rows
+
+		Returns:
+			tuple: (invoice values, {child doctype: [rows]})
+		"""
+		name = f"{NAME_PREFIX}SINV-{i:07d}"
+		posting_date = add_days(getdate(), -self.rng.randrange(self.days))
+		sales_type = self.rng.choices(("Cash", "Credit", "EMI"), weights=(6, 2, 2))[0]
+		children = {doctype: [] for doctype, _field in CHILD_TABLES["Sales Invoice"]}
+
+		total = 0
+		for _idx in range(self.rng.randint(1, 5)):
+			item = self.rng.randrange(self.items)
+			qty = self.rng.randint(1, 3)
+			amount = flt(qty * self.item_rates[item], 2)
+			total += amount
+			children["Sales Invoice Item"].append(
+				{
+					"item_code": self.item_name(item),
+					"item_name": f"Benchmark Item {item}",
+					"qty": qty,
+					"stock_qty": qty,
+					"rate": self.item_rates[item],
+					"base_rate": self.item_rates[item],
+					"amount": amount,
+					"base_amount": amount,
+					"net_amount": amount,
+					"base_net_amount": amount,
+					"uom": self.defaults.uom,
+					"stock_uom": self.defaults.uom,
+					"conversion_factor": 1,
+					"warehouse": self.defaults.warehouse,
+					"income_account": self.defaults.income_account,
+					"is_demo_reqd": int(self.rng.random() < 0.1),
+				}
+			)
+		total = flt(total, 2)
+
+		if self.defaults.sales_persons and self.rng.random() < 0.7:
+			children["Sales Team"].append(
+				{
+					"sales_person": self.rng.choice(self.defaults.sales_persons),
+					"allocated_percentage": 100,
+					"allocated_amount": total,
+				}
+			)
+
+		buyback_amount = 0
+		if self.rng.random() < 0.05:
+			item = self.rng.randrange(self.items)
+			buyback_amount = flt(self.item_rates[item] * 0.3, 2)
+			children["Buyback Item"].append(
+				{"item": self.item_name(item), "rate": buyback_amount, "qty": 1, "amount": buyback_amount}
+			)
+
+		invoice = {
+			"name": name,
+			"customer": self.customer_name(self.rng.randrange(self.customers)),
+			"company": self.company,
+			"currency": self.defaults.currency,
+			"conversion_rate": 1,
+			"posting_date": posting_date,
+			"due_date": posting_date,
+			"debit_to": self.defaults.debit_to,
+			"sales_type": sales_type,
+			"is_buyback": int(bool(buyback_amount)),
+			"buyback_amount": buyback_amount,
+			"total": total,
+			"base_total": total,
+			"net_total": total,
+			"base_net_total": total,
+			"grand_total": total,
+			"base_grand_total": total,
+			"rounded_total": total,
+			"base_rounded_total": total,
+			"outstanding_amount": 0 if sales_type == "Cash" else total,
+			"status": "Paid" if sales_type == "Cash" else "Unpaid",
+			"docstatus": 1,
+		}
+		invoice["customer_name"] = invoice["customer"]
+
+		if sales_type == "EMI":
+			installments = self.rng.choice((3, 6, 12))
+			emi_date = add_days(posting_date, 30)
+			children["EMI Duration"] = EmiSchedule.build(emi_date, total, installments)
+			invoice.update(
+				{
+					"no_of_installment": installments,
+					"emi_date": emi_date,
+					"emi_amount": flt(total / installments, 2),
+				}
+			)
+
+		return invoice, children
+
+	def build_purchase_invoice(self, i):
+		"""Build one Purchase Invoice and its items"""
+		posting_date = add_days(getdate(), -self.rng.randrange(self.days))
+		category = "Special" if self.rng.random() < 0.2 else "Normal"
+		items = []
+		total = 0
+		for _idx in range(self.rng.randint(1, 8)):
+			item = self.rng.randrange(self.items)
+			qty = self.rng.randint(1, 20)
+			rate = flt(self.item_rates[item] * 0.8, 2)
+			amount = flt(qty * rate, 2)
+			total += amount
+			items.append(
+				{
+					"item_code": self.item_name(item),
+					"item_name": f"Benchmark Item {item}",
+					"qty": qty,
+					"stock_qty": qty,
+					"rate": rate,
+					"base_rate": rate,
+					"amount": amount,
+					"base_amount": amount,
+					"net_amount": amount,
+					"base_net_amount": amount,
+					"uom": self.defaults.uom,
+					"stock_uom": self.defaults.uom,
+					"conversion_factor": 1,
+					"warehouse": self.defaults.warehouse,
+					"expense_account": self.defaults.expense_account,
+				}
+			)
+		total = flt(total, 2)
+
+		invoice = {
+			"name": f"{NAME_PREFIX}PINV-{i:07d}",
+			"supplier": self.supplier_name(self.rng.randrange(self.suppliers)),
+			"company": self.company,
+			"currency": self.defaults.currency,
+			"conversion_rate": 1,
+			"posting_date": posting_date,
+			"due_date": posting_date,
+			"credit_to": self.defaults.credit_to,
+			"purchase_category": category,
+			"series_number": f"{NAME_PREFIX}{category[0]}-{i:07d}",
+			"total": total,
+			"base_total": total,
+			"net_total": total,
+			"base_net_total": total,
+			"grand_total": total,
+			"base_grand_total": total,
+			"rounded_total": total,
+			"base_rounded_total": total,
+			"outstanding_amount": total,
+			"status": "Unpaid",
+			"docstatus": 1,
+		}
+		invoice["supplier_name"] = invoice["supplier"]
+		return invoice, {"Purchase Invoice Item": items}
+
+	def insert_invoices(self, doctype, count, build):
+		"""Insert invoices and their child rows chunk by chunk, committing every chunk"""
+		child_fields = dict(CHILD_TABLES[doctype])
+		for start in range(0, count, CHUNK_SIZE):
+			parents = []
+			children = {child: [] for child in child_fields}
+			for i in range(start, min(start + CHUNK_SIZE, count)):
+				invoice, rows = build(i)
+				parents.append(invoice)
+				for child, child_rows in rows.items():
+					for idx, row in enumerate(child_rows, 1):
+						children[child].append(
+							{
+								**row,
+								"name": f"{invoice['name']}-{child_fields[child]}-{idx}",
+								"parent": invoice["name"],
+								"parenttype": doctype,
+								"parentfield": child_fields[child],
+								"idx": idx,
+								"docstatus": 1,
+							}
+						)
+
+			self.bulk_insert(doctype, parents)
+			for child, rows in children.items():
+				self.bulk_insert(child, rows)
+			frappe.db.commit()
+			print(f"{doctype}: {min(start + CHUNK_SIZE, count)}/{count}")
+
+		return count
+
+	def insert_in_chunks(self, doctype, count, build):
+		"""Insert `count` rows built by `build(i)`, committing every chunk"""
+		for start in range(0, count, CHUNK_SIZE):
+			self.bulk_insert(doctype, [build(i) for i in range(start, min(start + CHUNK_SIZE, count))])
+			frappe.db.commit()
+		return count
+
+	def bulk_insert(self, doctype, rows):
+		"""Insert rows over a template of the doctype's defaults with one INSERT"""
+		if not rows:
+			return
+
+		if doctype not in self.templates:
+			template = frappe.new_doc(doctype).get_valid_dict(convert_dates_to_str=True, ignore_nulls=False)
+			columns = [
+				column for column in frappe.get_meta(doctype).get_valid_columns() if column in template
+			]
+			self.templates[doctype] = (template, columns)
+		template, columns = self.templates[doctype]
+
+		user = frappe.session.user
+		common = {"owner": user, "modified_by": user, "creation": self.timestamp, "modified": self.timestamp}
+		frappe.db.bulk_insert(
+			doctype,
+			columns,
+			[[{**template, **common, **row}.get(column) for column in columns] for row in rows],
+			ignore_duplicates=True,
+		)
+
+	@staticmethod
+	def customer_name(i):
+		return f"{NAME_PREFIX}CUST-{i:07d}"
+
+	@staticmethod
+	def supplier_name(i):
+		return f"{NAME_PREFIX}SUPP-{i:05d}"
+
+	@staticmethod
+	def item_name(i):
+		return f"{NAME_PREFIX}ITEM-{i:05d}"
+
+
+def generate(scale="small", invoices=None, seed=42, days=730, company=None):
+	"""
+	Generate a benchmark dataset
+
+	Args:
+		scale (str): Key of SCALES, ignored when `invoices` is given
+		invoices (int): Number of Sales Invoices
+		seed (int): Random seed; the same seed produces the same dataset
+		days (int): Posting dates are spread over this many days before today
+		company (str): Company (default: the global default company)
+
+	Returns:
+		dict: Rows inserted per doctype
+	"""
+	if not invoices and scale not in SCALES:
+		frappe.throw(f"Unknown scale {scale}; use one of {', '.join(SCALES)}")
+
+	counts = SyntheticDataGenerator(
+		invoices or SCALES[scale], seed=seed, days=days, company=company
+	).generate()
+	print(frappe.as_json(counts))
+	return counts
+
+
+def purge():
+	"""
+	Delete every generated row
+
+	Returns:
+		dict: Rows deleted per table
+	"""
+	deleted = {}
+	tables = [(child, "parent") for children in CHILD_TABLES.values() for child, _field in children]
+	# Written by the serial bundle benchmarks
+	tables.append(("Serial and Batch Entry", "parent"))
+	tables += [
+		(doctype, "name")
+		for doctype in ("Sales Invoice", "Purchase Invoice", "Bin", "Item", "Customer", "Supplier")
+	]
+
+	for doctype, column in tables:
+		condition = f"`{column}` LIKE %s"
+		deleted[doctype] = frappe.db.sql(
+			f"SELECT COUNT(*) FROM `tab{doctype}` WHERE {condition}", f"{NAME_PREFIX}%"
+		)[0][0]
+		frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE {condition}", f"{NAME_PREFIX}%")
+		frappe.db.commit()
+
+	from e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup import rebuild_invoice_rollup
+
+	rebuild_invoice_rollup()
+	frappe.db.commit()
+
+	print(frappe.as_json(deleted))
+	return deleted
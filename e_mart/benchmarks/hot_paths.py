@@ -0,0 +1,444 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Micro and macro benchmarks for E Mart hot paths
+
+Run against a site loaded with e_mart.benchmarks.data_generator. Results are
+written as JSON so runs of different releases can be compared.
+
+Usage:
+	bench --site <site> execute e_mart.benchmarks.hot_paths.run \
+		--kwargs "{'iterations': 50, 'label': 'v1.2'}"
+	bench --site <site> execute e_mart.benchmarks.hot_paths.compare \
+		--kwargs "{'baseline': '/path/a.json', 'current': '/path/b.json'}"
+"""
+
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+import frappe
+from frappe.utils import cint, flt, now
+
+import e_mart
+from e_mart.benchmarks.data_generator import NAME_PREFIX
+
+# Relative slowdown of the median that counts as a regression
+REGRESSION_THRESHOLD = 0.10
+
+BENCHMARKS = {}
+
+
+def benchmark(name, kind="micro"):
+	"""
+	Register a benchmark
+
+	The decorated function does the one-time setup and returns the callable
+	that is timed.
+	"""
+
+	def decorator(setup):
+		BENCHMARKS[name] = {"kind": kind, "setup": setup}
+		return setup
+
+	return decorator
+
+
+class QueryCounter:
+	"""Counts frappe.db.sql calls while active"""
+
+	def __init__(self):
+		self.count = 0
+
+	def __enter__(self):
+		db = frappe.local.db
+		self.previous = db.__dict__.get("sql")
+		original = self.previous or db.sql
+
+		def counted_sql(*args, **kwargs):
+			self.count += 1
+			return original(*args, **kwargs)
+
+		db.sql = counted_sql
+		return self
+
+	def __exit__(self, *exc):
+		if self.previous:
+			frappe.local.db.sql = self.previous
+		else:
+			frappe.local.db.__dict__.pop("sql", None)
+
+
+def get_sample_invoice(sales_type=None):
+	"""Name of a generated Sales Invoice, optionally of a given sales type"""
+	filters = {"name": ["like", f"{NAME_PREFIX}SINV-%"], "docstatus": 1}
+	if sales_type:
+		filters["sales_type"] = sales_type
+	name = frappe.db.get_value("Sales Invoice", filters, "name")
+	if not name:
+		frappe.throw("No benchmark invoices found; run e_mart.benchmarks.data_generator.generate first")
+	return name
+
+
+def copy_invoice(name):
+	"""Draft copy of an invoice, as a user would create it"""
+	source = frappe.get_doc("Sales Invoice", name)
+	doc = frappe.copy_doc(source)
+	doc.posting_date = frappe.utils.getdate()
+	doc.due_date = doc.posting_date
+	doc.set_posting_time = 1
+	doc.update_stock = 0
+	return doc
+
+
+@benchmark("sales_invoice.validate_hooks")
+def bench_validate_hooks():
+	"""E Mart validate hooks on an in-memory EMI invoice with sales team"""
+	from e_mart.e_mart.custom_scripts.sales_invoice import sales_invoice as hooks
+
+	doc = copy_invoice(get_sample_invoice("EMI"))
+
+	def run():
+		hooks.validate_buyback_fields(doc, "validate")
+		hooks.calculate_total_expense(doc, "validate")
+		hooks.calculate_profit_for_commission(doc, "validate")
+		hooks.generate_emi_schedule(doc, "validate")
+		hooks.update_emi_amount(doc, "validate")
+
+	return run
+
+
+@benchmark("sales_invoice.insert_submit", kind="macro")
+def bench_insert_submit():
+	"""Full insert and submit of a Sales Invoice, rolled back after every run"""
+	name = get_sample_invoice()
+
+	def run():
+		try:
+			doc = copy_invoice(name)
+			doc.insert(ignore_permissions=True)
+			doc.submit()
+		finally:
+			# A full rollback also discards the side effect jobs queued after commit
+			frappe.db.rollback()
+
+	return run
+
+
+@benchmark("series.format")
+def bench_series_format():
+	"""Series number formatting"""
+	from e_mart.series_manager import SeriesManager
+
+	mapping = {"series_prefix": "BENCH", "series_format": "YYYYMMDD-####"}
+	return lambda: SeriesManager._generate_series_number(mapping, 1234)
+
+
+@benchmark("series.allocate", kind="macro")
+def bench_series_allocate():
+	"""Next series number, including lease refills; consumes numbers of the Normal series"""
+	from e_mart.series_manager import SeriesManager
+
+	return lambda: SeriesManager.get_next_series("Normal")
+
+
+@benchmark("dashboard.analytics_cold", kind="macro")
+def bench_dashboard_cold():
+	"""Dashboard analytics computed from the rollup, bypassing the result cache"""
+	from e_mart.api import get_dashboard_analytics_data
+
+	return get_dashboard_analytics_data.__wrapped__
+
+
+@benchmark("dashboard.analytics_warm")
+def bench_dashboard_warm():
+	"""Dashboard analytics served from the result cache"""
+	from e_mart.api import get_dashboard_analytics_data
+
+	get_dashboard_analytics_data()
+	return get_dashboard_analytics_data
+
+
+@benchmark("dashboard.endpoint", kind="macro")
+def bench_dashboard_endpoint():
+	"""Whitelisted dashboard endpoint"""
+	from e_mart.api import get_dashboard_data
+
+	return get_dashboard_data
+
+
+@benchmark("mobile.sales_invoices", kind="macro")
+def bench_mobile_invoices():
+	"""Mobile invoice list"""
+	from e_mart.mobile import get_mobile_sales_invoices
+
+	return lambda: get_mobile_sales_invoices(limit=20)
+
+
+@benchmark("mobile.item_search", kind="macro")
+def bench_mobile_item_search():
+	"""Mobile item search"""
+	from e_mart.mobile import get_mobile_items
+
+	return lambda: get_mobile_items(search_term="Benchmark Item 12", limit=20)
+
+
+@benchmark("mobile.customer_search", kind="macro")
+def bench_mobile_customer_search():
+	"""Mobile customer search"""
+	from e_mart.mobile import get_mobile_customers
+
+	return lambda: get_mobile_customers(search_term="Benchmark Customer 12", limit=20)
+
+
+@benchmark("export.sales_invoices_csv", kind="macro")
+def bench_export():
+	"""Streaming CSV export of 10k generated invoices"""
+	from e_mart.exporter import DataExporter
+
+	cutoff = frappe.db.sql(
+		"SELECT name FROM `tabSales Invoice` WHERE name LIKE %s ORDER BY name LIMIT 1 OFFSET 9999",
+		f"{NAME_PREFIX}SINV-%",
+	)
+	cutoff = cutoff[0][0] if cutoff else f"{NAME_PREFIX}SINV-9999999"
+	filters = [["name", "like", f"{NAME_PREFIX}SINV-%"], ["name", "<=", cutoff]]
+	fields = ["name", "customer", "posting_date", "grand_total", "outstanding_amount", "status"]
+
+	def run():
+		with tempfile.NamedTemporaryFile(suffix=".csv") as file:
+			DataExporter.write_export("Sales Invoice", file.name, filters, fields, "csv")
+
+	return run
+
+
+def make_serial_bundle(serials=1000, voucher_no=None):
+	"""
+	A submitted-looking Serial and Batch Bundle with `serials` entries
+
+	Its entry rows and earlier entries of the same serials (in another
+	bundle, with categories) are inserted and committed once, so every run
+	sees the same state after its rollback.
+	"""
+	bundle, history = f"{NAME_PREFIX}SABB-CURRENT", f"{NAME_PREFIX}SABB-HISTORY"
+	serial_nos = [f"{NAME_PREFIX}SN-{i:06d}" for i in range(serials)]
+
+	frappe.db.sql("DELETE FROM `tabSerial and Batch Entry` WHERE parent IN %s", ((bundle, history),))
+	columns = ["name", "parent", "parenttype", "parentfield", "idx", "serial_no", "qty", "purchase_category"]
+	columns += ["creation", "modified", "docstatus"]
+	timestamp = now()
+	rows = []
+	for parent, category in ((history, "Special"), (bundle, None)):
+		base = [parent, "Serial and Batch Bundle", "entries"]
+		rows += [
+			[f"{parent}-{i}", *base, i + 1, serial_no, 1, category, timestamp, timestamp, 1]
+			for i, serial_no in enumerate(serial_nos)
+		]
+	frappe.db.bulk_insert("Serial and Batch Entry", columns, rows)
+	frappe.db.commit()
+
+	doc = frappe.new_doc("Serial and Batch Bundle")
+	doc.name = bundle
+	doc.voucher_type = "Purchase Invoice"
+	doc.voucher_no = voucher_no
+	for i, serial_no in enumerate(serial_nos):
+		doc.append("entries", {"name": f"{bundle}-{i}", "serial_no": serial_no, "qty": 1})
+	return doc
+
+
+def bench_serial_bundle(doc):
+	"""Run the bundle on_submit hook from a clean state, then roll back"""
+	from e_mart.e_mart.custom_scripts.serial_and_batch_bundle.serial_and_batch_bundle import (
+		propagate_purchase_category,
+	)
+
+	def run():
+		for entry in doc.entries:
+			entry.purchase_category = None
+		try:
+			propagate_purchase_category(doc, "on_submit")
+		finally:
+			frappe.db.rollback()
+
+	return run
+
+
+@benchmark("serial_bundle.category_from_history_1k", kind="macro")
+def bench_serial_bundle_history():
+	"""Purchase category propagation for 1k serials looked up from earlier bundles"""
+	return bench_serial_bundle(make_serial_bundle())
+
+
+@benchmark("serial_bundle.category_from_voucher_1k", kind="macro")
+def bench_serial_bundle_voucher():
+	"""Purchase category propagation for 1k serials from the Purchase Invoice"""
+	voucher_no = frappe.db.get_value("Purchase Invoice", {"name": ["like", f"{NAME_PREFIX}PINV-%"]}, "name")
+	if not voucher_no:
+		frappe.throw(
+			"No benchmark purchase invoices found; run e_mart.benchmarks.data_generator.generate first"
+		)
+	return bench_serial_bundle(make_serial_bundle(voucher_no=voucher_no))
+
+
+class BenchmarkRunner:
+	"""Times registered benchmarks"""
+
+	@staticmethod
+	def measure(func, iterations, warmup):
+		"""
+		Time `func`
+
+		Returns:
+			dict: Timing statistics in milliseconds and queries per call
+		"""
+		for _ in range(warmup):
+			func()
+
+		timings = []
+		with QueryCounter() as counter:
+			for _ in range(iterations):
+				start = time.perf_counter()
+				func()
+				timings.append((time.perf_counter() - start) * 1000)
+
+		timings.sort()
+		return {
+			"iterations": iterations,
+			"min_ms": round(timings[0], 3),
+			"median_ms": round(statistics.median(timings), 3),
+			"p95_ms": round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 3),
+			"max_ms": round(timings[-1], 3),
+			"mean_ms": round(statistics.fmean(timings), 3),
+			"stdev_ms": round(statistics.stdev(timings), 3) if len(timings) > 1 else 0,
+			"queries_per_call": round(counter.count / iterations, 1),
+		}
+
+	@staticmethod
+	def get_environment():
+		"""Versions and dataset size the results depend on"""
+		return {
+			"e_mart": e_mart.__version__,
+			"frappe": frappe.__version__,
+			"python": platform.python_version(),
+			"db_type": frappe.db.db_type,
+			"site": frappe.local.site,
+			"sales_invoices": frappe.db.count("Sales Invoice"),
+			"purchase_invoices": frappe.db.count("Purchase Invoice"),
+			"items": frappe.db.count("Item"),
+		}
+
+	@staticmethod
+	def run(names=None, kind=None, iterations=20, warmup=3):
+		"""
+		Run benchmarks
+
+		Args:
+			names (list): Benchmark names (default: all)
+			kind (str): Only "micro" or "macro" benchmarks
+			iterations (int): Timed runs per benchmark (macro benchmarks run a fifth as often)
+			warmup (int): Untimed runs first
+
+		Returns:
+			dict: {name: statistics}
+		"""
+		results = {}
+		for name, spec in BENCHMARKS.items():
+			if (names and name not in names) or (kind and spec["kind"] != kind):
+				continue
+
+			count = iterations if spec["kind"] == "micro" else max(iterations // 5, 3)
+			try:
+				results[name] = {
+					"kind": spec["kind"],
+					**BenchmarkRunner.measure(spec["setup"](), count, warmup),
+				}
+			except Exception as e:
+				frappe.db.rollback()
+				results[name] = {"kind": spec["kind"], "error": str(e)}
+			print(f"{name}: {frappe.as_json(results[name], indent=None)}")
+
+		return results
+
+
+def run(names=None, kind=None, iterations=20, warmup=3, label=None, output=None):
+	"""
+	Run benchmarks and write the results as JSON
+
+	Args:
+		names (list | str): Benchmark names, comma separated or a list (default: all)
+		kind (str): "micro" or "macro"
+		iterations (int): Timed runs per micro benchmark
+		warmup (int): Untimed runs per benchmark
+		label (str): Label stored with the results, e.g. the release
+		output (str): Result file (default: private/benchmarks/<label>-<timestamp>.json)
+
+	Returns:
+		str: Path of the result file
+	"""
+	if isinstance(names, str):
+		names = [name.strip() for name in names.split(",") if name.strip()]
+
+	report = {
+		"label": label,
+		"timestamp": now(),
+		"environment": BenchmarkRunner.get_environment(),
+		"results": BenchmarkRunner.run(names, kind, cint(iterations), cint(warmup)),
+	}
+
+	if not output:
+		directory = frappe.get_site_path("private", "benchmarks")
+		os.makedirs(directory, exist_ok=True)
+		stamp = report["timestamp"].replace(" ", "T").replace(":", "")[:17]
+		output = os.path.join(directory, f"{label or 'run'}-{stamp}.json")
+
+	with open(output, "w") as file:
+		json.dump(report, file, indent=1, default=str)
+
+	print(f"Results written to {output}")
+	return output
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+	"""
+	Compare two result files by median time
+
+	Args:
+		baseline (str): Result file of the reference run
+		current (str): Result file of the run under test
+		threshold (float): Relative slowdown reported as a regression
+
+	Returns:
+		dict: {"regressions": [...], "improvements": [...], "unchanged": [...]}
+	"""
+	with open(baseline) as file:
+		before = json.load(file)["results"]
+	with open(current) as file:
+		after = json.load(file)["results"]
+
+	threshold = flt(threshold)
+	summary = {"regressions": [], "improvements": [], "unchanged": []}
+	for name in sorted(set(before) & set(after)):
+		old, new = before[name].get("median_ms"), after[name].get("median_ms")
+		if not old or new is None:
+			continue
+
+		change = (new - old) / old
+		row = {
+			"name": name,
+			"baseline_ms": old,
+			"current_ms": new,
+			"change": round(change, 3),
+			"queries": [before[name].get("queries_per_call"), after[name].get("queries_per_call")],
+		}
+		if change > threshold:
+			summary["regressions"].append(row)
+		elif change < -threshold:
+			summary["improvements"].append(row)
+		else:
+			summary["unchanged"].append(row)
+
+	print(frappe.as_json(summary))
+	return summary
@@ -0,0 +1,71 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Concurrency benchmark for the series allocator
+
+Usage:
+	bench --site <site> execute e_mart.benchmarks.series_allocator.run \
+		--kwargs "{'processes': 8, 'per_process': 500}"
+"""
+
+import multiprocessing
+import time
+from collections import Counter
+
+import frappe
+
+
+def _worker(args):
+	"""Allocate `count` numbers from a fresh site connection"""
+	site, sites_path, purchase_category, count = args
+
+	frappe.init(site=site, sites_path=sites_path)
+	frappe.connect()
+	try:
+		from e_mart.series_allocator import SeriesAllocator
+
+		numbers = [SeriesAllocator.allocate(purchase_category)[0] for _ in range(count)]
+		SeriesAllocator.release_leases()
+		return numbers
+	finally:
+		frappe.destroy()
+
+
+def run(processes=4, per_process=500, purchase_category="Normal"):
+	"""
+	Hammer the allocator from several processes and check for duplicates
+
+	Args:
+		processes (int): Number of concurrent worker processes
+		per_process (int): Numbers allocated by each process
+		purchase_category (str): Series mapping category to allocate from
+
+	Returns:
+		dict: Benchmark results
+	"""
+	processes, per_process = int(processes), int(per_process)
+	args = [(frappe.local.site, frappe.local.sites_path, purchase_category, per_process)] * processes
+
+	start = time.perf_counter()
+	with multiprocessing.get_context("spawn").Pool(processes) as pool:
+		results = pool.map(_worker, args)
+	elapsed = time.perf_counter() - start
+
+	numbers = [number for result in results for number in result]
+	duplicates = sorted(number for number, count in Counter(numbers).items() if count > 1)
+
+	summary = {
+		"processes": processes,
+		"allocations": len(numbers),
+		"duplicates": duplicates,
+		"gaps": (max(numbers) - min(numbers) + 1 - len(set(numbers))) if numbers else 0,
+		"elapsed_sec": round(elapsed, 3),
+		"allocations_per_sec": round(len(numbers) / elapsed, 1) if elapsed else 0,
+	}
+	print(frappe.as_json(summary))
+
+	if duplicates:
+		frappe.throw(f"Series allocator handed out {len(duplicates)} duplicate numbers")
+
+	return summary
@@ -0,0 +1,361 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Cache invalidation module for E Mart app
+Scoped invalidation of the cache keys E Mart owns, broadcast to every worker
+over Redis pub/sub so process-local copies are refreshed too
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+CHANNEL = "e_mart_cache_invalidation"
+
+# Prefix of the keys `cached` writes for a namespace
+RESULT_KEY_PREFIX = "e_mart_{0}:"
+
+# {scope: {"keys": exact cache keys, "patterns": key patterns}}
+CACHE_SCOPES = {
+	# Settings are only cached per process, behind a version counter; see SettingsCache
+	"settings": {"keys": [], "patterns": []},
+	"css": {"keys": ["e_mart_css_vars"], "patterns": []},
+	"dashboard": {"keys": [], "patterns": [RESULT_KEY_PREFIX.format("dashboard") + "*"]},
+	"result": {"keys": [], "patterns": [RESULT_KEY_PREFIX.format("result") + "*"]},
+	"purchase_category": {"keys": ["e_mart_supplier_purchase_category"], "patterns": []},
+}
+
+# {scope: [callable(site)]} clearing process-local copies
+_local_handlers = {}
+_listener = {"thread": None}
+_listener_lock = threading.Lock()
+
+
+def register_local_handler(scope, handler):
+	"""
+	Register a function that drops a process-local copy of a scope
+
+	Args:
+		scope (str): Cache scope
+		handler (callable): Called with the site name; must not rely on frappe.local
+	"""
+	_local_handlers.setdefault(scope, []).append(handler)
+
+
+class CacheInvalidator:
+	"""Scoped invalidation of E Mart caches"""
+
+	@staticmethod
+	def invalidate(*scopes, after_commit=False):
+		"""
+		Invalidate the given scopes on this site
+
+		Args:
+			scopes (str): Scopes from CACHE_SCOPES
+			after_commit (bool): Defer until the current transaction commits, so
+				other workers cannot reload uncommitted values
+
+		Returns:
+			list: Invalidated scopes
+		"""
+		unknown = [scope for scope in scopes if scope not in CACHE_SCOPES]
+		if unknown:
+			frappe.throw(_("Unknown cache scope: {0}").format(", ".join(unknown)))
+
+		if after_commit:
+			frappe.db.after_commit.add(lambda: CacheInvalidator.invalidate(*scopes))
+			return list(scopes)
+
+		cache = frappe.cache()
+		for scope in scopes:
+			keys = CACHE_SCOPES[scope]["keys"]
+			if keys:
+				cache.delete_value(keys)
+			for pattern in CACHE_SCOPES[scope]["patterns"]:
+				cache.delete_keys(pattern)
+
+		CacheInvalidator.clear_local(frappe.local.site, scopes)
+		CacheInvalidator.publish(scopes)
+		return list(scopes)
+
+	@staticmethod
+	def invalidate_all(after_commit=False):
+		"""Invalidate every E Mart scope, leaving framework caches untouched"""
+		return CacheInvalidator.invalidate(*CACHE_SCOPES, after_commit=after_commit)
+
+	@staticmethod
+	def clear_local(site, scopes):
+		"""Run the local handlers of the given scopes"""
+		for scope in scopes:
+			for handler in _local_handlers.get(scope, []):
+				try:
+					handler(site)
+				except Exception as e:
+					frappe.logger().warning(f"E Mart cache handler for {scope} failed: {e!s}")
+
+	@staticmethod
+	def publish(scopes):
+		"""Tell the other workers to drop their local copies"""
+		try:
+			frappe.cache().publish(
+				CHANNEL, json.dumps({"site": frappe.local.site, "scopes": list(scopes), "pid": os.getpid()})
+			)
+		except Exception as e:
+			# Workers still converge through their own version checks and TTLs
+			frappe.logger().warning(f"E Mart cache invalidation publish failed: {e!s}")
+
+
+def handle_message(message):
+	"""Apply an invalidation message published by another process"""
+	try:
+		data = json.loads(message["data"])
+	except Exception:
+		return
+
+	if data.get("pid") == os.getpid():
+		return
+
+	scopes = [scope for scope in data.get("scopes", []) if scope in CACHE_SCOPES]
+	CacheInvalidator.clear_local(data.get("site"), scopes)
+
+
+def ensure_listener():
+	"""
+	Start the invalidation listener of this process once
+
+	Registered as a before_request hook only, so it runs in long-lived web
+	workers; RQ forks a process per job, which would subscribe again every
+	time and exit before hearing anything. The listener is a daemon thread
+	with its own pub/sub connection.
+	"""
+	if _listener["thread"] and _listener["thread"].is_alive():
+		return
+
+	with _listener_lock:
+		if _listener["thread"] and _listener["thread"].is_alive():
+			return
+
+		try:
+			pubsub = frappe.cache().pubsub(ignore_subscribe_messages=True)
+			pubsub.subscribe(**{CHANNEL: handle_message})
+		except Exception as e:
+			frappe.logger().warning(f"E Mart cache listener could not subscribe: {e!s}")
+			return
+
+		thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+		_listener["thread"] = thread
+
+
+TAG_KEY = "e_mart_cache_tag:{0}"
+LOCK_TTL = 30
+LOCK_WAIT = 5
+LOCK_POLL = 0.05
+
+# Marks a cache miss, so None and empty results can be cached like any other value
+_MISS = object()
+
+# Deletes a lock only while it still holds the caller's token
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+	return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class ResultCache:
+	"""
+	Shared result cache with deterministic keys and tag invalidation
+
+	Entries are stored as {"value", "fresh_until", "tags"} so falsy results
+	are cached too. An entry turns stale after `fresh_until` or when any of
+	its tags has been bumped since it was written; with a `stale_ttl` it may
+	still be served while one worker recomputes it, otherwise it is a miss.
+	"""
+
+	@staticmethod
+	def make_key(namespace, func, args, kwargs, per_user=False):
+		"""Build a key that is identical in every worker process"""
+		payload = json.dumps(
+			[args, kwargs, frappe.session.user if per_user else None], sort_keys=True, default=str
+		)
+		digest = hashlib.sha1(payload.encode()).hexdigest()
+		return f"{RESULT_KEY_PREFIX.format(namespace)}{func.__module__}.{func.__qualname__}:{digest}"
+
+	@staticmethod
+	def get_tag_versions(tags):
+		"""Get the current versions of tags with one MGET"""
+		if not tags:
+			return {}
+		cache = frappe.cache()
+		values = cache.mget([cache.make_key(TAG_KEY.format(tag)) for tag in tags])
+		return {
+			tag: cint(value.decode() if isinstance(value, bytes) else value)
+			for tag, value in zip(tags, values, strict=True)
+		}
+
+	@staticmethod
+	def invalidate_tags(*tags):
+		"""Invalidate every cached result carrying one of the tags"""
+		cache = frappe.cache()
+		for tag in tags:
+			cache.incr(cache.make_key(TAG_KEY.format(tag)))
+
+	@staticmethod
+	def read(key, tags, stale_ttl=0):
+		"""
+		Read an entry
+
+		Args:
+			stale_ttl (int): Entries with bumped tags are returned as stale when set, else as a miss
+
+		Returns:
+			tuple: (value or _MISS, is_fresh)
+		"""
+		# expires=True keeps the entry out of the request-local cache, which would pin a stale copy
+		entry = frappe.cache().get_value(key, expires=True)
+		if not isinstance(entry, dict):
+			return _MISS, False
+		if entry.get("tags") != ResultCache.get_tag_versions(tags):
+			return (entry["value"] if stale_ttl else _MISS), False
+		return entry["value"], time.time() < entry["fresh_until"]
+
+	@staticmethod
+	def write(key, value, tag_versions, ttl, stale_ttl):
+		"""Store an entry, keeping it around for the stale window as well"""
+		frappe.cache().set_value(
+			key,
+			{"value": value, "fresh_until": time.time() + ttl, "tags": tag_versions},
+			expires_in_sec=ttl + stale_ttl,
+		)
+
+	@staticmethod
+	def acquire(key):
+		"""
+		Try to become the single worker recomputing `key`
+
+		Returns:
+			str: Token to release the lock with, or None if another worker holds it
+		"""
+		cache = frappe.cache()
+		token = frappe.generate_hash(length=20)
+		if cache.set(cache.make_key(f"{key}:lock"), token, nx=True, ex=LOCK_TTL):
+			return token
+		return None
+
+	@staticmethod
+	def release(key, token):
+		"""
+		Release the recompute lock of `key` if it is still ours
+
+		A recompute that outlives LOCK_TTL loses the lock to another worker;
+		comparing the token and deleting in one script leaves that lock alone.
+		"""
+		cache = frappe.cache()
+		cache.eval(RELEASE_SCRIPT, 1, cache.make_key(f"{key}:lock"), token)
+
+	@staticmethod
+	def compute(key, func, args, kwargs, tags, ttl, stale_ttl):
+		"""Compute and store a result; tag versions are read first so concurrent bumps win"""
+		tag_versions = ResultCache.get_tag_versions(tags)
+		value = func(*args, **kwargs)
+		ResultCache.write(key, value, tag_versions, ttl, stale_ttl)
+		return value
+
+
+def cached(ttl=300, tags=(), stale_ttl=0, namespace="result", per_user=False):
+	"""
+	Cache a function's result in Redis
+
+	Args:
+		ttl (int): Seconds a result is fresh
+		tags (tuple): Tags (usually doctypes) whose changes invalidate the result
+		stale_ttl (int): Seconds an expired or invalidated result may still be
+			served while another worker recomputes it
+		namespace (str): Key namespace, matching a scope in CACHE_SCOPES
+		per_user (bool): Cache separately per session user
+	"""
+	tags = tuple(tags)
+
+	def decorator(func):
+		@wraps(func)
+		def wrapper(*args, **kwargs):
+			key = ResultCache.make_key(namespace, func, args, kwargs, per_user)
+			value, fresh = ResultCache.read(key, tags, stale_ttl)
+			if fresh:
+				return value
+
+			if value is not _MISS:
+				# Stale: one worker refreshes, everybody else serves the old result
+				token = ResultCache.acquire(key)
+				if not token:
+					return value
+				try:
+					return ResultCache.compute(key, func, args, kwargs, tags, ttl, stale_ttl)
+				finally:
+					ResultCache.release(key, token)
+
+			# Miss: single-flight, waiting briefly for the worker that holds the lock
+			deadline = time.monotonic() + LOCK_WAIT
+			token = ResultCache.acquire(key)
+			while not token:
+				if time.monotonic() > deadline:
+					return func(*args, **kwargs)
+				time.sleep(LOCK_POLL)
+				value, _fresh = ResultCache.read(key, tags, stale_ttl)
+				if value is not _MISS:
+					return value
+				token = ResultCache.acquire(key)
+
+			try:
+				return ResultCache.compute(key, func, args, kwargs, tags, ttl, stale_ttl)
+			finally:
+				ResultCache.release(key, token)
+
+		wrapper.cache_tags = tags
+		return wrapper
+
+	return decorator
+
+
+def invalidate_doc_tags(doc, method=None):
+	"""doc_events hook invalidating cached results tagged with the document's doctype"""
+	queue_tag_invalidation(doc.doctype)
+
+
+def invalidate_stock_tags(doc, method=None):
+	"""
+	Stock Ledger Entry hook invalidating results tagged with Bin
+
+	Bin quantities are updated without document events, so the ledger
+	entries that move them are used instead.
+	"""
+	queue_tag_invalidation("Bin")
+
+
+def queue_tag_invalidation(*tags):
+	"""Invalidate tags once the current transaction commits, at most once per tag"""
+	pending = getattr(frappe.local, "e_mart_pending_tags", None)
+	if pending is None:
+		pending = frappe.local.e_mart_pending_tags = set()
+		frappe.db.after_commit.add(_flush_pending_tags)
+		frappe.db.after_rollback.add(_discard_pending_tags)
+	pending.update(tags)
+
+
+def _flush_pending_tags():
+	tags = getattr(frappe.local, "e_mart_pending_tags", None) or ()
+	frappe.local.e_mart_pending_tags = None
+	ResultCache.invalidate_tags(*tags)
+
+
+def _discard_pending_tags():
+	frappe.local.e_mart_pending_tags = None
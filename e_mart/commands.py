@@ -0,0 +1,147 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Bench commands for E Mart app
+"""
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-invoice-rollup")
+@click.option("--from-date", help="First posting date to rebuild (default: earliest invoice)")
+@click.option("--to-date", help="Last posting date to rebuild (default: today)")
+@pass_context
+def rebuild_invoice_rollup(context, from_date=None, to_date=None):
+	"""Backfill the Daily Invoice Rollup table from Sales and Purchase Invoices"""
+	from e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup import (
+		rebuild_invoice_rollup as rebuild,
+	)
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		written = rebuild(from_date=from_date, to_date=to_date)
+		click.echo(f"Rebuilt {written} rollup rows")
+	finally:
+		frappe.destroy()
+
+
+@click.command("reconcile-invoice-side-effects")
+@click.option(
+	"--all", "include_exhausted", is_flag=True, help="Also retry effects that used up their retries"
+)
+@click.option("--now", "run_now", is_flag=True, help="Run the effects here instead of enqueueing them")
+@pass_context
+def reconcile_invoice_side_effects(context, include_exhausted=False, run_now=False):
+	"""Re-run failed or stuck Sales Invoice side effects"""
+	from e_mart.side_effects import InvoiceSideEffects
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		results = InvoiceSideEffects.reconcile(
+			include_exhausted=include_exhausted, run_now=run_now, commit=True
+		)
+		frappe.db.commit()
+		for job_key, status in results.items():
+			click.echo(f"{job_key}: {status}")
+		click.echo(f"Reconciled {len(results)} side effects")
+	finally:
+		frappe.destroy()
+
+
+@click.command("backfill-demo-tasks")
+@click.option("--from-date", help="First posting date to backfill")
+@click.option("--to-date", help="Last posting date to backfill")
+@click.option("--chunk-size", default=200, type=int, help="Invoices per chunk")
+@pass_context
+def backfill_demo_tasks(context, from_date=None, to_date=None, chunk_size=200):
+	"""Create missing demo Tasks for submitted Sales Invoices"""
+	from e_mart.demo_tasks import DemoTaskFactory
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		created = DemoTaskFactory.backfill(from_date=from_date, to_date=to_date, chunk_size=chunk_size)
+		click.echo(f"Created {created} demo tasks")
+	finally:
+		frappe.destroy()
+
+
+@click.command("archive-old-logs")
+@click.option("--days", default=90, type=int, help="Archive logs created more than this many days ago")
+@click.option(
+	"--target", default="table", type=click.Choice(["table", "ndjson"]), help="Archive tables or NDJSON files"
+)
+@click.option("--batch-size", default=500, type=int, help="Documents per transaction")
+@click.option("--throttle", default=0.2, type=float, help="Seconds to sleep between batches")
+@click.option("--dry-run", is_flag=True, help="Only count the documents that would be archived")
+@pass_context
+def archive_old_logs(context, days=90, target="table", batch_size=500, throttle=0.2, dry_run=False):
+	"""Move old Monthly Commission Logs and Debit Note Logs out of the live tables"""
+	from e_mart.archival import archive_old_logs as archive
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		for summary in archive(days, target, batch_size, throttle, dry_run):
+			click.echo(
+				f"{summary['doctype']}: {summary['archived']} documents in {summary['batches']} batches"
+			)
+	finally:
+		frappe.destroy()
+
+
+@click.command("restore-archived-logs")
+@click.option("--doctype", help="Archived doctype to restore from its archive table")
+@click.option("--name", "names", multiple=True, help="Document to restore (repeatable)")
+@click.option("--from-date", help="First creation date to restore")
+@click.option("--to-date", help="Last creation date to restore")
+@click.option("--file", "path", help="NDJSON archive file or directory to restore instead")
+@pass_context
+def restore_archived_logs(context, doctype=None, names=None, from_date=None, to_date=None, path=None):
+	"""Restore archived logs from an archive table or NDJSON files"""
+	from e_mart.archival import LogArchiver
+
+	if not (doctype or path):
+		raise click.UsageError("Pass --doctype or --file")
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		if path:
+			restored = LogArchiver.restore_files(path)
+		else:
+			restored = LogArchiver.restore(doctype, names=list(names), from_date=from_date, to_date=to_date)
+		click.echo(f"Restored {restored} documents")
+	finally:
+		frappe.destroy()
+
+
+@click.command("rebuild-serial-provenance")
+@click.option("--chunk-size", default=1000, type=int, help="Serial or batch numbers per chunk")
+@pass_context
+def rebuild_serial_provenance(context, chunk_size=1000):
+	"""Rebuild the Serial Provenance table from submitted Serial and Batch Bundles"""
+	from e_mart.serial_provenance import ProvenanceStore
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		written = ProvenanceStore.rebuild(chunk_size=chunk_size)
+		click.echo(f"Rebuilt {written} provenance rows")
+	finally:
+		frappe.destroy()
+
+
+commands = [
+	rebuild_invoice_rollup,
+	reconcile_invoice_side_effects,
+	backfill_demo_tasks,
+	archive_old_logs,
+	restore_archived_logs,
+	rebuild_serial_provenance,
+]
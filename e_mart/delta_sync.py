@@ -0,0 +1,206 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Delta sync module for E Mart app
+Per-device change feed of upserts and tombstones ordered by (modified, name)
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from e_mart.list_query import decode_cursor, encode_cursor
+
+WATERMARK_KEY = "e_mart_mobile_sync_watermark"
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+EPOCH = "1900-01-01 00:00:00"
+
+# {doctype: {"fields": synced columns, "deleted": (column, value) that turns a row into a tombstone,
+#  "user_field": column restricting rows to the session user}}
+SOURCES = {
+	"Sales Invoice": {
+		"fields": [
+			"customer",
+			"customer_name",
+			"posting_date",
+			"grand_total",
+			"outstanding_amount",
+			"status",
+			"docstatus",
+		],
+		"deleted": ("docstatus", 2),
+	},
+	"Item": {
+		"fields": ["item_code", "item_name", "item_group", "brand", "stock_uom", "standard_rate"],
+		"deleted": ("disabled", 1),
+	},
+	"Customer": {
+		"fields": ["customer_name", "customer_group", "territory", "mobile_no", "email_id"],
+		"deleted": ("disabled", 1),
+	},
+	"Bin": {
+		"fields": ["item_code", "warehouse", "actual_qty", "reserved_qty", "projected_qty"],
+	},
+	"Notification Log": {
+		"fields": ["subject", "type", "document_type", "document_name", "read"],
+		"user_field": "for_user",
+	},
+}
+
+
+class DeltaSync:
+	"""Change feed for mobile devices"""
+
+	@staticmethod
+	def get_changes(device_id, cursor=None, limit=DEFAULT_LIMIT, doctypes=None):
+		"""
+		Get changes since the device watermark
+
+		Passing back the `next_cursor` of the previous page acknowledges it and
+		moves the device watermark forward, so an interrupted sync resumes from
+		the last page the device confirmed.
+
+		Args:
+			device_id (str): Device identifier
+			cursor (str): `next_cursor` of the previous response
+			limit (int): Maximum rows per doctype
+			doctypes (list): Subset of doctypes to sync
+
+		Returns:
+			dict: {"changes": {doctype: {"upserts", "tombstones"}}, "next_cursor", "has_more"}
+		"""
+		if not device_id:
+			frappe.throw(_("Device ID is required"))
+
+		limit = min(cint(limit) or DEFAULT_LIMIT, MAX_LIMIT)
+		doctypes = DeltaSync.get_permitted_doctypes(doctypes)
+
+		if cursor:
+			watermark = decode_cursor(cursor)
+			DeltaSync.set_watermark(device_id, watermark)
+		else:
+			watermark = DeltaSync.get_watermark(device_id)
+
+		changes = {}
+		next_watermark = dict(watermark)
+		has_more = False
+
+		for doctype in doctypes:
+			rows, more = DeltaSync.get_rows(doctype, watermark.get(doctype), limit)
+			has_more = has_more or more
+			changes[doctype] = {"upserts": [], "tombstones": []}
+			for row in rows:
+				key = "tombstones" if row.pop("_deleted", 0) else "upserts"
+				changes[doctype][key].append(row.name if key == "tombstones" else row)
+			if rows:
+				next_watermark[doctype] = [str(rows[-1].modified), rows[-1].name]
+
+		deleted, more = DeltaSync.get_deleted(doctypes, watermark.get("Deleted Document"), limit)
+		has_more = has_more or more
+		for row in deleted:
+			changes[row.deleted_doctype]["tombstones"].append(row.deleted_name)
+		if deleted:
+			next_watermark["Deleted Document"] = [str(deleted[-1].creation), deleted[-1].name]
+
+		return {"changes": changes, "next_cursor": encode_cursor(next_watermark), "has_more": has_more}
+
+	@staticmethod
+	def get_permitted_doctypes(doctypes=None):
+		"""
+		Doctypes to sync for the session user
+
+		Explicitly requested doctypes must be readable; by default every source
+		the user can read is synced and the others are left out.
+		"""
+		if not doctypes:
+			return [doctype for doctype in SOURCES if frappe.has_permission(doctype, "read")]
+
+		doctypes = [doctype for doctype in doctypes if doctype in SOURCES]
+		for doctype in doctypes:
+			frappe.has_permission(doctype, "read", throw=True)
+		return doctypes
+
+	@staticmethod
+	def get_rows(doctype, after, limit):
+		"""
+		Get rows of a doctype modified after an (modified, name) position
+
+		Rows are read through frappe.get_list, so user permissions and
+		permission query conditions apply.
+
+		Returns:
+			tuple: (rows, has_more)
+		"""
+		source = SOURCES[doctype]
+		modified, name = after or (EPOCH, "")
+		deleted_field, deleted_value = source.get("deleted") or (None, None)
+
+		filters = [["modified", ">=", modified]]
+		if source.get("user_field"):
+			filters.append([source["user_field"], "=", frappe.session.user])
+
+		fields = ["name", "modified", *source["fields"]]
+		if deleted_field and deleted_field not in fields:
+			fields.append(deleted_field)
+
+		rows = frappe.get_list(
+			doctype,
+			fields=fields,
+			filters=filters,
+			or_filters=[["modified", ">", modified], ["name", ">", name]],
+			order_by="modified asc, name asc",
+			limit_page_length=limit + 1,
+		)
+		for row in rows:
+			row["_deleted"] = int(bool(deleted_field) and row.get(deleted_field) == deleted_value)
+			if deleted_field and deleted_field not in source["fields"]:
+				row.pop(deleted_field, None)
+		return rows[:limit], len(rows) > limit
+
+	@staticmethod
+	def get_deleted(doctypes, after, limit):
+		"""
+		Get hard deletes recorded in Deleted Document after a (creation, name) position
+
+		Returns:
+			tuple: (rows, has_more)
+		"""
+		if not doctypes:
+			return [], False
+
+		creation, name = after or (EPOCH, "")
+		rows = frappe.db.sql(
+			"""
+			SELECT name, creation, deleted_doctype, deleted_name
+			FROM `tabDeleted Document`
+			WHERE deleted_doctype IN %(doctypes)s
+				AND (creation > %(creation)s OR (creation = %(creation)s AND name > %(name)s))
+			ORDER BY creation ASC, name ASC
+			LIMIT %(limit)s
+		""",
+			{"doctypes": tuple(doctypes), "creation": creation, "name": name, "limit": limit + 1},
+			as_dict=True,
+		)
+		return rows[:limit], len(rows) > limit
+
+	@staticmethod
+	def get_watermark(device_id):
+		"""Get the acknowledged watermark of a device"""
+		return frappe.cache().hget(WATERMARK_KEY, DeltaSync._device_key(device_id)) or {}
+
+	@staticmethod
+	def set_watermark(device_id, watermark):
+		"""Store the acknowledged watermark of a device"""
+		frappe.cache().hset(WATERMARK_KEY, DeltaSync._device_key(device_id), watermark)
+
+	@staticmethod
+	def reset_watermark(device_id):
+		"""Force a full resync of a device"""
+		frappe.cache().hdel(WATERMARK_KEY, DeltaSync._device_key(device_id))
+
+	@staticmethod
+	def _device_key(device_id):
+		"""Watermarks are scoped per user so shared devices never leak changes"""
+		return f"{frappe.session.user}:{device_id}"
@@ -0,0 +1,287 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Demo task module for E Mart app
+Builds the demo Tasks of Sales Invoices in bulk, on submit and as a chunked backfill
+"""
+
+import frappe
+from frappe import _
+from frappe.model.naming import parse_naming_series
+from frappe.utils import add_days, cint, getdate, now
+
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+
+BACKFILL_CHUNK_SIZE = 200
+
+
+class DemoTaskFactory:
+	"""Bulk Task creation for demo-required invoice items"""
+
+	@staticmethod
+	def get_settings():
+		"""
+		Get the demo task settings
+
+		Returns:
+			frappe._dict: subject, task_type, minimal_duration, escalation_duration
+		"""
+		return frappe._dict(
+			subject=SettingsCache.get_str("subject", "Demo Required - {item_name} [{invoice_name}]"),
+			task_type=SettingsCache.get_str("task_type", "Demo"),
+			minimal_duration=SettingsCache.get_int("minimal_duration"),
+			escalation_duration=SettingsCache.get_int("escalation_duration"),
+		)
+
+	@staticmethod
+	def build_rows(invoice, items, settings=None):
+		"""
+		Build Task values for the demo-required items of an invoice
+
+		Args:
+			invoice (dict): name, posting_date, customer
+			items (list): Invoice items with item_code, item_name, qty, is_demo_reqd
+			settings (dict): Result of `get_settings`
+
+		Returns:
+			list: Task field values, one per demo-required item
+		"""
+		settings = settings or DemoTaskFactory.get_settings()
+		posting_date = getdate(invoice.get("posting_date"))
+		exp_start_date = add_days(posting_date, settings.minimal_duration)
+		exp_end_date = add_days(posting_date, settings.escalation_duration)
+
+		return [
+			{
+				"subject": settings.subject.format(
+					item_name=item.get("item_name"), invoice_name=invoice.get("name")
+				),
+				"type": settings.task_type,
+				"status": "Open",
+				"reference_type": "Sales Invoice",
+				"reference_name": invoice.get("name"),
+				"description": (
+					f"Demo required for Item: {item.get('item_name')} ({item.get('item_code')})\n"
+					f"Qty: {item.get('qty')}\n"
+					f"Customer: {invoice.get('customer')}\n"
+				),
+				"invoice_date": posting_date,
+				"invoice_reference": invoice.get("name"),
+				"customer": invoice.get("customer"),
+				"exp_start_date": exp_start_date,
+				"exp_end_date": exp_end_date,
+			}
+			for item in items
+			if item.get("is_demo_reqd")
+		]
+
+	@staticmethod
+	def insert(rows):
+		"""
+		Insert Tasks with one bulk INSERT
+
+		The rows are root Tasks without project, parent or dependencies, so of
+		Task's validate and on_update only the date check and the nested set
+		update apply; both are done here for the whole batch. Names come from
+		the naming series in one counter update. When Task is not series named
+		or other apps hook into Task documents, every Task goes through the
+		controller instead.
+
+		Args:
+			rows (list): Task field values
+
+		Returns:
+			list: Names of the inserted Tasks
+		"""
+		if not rows:
+			return []
+
+		names = DemoTaskFactory.reserve_names(len(rows)) if DemoTaskFactory.can_bulk_insert() else []
+		if not names:
+			return [
+				frappe.get_doc({"doctype": "Task", **row}).insert(ignore_permissions=True).name
+				for row in rows
+			]
+
+		for row in rows:
+			if getdate(row["exp_start_date"]) > getdate(row["exp_end_date"]):
+				frappe.throw(
+					_("{0} can not be greater than {1}").format(
+						frappe.bold(_("Expected Start Date")), frappe.bold(_("Expected End Date"))
+					)
+				)
+
+		template = frappe.new_doc("Task").get_valid_dict(convert_dates_to_str=True, ignore_nulls=False)
+		columns = [column for column in frappe.get_meta("Task").get_valid_columns() if column in template]
+		left = DemoTaskFactory.reserve_tree_bounds(len(rows))
+		timestamp = now()
+		user = frappe.session.user
+
+		values = []
+		for index, (name, row) in enumerate(zip(names, rows, strict=True)):
+			doc = {
+				**template,
+				**row,
+				"name": name,
+				"owner": user,
+				"modified_by": user,
+				"creation": timestamp,
+				"modified": timestamp,
+				"docstatus": 0,
+				"lft": left + 2 * index,
+				"rgt": left + 2 * index + 1,
+			}
+			values.append([doc.get(column) for column in columns])
+
+		frappe.db.bulk_insert("Task", columns, values)
+		frappe.publish_realtime("list_update", {"doctype": "Task"}, after_commit=True)
+		return names
+
+	@staticmethod
+	def can_bulk_insert():
+		"""
+		Whether Tasks can skip the controller
+
+		Returns:
+			bool: False when another app registers doc_events for Task
+		"""
+		return not frappe.get_hooks("doc_events").get("Task")
+
+	@staticmethod
+	def reserve_names(count):
+		"""
+		Reserve `count` consecutive names from the Task naming series
+
+		Returns:
+			list: Names, or an empty list when Task is not series named
+		"""
+		meta = frappe.get_meta("Task")
+		autoname = meta.autoname or ""
+		if autoname.startswith("naming_series:"):
+			series_field = meta.get_field("naming_series")
+			autoname = (
+				(series_field.default or (series_field.options or "").split("\n")[0]) if series_field else ""
+			)
+
+		prefix_part, _sep, hashes = autoname.rpartition(".")
+		if not hashes or set(hashes) != {"#"}:
+			return []
+
+		prefix = parse_naming_series(prefix_part)
+		if not frappe.db.exists("Series", prefix):
+			frappe.db.sql("INSERT INTO `tabSeries` (name, current) VALUES (%s, 0)", prefix)
+		# The counter row stays locked until commit, like getseries does for one name
+		frappe.db.sql("UPDATE `tabSeries` SET current = current + %s WHERE name = %s", (count, prefix))
+		end = cint(frappe.db.get_value("Series", prefix, "current"))
+
+		return [f"{prefix}{str(number).zfill(len(hashes))}" for number in range(end - count + 1, end + 1)]
+
+	@staticmethod
+	def reserve_tree_bounds(count):
+		"""
+		Make room for `count` root Tasks at the right edge of the Task tree
+
+		Follows frappe.utils.nestedset.update_add_node for root nodes, with the
+		rightmost root locked so concurrent batches append one after another.
+
+		Returns:
+			int: lft of the first new Task
+		"""
+		rightmost = frappe.db.sql(
+			"""
+			SELECT rgt FROM `tabTask`
+			WHERE COALESCE(parent_task, '') = ''
+			ORDER BY rgt DESC
+			LIMIT 1
+			FOR UPDATE
+		"""
+		)
+		right = (cint(rightmost[0][0]) if rightmost else 0) + 1
+		frappe.db.sql("UPDATE `tabTask` SET rgt = rgt + %s WHERE rgt >= %s", (2 * count, right))
+		frappe.db.sql("UPDATE `tabTask` SET lft = lft + %s WHERE lft >= %s", (2 * count, right))
+		return right
+
+	@staticmethod
+	def create_for_invoice(doc):
+		"""
+		Create the demo Tasks of a Sales Invoice document
+
+		Returns:
+			list: Names of the created Tasks
+		"""
+		return DemoTaskFactory.insert(DemoTaskFactory.build_rows(doc.as_dict(), doc.items))
+
+	@staticmethod
+	def backfill(from_date=None, to_date=None, chunk_size=BACKFILL_CHUNK_SIZE):
+		"""
+		Create demo Tasks for submitted invoices that have none
+
+		Invoices are read in keyset chunks by name together with their
+		demo-required items, and every chunk is committed on its own.
+
+		Args:
+			from_date: First posting date (optional)
+			to_date: Last posting date (optional)
+			chunk_size (int): Invoices per chunk
+
+		Returns:
+			int: Number of Tasks created
+		"""
+		settings = DemoTaskFactory.get_settings()
+		conditions = [
+			"si.docstatus = 1",
+			"si.name > %(after)s",
+			"""EXISTS (SELECT 1 FROM `tabSales Invoice Item` sii
+				WHERE sii.parent = si.name AND sii.parenttype = 'Sales Invoice' AND sii.is_demo_reqd = 1)""",
+			"NOT EXISTS (SELECT 1 FROM `tabTask` t WHERE t.invoice_reference = si.name)",
+		]
+		values = {"after": "", "limit": cint(chunk_size)}
+		if from_date:
+			conditions.append("si.posting_date >= %(from_date)s")
+			values["from_date"] = getdate(from_date)
+		if to_date:
+			conditions.append("si.posting_date <= %(to_date)s")
+			values["to_date"] = getdate(to_date)
+
+		created = 0
+		while True:
+			invoices = frappe.db.sql(
+				f"""
+				SELECT si.name, si.posting_date, si.customer
+				FROM `tabSales Invoice` si
+				WHERE {" AND ".join(conditions)}
+				ORDER BY si.name
+				LIMIT %(limit)s
+			""",
+				values,
+				as_dict=True,
+			)
+			if not invoices:
+				break
+
+			items = {}
+			for item in frappe.get_all(
+				"Sales Invoice Item",
+				filters={
+					"parent": ["in", [invoice.name for invoice in invoices]],
+					"parenttype": "Sales Invoice",
+					"is_demo_reqd": 1,
+				},
+				fields=["parent", "item_code", "item_name", "qty", "is_demo_reqd"],
+				order_by="parent, idx",
+			):
+				items.setdefault(item.parent, []).append(item)
+
+			rows = []
+			for invoice in invoices:
+				rows += DemoTaskFactory.build_rows(invoice, items.get(invoice.name, []), settings)
+
+			created += len(DemoTaskFactory.insert(rows))
+			frappe.db.commit()
+
+			values["after"] = invoices[-1].name
+			if len(invoices) < cint(chunk_size):
+				break
+
+		return created
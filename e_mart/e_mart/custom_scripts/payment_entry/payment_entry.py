@@ -1,17 +1,66 @@
 import frappe
+from frappe.utils import flt, now
+
+from e_mart.cache import queue_tag_invalidation
 
 
 def update_down_payment_status(doc, method):
 	"""
-	On Payment Entry Submit:
-	If fully paid down payment for Sales Invoice, mark down_payment_paid = 1.
+	On Payment Entry Submit/Cancel:
+	Mark down_payment_paid on the referenced Sales Invoices whose submitted
+	payments, across all Payment Entries, cover the down payment amount.
 	"""
-	for ref in doc.references:
-		if ref.reference_doctype == "Sales Invoice":
-			si_name = ref.reference_name
+	invoices = {
+		ref.reference_name
+		for ref in doc.references
+		if ref.reference_doctype == "Sales Invoice" and ref.reference_name
+	}
+	if not invoices:
+		return
+
+	down_payments = frappe.db.sql(
+		"""
+		SELECT name, down_payment_amount, down_payment_paid
+		FROM `tabSales Invoice`
+		WHERE name IN %(invoices)s AND docstatus = 1 AND down_payment = 1 AND down_payment_amount > 0
+	""",
+		{"invoices": tuple(invoices)},
+		as_dict=True,
+	)
+	if not down_payments:
+		return
+
+	allocated = dict(
+		frappe.db.sql(
+			"""
+			SELECT per.reference_name, SUM(per.allocated_amount)
+			FROM `tabPayment Entry Reference` per
+			INNER JOIN `tabPayment Entry` pe ON pe.name = per.parent
+			WHERE per.parenttype = 'Payment Entry' AND per.reference_doctype = 'Sales Invoice'
+				AND per.reference_name IN %(invoices)s AND pe.docstatus = 1
+			GROUP BY per.reference_name
+		""",
+			{"invoices": tuple(row.name for row in down_payments)},
+		)
+	)
+
+	precision = frappe.get_precision("Sales Invoice", "down_payment_amount") or 2
+	changes = {0: [], 1: []}
+	for row in down_payments:
+		paid = int(flt(allocated.get(row.name), precision) >= flt(row.down_payment_amount, precision))
+		if paid != row.down_payment_paid:
+			changes[paid].append(row.name)
 
-			down_payment = frappe.db.get_value("Sales Invoice", si_name, "down_payment")
-			down_payment_amount = frappe.db.get_value("Sales Invoice", si_name, "down_payment_amount")
+	for paid, names in changes.items():
+		if names:
+			frappe.db.sql(
+				"""
+				UPDATE `tabSales Invoice`
+				SET down_payment_paid = %(paid)s, modified = %(modified)s, modified_by = %(user)s
+				WHERE name IN %(names)s
+			""",
+				{"paid": paid, "modified": now(), "user": frappe.session.user, "names": tuple(names)},
+			)
 
-			if down_payment and down_payment_amount and doc.paid_amount == down_payment_amount:
-				frappe.db.set_value("Sales Invoice", si_name, "down_payment_paid", 1)
+	if changes[0] or changes[1]:
+		queue_tag_invalidation("Sales Invoice")
@@ -0,0 +1,71 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import frappe
+from erpnext.accounts.doctype.payment_entry.payment_entry import get_payment_entry
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from frappe.tests.utils import FrappeTestCase
+
+
+def make_down_payment_invoice(down_payment_amount, rate=1000):
+	"""Submitted Sales Invoice with a down payment"""
+	invoice = create_sales_invoice(qty=1, rate=rate, do_not_submit=True)
+	invoice.down_payment = 1
+	invoice.down_payment_amount = down_payment_amount
+	invoice.submit()
+	return invoice
+
+
+def make_payment_entry(allocations):
+	"""Submitted Payment Entry allocating {sales_invoice: amount}"""
+	payment_entry = get_payment_entry(
+		"Sales Invoice", next(iter(allocations)), bank_account="_Test Cash - _TC"
+	)
+	payment_entry.set("references", [])
+	for invoice, amount in allocations.items():
+		payment_entry.append(
+			"references",
+			{"reference_doctype": "Sales Invoice", "reference_name": invoice, "allocated_amount": amount},
+		)
+	payment_entry.paid_amount = payment_entry.received_amount = sum(allocations.values())
+	payment_entry.insert()
+	payment_entry.submit()
+	return payment_entry
+
+
+class TestPaymentEntry(FrappeTestCase):
+	"""Test cases for the Payment Entry down payment hook"""
+
+	def is_paid(self, invoice):
+		return frappe.db.get_value("Sales Invoice", invoice.name, "down_payment_paid")
+
+	def test_partial_payments_reach_down_payment(self):
+		"""Test the down payment is paid once submitted entries add up to it"""
+		invoice = make_down_payment_invoice(400)
+
+		make_payment_entry({invoice.name: 150})
+		self.assertEqual(self.is_paid(invoice), 0)
+
+		make_payment_entry({invoice.name: 250})
+		self.assertEqual(self.is_paid(invoice), 1)
+
+	def test_multi_invoice_entry_counts_allocated_amount(self):
+		"""Test an entry paying several invoices counts only each invoice's allocation"""
+		first = make_down_payment_invoice(300)
+		second = make_down_payment_invoice(350)
+
+		# The entry's total (400) covers the second down payment, its allocation (100) does not
+		make_payment_entry({first.name: 300, second.name: 100})
+
+		self.assertEqual(self.is_paid(first), 1)
+		self.assertEqual(self.is_paid(second), 0)
+
+	def test_cancel_resets_down_payment(self):
+		"""Test cancelling an entry clears the flag once the rest no longer covers the down payment"""
+		invoice = make_down_payment_invoice(400)
+		make_payment_entry({invoice.name: 150})
+		payment_entry = make_payment_entry({invoice.name: 250})
+		self.assertEqual(self.is_paid(invoice), 1)
+
+		payment_entry.cancel()
+		self.assertEqual(self.is_paid(invoice), 0)
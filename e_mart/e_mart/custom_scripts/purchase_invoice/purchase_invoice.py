@@ -3,6 +3,8 @@
 
 import frappe
 
+from e_mart.archival import LogArchiver
+
 
 def update_schema_discount_amount(doc, method):
 	"""
@@ -27,7 +29,9 @@ def create_debit_note_log(purchase_invoice):
 	Creates a Debit Note Log from a submitted Purchase Invoice
 	"""
 	exists = frappe.db.exists("Debit Note Log", {"purchase_invoice": purchase_invoice.name})
-	if exists:
+	# Archived logs are gone from the live table but still count
+	archived = LogArchiver.is_archived("Debit Note Log", "purchase_invoice", purchase_invoice.name)
+	if exists or archived:
 		frappe.msgprint(f"Debit Note Log already exists for {purchase_invoice.name}")
 		return
 
@@ -1,12 +1,24 @@
 import frappe
 
+from e_mart.purchase_category import PurchaseCategoryResolver
+
 
 def fetch_purchase_category(doc, method=None):
 	"""
-	Sets the purchase category in the document based on the linked Purchase Order of items.
+	Sets the purchase category in the document based on the linked Purchase Orders of items.
+	All distinct Purchase Orders are resolved in a single query; "Special" wins over "Normal"
+	when the linked orders disagree.
 	"""
-	for item in doc.items:
-		if item.purchase_order:
-			po_category = frappe.db.get_value("Purchase Order", item.purchase_order, "purchase_category")
-			if po_category:
-				doc.purchase_category = po_category
+	purchase_orders = [item.purchase_order for item in doc.items if item.purchase_order]
+	if not purchase_orders:
+		return
+
+	categories = PurchaseCategoryResolver.get_purchase_order_categories(purchase_orders)
+	if not categories:
+		return
+
+	if "Special" in categories.values():
+		doc.purchase_category = "Special"
+	else:
+		# Keep the category of the first linked order that has one
+		doc.purchase_category = next(categories[po] for po in purchase_orders if po in categories)
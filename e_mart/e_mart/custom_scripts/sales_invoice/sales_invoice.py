@@ -1,15 +1,18 @@
-from datetime import datetime
-
 import frappe
 from frappe.model.mapper import get_mapped_doc
-from frappe.utils import add_days, add_months, flt, get_first_day, get_last_day, get_url_to_form, nowdate
+from frappe.utils import cint, flt, get_url_to_form, nowdate
+
+from e_mart.demo_tasks import DemoTaskFactory
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+from e_mart.e_mart.doctype.monthly_commission_log.monthly_commission_log import add_invoice_commissions
+from e_mart.emi import EmiSchedule
+from e_mart.side_effects import enqueue_invoice_side_effects
 
 
 def on_submit(doc, method=None):
-	create_scrap_stock_entry(doc, method)
-	create_buyback_journal_entry(doc, method)
-	create_demo_tasks_on_submit(doc, method)
-	update_monthly_commission_log(doc, method)
+	# Scrap stock entry, buyback journal entry, demo tasks and commission log
+	# are created by background jobs once the submit has been committed
+	enqueue_invoice_side_effects(doc, method)
 
 
 def validate_buyback_fields(doc, method=None):
@@ -57,7 +60,7 @@ def create_scrap_stock_entry(doc, method):
 	if not doc.buyback_items:
 		return
 
-	scrap_warehouse = frappe.db.get_single_value("E-mart Settings", "scrap_warehouse")
+	scrap_warehouse = SettingsCache.get("scrap_warehouse")
 	if not scrap_warehouse:
 		frappe.throw("Please set the Scrap Warehouse in E-mart Settings.")
 
@@ -120,13 +123,11 @@ def generate_emi_schedule(doc, method):
 	if not doc.emi_amount:
 		frappe.throw("Please set EMI Amount.")
 
-	doc.set("emi_duration", [])  # Clear existing table
-
-	installment_amount = flt(doc.emi_amount) / int(doc.no_of_installment)
-
-	for i in range(int(doc.no_of_installment)):
-		installment_date = add_months(doc.emi_date, i)
-		doc.append("emi_duration", {"date": installment_date, "amount": installment_amount})
+	precision = doc.precision("amount", "emi_duration") or 2
+	doc.set(
+		"emi_duration",
+		EmiSchedule.build(doc.emi_date, doc.emi_amount, int(doc.no_of_installment), cint(precision)),
+	)
 
 
 @frappe.whitelist()
@@ -237,7 +238,7 @@ def create_buyback_journal_entry(doc, method):
 	if not company:
 		frappe.throw(f"Company not found for Sales Invoice {doc.name}")
 
-	buyback_account = frappe.db.get_single_value("E-mart Settings", "buyback_posting_account")
+	buyback_account = SettingsCache.get("buyback_posting_account")
 	if not buyback_account:
 		frappe.throw("Please set 'Buyback Posting Account' in E-mart Settings.")
 
@@ -285,40 +286,9 @@ def create_demo_tasks_on_submit(doc, method=None):
 	Create a Task for each Sales Invoice Item where is_demo_reqd is checked.
 	Subject, Task Type, Minimal Duration, Escalation Duration come from E-mart Settings.
 	Maps invoice_date, invoice_reference, customer, exp_start_date, and end_date into Task.
+	All Tasks of the invoice are written with one bulk insert.
 	"""
-
-	settings = frappe.get_single("E-mart Settings")
-	task_subject_template = settings.subject or "Demo Required - {item_name} [{invoice_name}]"
-	task_type = settings.task_type or "Demo"
-	minimal_duration = settings.minimal_duration or 0
-	escalation_duration = settings.escalation_duration or 0
-
-	for item in doc.items:
-		if item.get("is_demo_reqd"):
-			subject = task_subject_template.format(item_name=item.item_name, invoice_name=doc.name)
-
-			exp_start_date = add_days(doc.posting_date, minimal_duration)
-			end_date = add_days(doc.posting_date, escalation_duration)
-
-			task = frappe.new_doc("Task")
-			task.subject = subject
-			task.type = task_type
-			task.status = "Open"
-			task.reference_type = "Sales Invoice"
-			task.reference_name = doc.name
-			task.description = (
-				f"Demo required for Item: {item.item_name} ({item.item_code})\n"
-				f"Qty: {item.qty}\n"
-				f"Customer: {doc.customer}\n"
-			)
-
-			task.invoice_date = doc.posting_date
-			task.invoice_reference = doc.name
-			task.customer = doc.customer
-			task.exp_start_date = exp_start_date
-			task.exp_end_date = end_date
-
-			task.insert(ignore_permissions=True)
+	DemoTaskFactory.create_for_invoice(doc)
 
 
 def update_monthly_commission_log(doc, method):
@@ -326,51 +296,10 @@ def update_monthly_commission_log(doc, method):
 	Create or update Monthly Commission Log for each Sales Person in the Sales Invoice.
 	Logs incentives and invoice details for the respective employee and month.
 	"""
-	invoice_date = datetime.strptime(doc.posting_date, "%Y-%m-%d").date()
-	month_start = get_first_day(invoice_date)
-	month_end = get_last_day(invoice_date)
-	month_name = invoice_date.strftime("%B")
-
-	for sales_team_member in doc.sales_team:
-		sales_person = sales_team_member.sales_person
-		incentives = sales_team_member.incentive or 0
-
-		# Get the Employee linked to Sales Person
-		employee = frappe.db.get_value("Sales Person", sales_person, "employee")
-		if not employee:
-			frappe.log_error(f"Sales Person {sales_person} has no linked Employee.", "Monthly Commission Log")
-			continue
-
-		# Check if Monthly Commission Log exists
-		log_name = frappe.db.exists(
-			"Monthly Commission Log",
-			{"employee": employee, "log_month": month_name, "start_date": month_start, "end_date": month_end},
-		)
-
-		if log_name:
-			log = frappe.get_doc("Monthly Commission Log", log_name)
-		else:
-			log = frappe.new_doc("Monthly Commission Log")
-			log.employee = employee
-			log.log_month = month_name
-			log.start_date = month_start
-			log.end_date = month_end
-
-		# Append detail row
-		log.append(
-			"monthly_commission_log",
-			{
-				"sales_invoice": doc.name,
-				"date": invoice_date,
-				"total_amount": doc.base_grand_total,
-				"incentives": incentives,
-			},
-		)
-
-		log.save(ignore_permissions=True)
-		link = get_url_to_form("Monthly Commission Log", log.name)
+	for log_name in add_invoice_commissions(doc):
+		link = get_url_to_form("Monthly Commission Log", log_name)
 		frappe.msgprint(
-			f'Monthly Commission Log Created/Updated: <a href="{link}" target="_blank"><b>{log.name}</b></a>',
+			f'Monthly Commission Log Created/Updated: <a href="{link}" target="_blank"><b>{log_name}</b></a>',
 			alert=True,
 			indicator="green",
 		)
@@ -0,0 +1,57 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import getdate
+
+from e_mart.demo_tasks import DemoTaskFactory
+
+
+def make_demo_rows(invoice_name, count):
+	"""Demo Task rows for `count` demo-required items of an invoice"""
+	invoice = {"name": invoice_name, "posting_date": getdate(), "customer": "_Test Customer"}
+	items = [
+		{"item_code": "_Test Item", "item_name": f"_Test Item {index}", "qty": 1, "is_demo_reqd": 1}
+		for index in range(count)
+	]
+	return DemoTaskFactory.build_rows(invoice, items)
+
+
+class TestSalesInvoiceDemoTasks(FrappeTestCase):
+	"""Test cases for the demo Tasks of Sales Invoices"""
+
+	def test_bulk_insert_matches_controller(self):
+		"""Test bulk inserted Tasks get series names and a valid place in the Task tree"""
+		if not DemoTaskFactory.can_bulk_insert():
+			self.skipTest("Task has doc_events hooks, Tasks go through the controller")
+
+		names = DemoTaskFactory.insert(make_demo_rows("_Test Demo Invoice", 3))
+		self.assertEqual(len(set(names)), 3)
+
+		tasks = frappe.get_all(
+			"Task",
+			filters={"name": ["in", names]},
+			fields=["name", "lft", "rgt", "status", "invoice_reference"],
+			order_by="lft",
+		)
+		self.assertEqual([task.name for task in tasks], names)
+		for index, task in enumerate(tasks):
+			self.assertEqual(task.rgt, task.lft + 1)
+			self.assertEqual(task.lft, tasks[0].lft + 2 * index)
+			self.assertEqual(task.status, "Open")
+			self.assertEqual(task.invoice_reference, "_Test Demo Invoice")
+
+		# No other Task overlaps the new bounds
+		self.assertFalse(
+			frappe.db.sql(
+				"SELECT name FROM `tabTask` WHERE name NOT IN %s AND rgt >= %s AND lft <= %s",
+				(tuple(names), tasks[0].lft, tasks[-1].rgt),
+			)
+		)
+
+		# A Task created through the controller afterwards lands after the batch
+		task = frappe.get_doc({"doctype": "Task", "subject": "_Test Task After Demo Batch"}).insert()
+		task.reload()
+		self.assertGreater(task.lft, tasks[-1].rgt)
+		self.assertNotIn(task.name, names)
@@ -1,64 +1,75 @@
 import frappe
 
+from e_mart.serial_provenance import ProvenanceResolver
 
-def set_purchase_category_from_voucher(doc, method):
+VOUCHER_TYPES = ("Purchase Receipt", "Purchase Invoice", "Stock Reconciliation")
+
+
+def propagate_purchase_category(doc, method=None):
 	"""
-	Fetches and sets the purchase category from either Purchase Receipt or Purchase Invoice
-	to each entry row.
+	Set the Purchase Category of the bundle's entries on submit
+
+	The category comes from the voucher when it has one; otherwise each entry
+	without a category takes the one of the latest other entry of its Serial
+	No, or failing that of its Batch No. Rows are updated in place with one
+	UPDATE per category, so the submitted bundle is never saved again.
 	"""
-	if (
-		doc.voucher_type not in ["Purchase Receipt", "Purchase Invoice", "Stock Reconciliation"]
-		or not doc.voucher_no
-	):
+	if not doc.entries:
 		return
 
-	try:
-		source_doc = frappe.get_doc(doc.voucher_type, doc.voucher_no)
-	except frappe.DoesNotExistError:
-		return
+	voucher_category = get_voucher_category(doc)
+	if voucher_category:
+		categories = {entry.name: voucher_category for entry in doc.entries}
+	else:
+		categories = get_previous_categories(doc)
+
+	current = {entry.name: entry.purchase_category for entry in doc.entries}
+	categories = {
+		name: category for name, category in categories.items() if category and category != current[name]
+	}
 
-	purchase_category = source_doc.get("purchase_category")
-	if not purchase_category:
+	if not categories:
 		return
 
-	for row in doc.entries:
-		row.purchase_category = purchase_category
+	update_entry_categories(doc, categories)
 
-	doc.save(ignore_permissions=True)
 
+def get_voucher_category(doc):
+	"""Purchase Category of the bundle's voucher, read as a single column"""
+	if doc.voucher_type not in VOUCHER_TYPES or not doc.voucher_no:
+		return None
+	return frappe.db.get_value(doc.voucher_type, doc.voucher_no, "purchase_category")
 
-def set_purchase_category_on_creation(doc, method=None):
+
+def get_previous_categories(doc):
 	"""
-	On creation of Serial and Batch Bundle, set Purchase Category
-	in child entries if Serial No or Batch No was already used elsewhere.
+	Categories of entries that have none, from earlier entries of the same serials or batches
+
+	Returns:
+		dict: {entry name: purchase category}
 	"""
-	updated = False
+	pending = [entry for entry in doc.entries if not entry.purchase_category]
+	if not pending:
+		return {}
+	return ProvenanceResolver.resolve(pending, exclude_parent=doc.name)
+
+
+def update_entry_categories(doc, categories):
+	"""Write categories to the entry rows with one UPDATE per category and mirror them on `doc`"""
+	names_by_category = {}
+	for name, category in categories.items():
+		names_by_category.setdefault(category, []).append(name)
+
+	for category, names in names_by_category.items():
+		frappe.db.sql(
+			"""
+			UPDATE `tabSerial and Batch Entry`
+			SET purchase_category = %(category)s
+			WHERE parent = %(parent)s AND name IN %(names)s
+		""",
+			{"category": category, "parent": doc.name, "names": tuple(names)},
+		)
 
 	for entry in doc.entries:
-		if entry.purchase_category:
-			continue
-
-		purchase_category = None
-
-		if entry.serial_no:
-			purchase_category = frappe.db.get_value(
-				"Serial and Batch Entry",
-				{"serial_no": entry.serial_no, "parent": ["!=", doc.name]},
-				"purchase_category",
-				order_by="creation desc",
-			)
-
-		if not purchase_category and entry.batch_no:
-			purchase_category = frappe.db.get_value(
-				"Serial and Batch Entry",
-				{"batch_no": entry.batch_no, "parent": ["!=", doc.name]},
-				"purchase_category",
-				order_by="creation desc",
-			)
-
-		if purchase_category:
-			entry.purchase_category = purchase_category
-			updated = True
-
-	if updated:
-		doc.save(ignore_permissions=True)
+		if entry.name in categories:
+			entry.purchase_category = categories[entry.name]
@@ -0,0 +1,102 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from e_mart.e_mart.custom_scripts.serial_and_batch_bundle.serial_and_batch_bundle import (
+	propagate_purchase_category,
+)
+
+
+def make_entries(parent, rows, creation=None):
+	"""Insert submitted Serial and Batch Entry rows of a bundle; rows are (serial_no, batch_no, category)"""
+	for idx, (serial_no, batch_no, category) in enumerate(rows, start=1):
+		frappe.get_doc(
+			{
+				"doctype": "Serial and Batch Entry",
+				"name": f"{parent}-{idx}",
+				"parent": parent,
+				"parenttype": "Serial and Batch Bundle",
+				"parentfield": "entries",
+				"idx": idx,
+				"serial_no": serial_no,
+				"batch_no": batch_no,
+				"qty": 1,
+				"purchase_category": category,
+				"docstatus": 1,
+				"creation": creation,
+				"modified": creation,
+			}
+		).db_insert()
+
+
+def make_bundle(name, rows, voucher_type="Purchase Receipt", voucher_no=None):
+	"""In-memory bundle whose entries are the rows inserted by make_entries"""
+	make_entries(name, rows)
+	doc = frappe.new_doc("Serial and Batch Bundle")
+	doc.name = name
+	doc.voucher_type = voucher_type
+	doc.voucher_no = voucher_no
+	for idx, (serial_no, batch_no, category) in enumerate(rows, start=1):
+		doc.append(
+			"entries",
+			{
+				"name": f"{name}-{idx}",
+				"serial_no": serial_no,
+				"batch_no": batch_no,
+				"purchase_category": category,
+			},
+		)
+	return doc
+
+
+class TestSerialAndBatchBundle(FrappeTestCase):
+	"""Test cases for the Serial and Batch Bundle purchase category hook"""
+
+	def get_category(self, entry):
+		return frappe.db.get_value("Serial and Batch Entry", entry, "purchase_category")
+
+	def test_category_from_voucher(self):
+		"""Test every entry takes the category of the bundle's voucher"""
+		frappe.get_doc(
+			{"doctype": "Purchase Receipt", "name": "_Test EM PR 0001", "purchase_category": "Special"}
+		).db_insert()
+		doc = make_bundle(
+			"_Test EM SABB V",
+			[("_Test EM SN-V1", None, None), ("_Test EM SN-V2", None, "Normal")],
+			voucher_no="_Test EM PR 0001",
+		)
+
+		propagate_purchase_category(doc)
+
+		self.assertEqual(self.get_category("_Test EM SABB V-1"), "Special")
+		self.assertEqual(self.get_category("_Test EM SABB V-2"), "Special")
+		self.assertEqual([entry.purchase_category for entry in doc.entries], ["Special", "Special"])
+
+	def test_category_from_history(self):
+		"""Test entries without a voucher category take the latest category of their serial, else batch"""
+		make_entries(
+			"_Test EM SABB H0",
+			[("_Test EM SN-H1", None, "Normal"), (None, "_Test EM BN-H", "Special")],
+			creation="2020-01-01 00:00:00",
+		)
+		make_entries(
+			"_Test EM SABB H1", [("_Test EM SN-H1", None, "Special")], creation="2020-01-02 00:00:00"
+		)
+		doc = make_bundle(
+			"_Test EM SABB H",
+			[
+				("_Test EM SN-H1", None, None),
+				("_Test EM SN-H2", "_Test EM BN-H", None),
+				("_Test EM SN-H3", None, None),
+			],
+			voucher_type="Delivery Note",
+			voucher_no="_Test EM DN 0001",
+		)
+
+		propagate_purchase_category(doc)
+
+		self.assertEqual(self.get_category("_Test EM SABB H-1"), "Special")
+		self.assertEqual(self.get_category("_Test EM SABB H-2"), "Special")
+		self.assertIsNone(self.get_category("_Test EM SABB H-3"))
@@ -0,0 +1,354 @@
+# Copyright (c) 2025, efeone and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, flt, getdate, now
+
+from e_mart.cache import ResultCache, queue_tag_invalidation
+
+ROLLUP_DOCTYPES = {"Sales Invoice": "SI", "Purchase Invoice": "PI"}
+ROLLUP_FIELDS = (
+	"name",
+	"reference_doctype",
+	"posting_date",
+	"company",
+	"invoice_count",
+	"grand_total",
+	"outstanding_amount",
+	"positive_outstanding",
+	"outstanding_count",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+)
+
+
+class DailyInvoiceRollup(Document):
+	pass
+
+
+def get_rollup_name(reference_doctype, company, posting_date):
+	"""Deterministic rollup name for a (doctype, company, date) bucket"""
+	return f"{ROLLUP_DOCTYPES[reference_doctype]}-{getdate(posting_date)}-{company or ''}"
+
+
+def update_invoice_rollup(doc, method=None):
+	"""
+	Sales/Purchase Invoice on_submit/on_cancel:
+	Queue a refresh of the rollup bucket of the invoice's posting date and company,
+	and for returns the bucket of the original invoice, whose outstanding changed.
+	"""
+	buckets = [(doc.posting_date, doc.company)]
+	if doc.get("is_return") and doc.get("return_against"):
+		original = frappe.db.get_value(
+			doc.doctype, doc.return_against, ["posting_date", "company"], as_dict=True
+		)
+		if original:
+			buckets.append((original.posting_date, original.company))
+	queue_bucket_refresh(doc.doctype, buckets)
+
+
+def update_rollup_from_payment(doc, method=None):
+	"""
+	Payment Entry on_submit/on_cancel:
+	Queue a refresh of the rollup buckets of every referenced invoice, since their outstanding amounts changed.
+	"""
+	names = {}
+	for ref in doc.get("references") or []:
+		if ref.reference_doctype in ROLLUP_DOCTYPES:
+			names.setdefault(ref.reference_doctype, set()).add(ref.reference_name)
+
+	queue_invoice_buckets(names)
+
+
+def update_rollup_from_journal_entry(doc, method=None):
+	"""
+	Journal Entry on_submit/on_cancel:
+	Queue a refresh of the rollup buckets of every invoice the entry's accounts reference.
+	"""
+	names = {}
+	for account in doc.get("accounts") or []:
+		if account.reference_type in ROLLUP_DOCTYPES and account.reference_name:
+			names.setdefault(account.reference_type, set()).add(account.reference_name)
+
+	queue_invoice_buckets(names)
+
+
+def refresh_modified_rollups(days=2):
+	"""
+	Daily scheduler job:
+	Refresh the buckets of invoices modified in the last `days` days.
+
+	Hooks cover invoices, returns, Payment Entries and Journal Entries, but
+	Payment Reconciliation and other ledger tools change outstanding amounts
+	without any of them running. This catches those changes when they touch
+	`modified`; anything else drifts until `bench rebuild-invoice-rollup`.
+	"""
+	since = add_days(now(), -int(days))
+	for reference_doctype in ROLLUP_DOCTYPES:
+		buckets = frappe.db.sql(
+			f"""
+			SELECT DISTINCT posting_date, company
+			FROM `tab{reference_doctype}`
+			WHERE modified >= %s AND docstatus > 0
+		""",
+			since,
+		)
+		refresh_rollup_buckets(reference_doctype, buckets)
+		frappe.db.commit()
+
+
+def queue_invoice_buckets(names):
+	"""
+	Queue a refresh of the rollup buckets of specific invoices
+
+	Args:
+		names (dict): {reference doctype: set of invoice names}
+	"""
+	for reference_doctype, invoices in names.items():
+		buckets = frappe.get_all(
+			reference_doctype,
+			filters={"name": ["in", list(invoices)]},
+			fields=["posting_date", "company"],
+			distinct=True,
+		)
+		queue_bucket_refresh(reference_doctype, [(row.posting_date, row.company) for row in buckets])
+
+
+def queue_bucket_refresh(reference_doctype, buckets):
+	"""
+	Recompute rollup buckets in a job that starts after the current transaction commits.
+
+	Recomputing inside the submit transaction would aggregate its own snapshot,
+	which misses invoices that concurrent transactions commit meanwhile, and the
+	last of them to upsert would win. After commit, every change is visible to
+	at least one of the refreshes that follow it.
+
+	Args:
+		reference_doctype (str): "Sales Invoice" or "Purchase Invoice"
+		buckets (list): [(posting_date, company)]
+	"""
+	buckets = sorted({(getdate(posting_date), company) for posting_date, company in buckets})
+	if not buckets:
+		return
+
+	frappe.enqueue(
+		"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.refresh_rollup_buckets",
+		queue="short",
+		enqueue_after_commit=True,
+		now=frappe.flags.in_test,
+		reference_doctype=reference_doctype,
+		buckets=buckets,
+	)
+
+
+def refresh_rollup_buckets(reference_doctype, buckets):
+	"""
+	Recompute rollup rows for specific (posting_date, company) buckets.
+	Each bucket is re-aggregated from its own day of invoices, so refreshing is idempotent.
+	The aggregate is a locking read: it waits for transactions still writing
+	invoices of the bucket and counts their committed rows, not a stale snapshot.
+
+	Cached results tagged with the invoice doctype are invalidated once the
+	rollup rows commit. The invoice's own tag bump happens at its commit,
+	before this job runs, so a read in between may cache the old totals.
+
+	Args:
+		reference_doctype (str): "Sales Invoice" or "Purchase Invoice"
+		buckets (list): [(posting_date, company)]
+	"""
+	for posting_date, company in set(buckets):
+		rows = _aggregate(reference_doctype, posting_date, posting_date, company, lock=True)
+		if rows:
+			_upsert(reference_doctype, rows)
+		else:
+			frappe.db.delete(
+				"Daily Invoice Rollup", {"name": get_rollup_name(reference_doctype, company, posting_date)}
+			)
+
+	queue_tag_invalidation(reference_doctype)
+
+
+def rebuild_invoice_rollup(from_date=None, to_date=None, chunk_days=31):
+	"""
+	Rebuild rollup rows from the invoice tables, one date chunk at a time.
+
+	Args:
+		from_date: First posting date to rebuild (defaults to the earliest invoice)
+		to_date: Last posting date to rebuild (defaults to today)
+		chunk_days (int): Number of days aggregated per query
+
+	Returns:
+		int: Number of rollup rows written
+	"""
+	written = 0
+	to_date = getdate(to_date)
+
+	for reference_doctype in ROLLUP_DOCTYPES:
+		start = from_date or frappe.db.get_value(reference_doctype, {"docstatus": 1}, "MIN(posting_date)")
+		if not start:
+			continue
+
+		start = getdate(start)
+		while start <= to_date:
+			end = min(getdate(add_days(start, int(chunk_days) - 1)), to_date)
+
+			frappe.db.sql(
+				"""
+				DELETE FROM `tabDaily Invoice Rollup`
+				WHERE reference_doctype = %s AND posting_date BETWEEN %s AND %s
+			""",
+				(reference_doctype, start, end),
+			)
+			rows = _aggregate(reference_doctype, start, end)
+			if rows:
+				_upsert(reference_doctype, rows)
+				written += len(rows)
+
+			frappe.db.commit()
+			start = getdate(add_days(end, 1))
+
+	ResultCache.invalidate_tags(*ROLLUP_DOCTYPES)
+	return written
+
+
+@frappe.whitelist()
+def rebuild(from_date=None, to_date=None):
+	"""Queue a rollup rebuild (System Manager only)"""
+	frappe.only_for("System Manager")
+	frappe.enqueue(
+		"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.rebuild_invoice_rollup",
+		queue="long",
+		timeout=3600,
+		from_date=from_date,
+		to_date=to_date,
+	)
+	return {"status": "success", "message": "Rollup rebuild queued"}
+
+
+def get_rollup_totals(reference_doctype, from_date=None, to_date=None):
+	"""
+	Read aggregated totals from the rollup table.
+
+	Args:
+		reference_doctype (str): "Sales Invoice" or "Purchase Invoice"
+		from_date: Period start (optional)
+		to_date: Period end (optional)
+
+	Returns:
+		dict: invoice_count, grand_total, outstanding_amount (net of credit notes and
+			overpayments), positive_outstanding (invoices still owed only), outstanding_count
+	"""
+	conditions = ["reference_doctype = %(reference_doctype)s"]
+	values = {"reference_doctype": reference_doctype}
+	if from_date:
+		conditions.append("posting_date >= %(from_date)s")
+		values["from_date"] = getdate(from_date)
+	if to_date:
+		conditions.append("posting_date <= %(to_date)s")
+		values["to_date"] = getdate(to_date)
+
+	totals = frappe.db.sql(
+		f"""
+		SELECT
+			COALESCE(SUM(invoice_count), 0) as invoice_count,
+			COALESCE(SUM(grand_total), 0) as grand_total,
+			COALESCE(SUM(outstanding_amount), 0) as outstanding_amount,
+			COALESCE(SUM(positive_outstanding), 0) as positive_outstanding,
+			COALESCE(SUM(outstanding_count), 0) as outstanding_count
+		FROM `tabDaily Invoice Rollup`
+		WHERE {" AND ".join(conditions)}
+	""",
+		values,
+		as_dict=True,
+	)[0]
+
+	return frappe._dict(
+		invoice_count=int(totals.invoice_count),
+		grand_total=flt(totals.grand_total),
+		outstanding_amount=flt(totals.outstanding_amount),
+		positive_outstanding=flt(totals.positive_outstanding),
+		outstanding_count=int(totals.outstanding_count),
+	)
+
+
+def _aggregate(reference_doctype, from_date, to_date, company=None, lock=False):
+	"""Aggregate submitted invoices per (posting_date, company), optionally as a locking read"""
+	company_condition = "AND company = %(company)s" if company else ""
+	# Postgres reads the latest committed rows per statement under READ COMMITTED,
+	# and does not allow FOR SHARE with GROUP BY
+	lock_clause = "LOCK IN SHARE MODE" if lock and frappe.db.db_type != "postgres" else ""
+	return frappe.db.sql(
+		f"""
+		SELECT
+			posting_date,
+			company,
+			COUNT(*) as invoice_count,
+			COALESCE(SUM(grand_total), 0) as grand_total,
+			COALESCE(SUM(outstanding_amount), 0) as outstanding_amount,
+			COALESCE(SUM(CASE WHEN outstanding_amount > 0 THEN outstanding_amount ELSE 0 END), 0)
+				as positive_outstanding,
+			SUM(CASE WHEN outstanding_amount > 0 THEN 1 ELSE 0 END) as outstanding_count
+		FROM `tab{reference_doctype}`
+		WHERE docstatus = 1
+		AND posting_date BETWEEN %(from_date)s AND %(to_date)s
+		{company_condition}
+		GROUP BY posting_date, company
+		{lock_clause}
+	""",
+		{"from_date": getdate(from_date), "to_date": getdate(to_date), "company": company},
+		as_dict=True,
+	)
+
+
+def _upsert(reference_doctype, rows):
+	"""Insert or replace rollup rows in a single statement"""
+	timestamp = now()
+	user = frappe.session.user if getattr(frappe.local, "session", None) else "Administrator"
+	values = [
+		(
+			get_rollup_name(reference_doctype, row.company, row.posting_date),
+			reference_doctype,
+			row.posting_date,
+			row.company,
+			row.invoice_count,
+			row.grand_total,
+			row.outstanding_amount,
+			row.positive_outstanding,
+			row.outstanding_count,
+			timestamp,
+			timestamp,
+			user,
+			user,
+		)
+		for row in rows
+	]
+	update_fields = (
+		"invoice_count",
+		"grand_total",
+		"outstanding_amount",
+		"positive_outstanding",
+		"outstanding_count",
+		"modified",
+	)
+
+	if frappe.db.db_type == "postgres":
+		on_conflict = "ON CONFLICT (name) DO UPDATE SET " + ", ".join(
+			f"{field} = EXCLUDED.{field}" for field in update_fields
+		)
+	else:
+		on_conflict = "ON DUPLICATE KEY UPDATE " + ", ".join(
+			f"`{field}` = VALUES(`{field}`)" for field in update_fields
+		)
+
+	placeholders = ", ".join(["(" + ", ".join(["%s"] * len(ROLLUP_FIELDS)) + ")"] * len(values))
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabDaily Invoice Rollup` ({", ".join(f"`{field}`" for field in ROLLUP_FIELDS)})
+		VALUES {placeholders}
+		{on_conflict}
+	""",
+		[value for row in values for value in row],
+	)
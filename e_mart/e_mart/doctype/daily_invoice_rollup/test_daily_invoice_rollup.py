@@ -0,0 +1,69 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import frappe
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt, getdate
+
+from e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup import (
+	get_rollup_name,
+	get_rollup_totals,
+	refresh_rollup_buckets,
+)
+
+
+class TestDailyInvoiceRollup(FrappeTestCase):
+	"""Test cases for Daily Invoice Rollup"""
+
+	def test_rollup_name_is_deterministic(self):
+		"""Test rollup names are stable per (doctype, company, date) bucket"""
+		name = get_rollup_name("Sales Invoice", "Test Company", "2025-08-01")
+		self.assertEqual(name, get_rollup_name("Sales Invoice", "Test Company", "2025-08-01"))
+		self.assertNotEqual(name, get_rollup_name("Purchase Invoice", "Test Company", "2025-08-01"))
+
+	def test_submit_and_cancel_update_bucket(self):
+		"""Test submitting an invoice adds to its bucket and cancelling takes it out again"""
+		posting_date = getdate()
+		before = get_rollup_totals("Sales Invoice", posting_date, posting_date)
+
+		invoice = create_sales_invoice(qty=1, rate=500, posting_date=posting_date)
+		after = get_rollup_totals("Sales Invoice", posting_date, posting_date)
+
+		self.assertEqual(after.invoice_count, before.invoice_count + 1)
+		self.assertEqual(flt(after.grand_total - before.grand_total, 2), flt(invoice.grand_total, 2))
+		self.assertEqual(
+			flt(after.positive_outstanding - before.positive_outstanding, 2),
+			flt(invoice.outstanding_amount, 2),
+		)
+		self.assertEqual(after.outstanding_count, before.outstanding_count + 1)
+		self.assertTrue(
+			frappe.db.exists(
+				"Daily Invoice Rollup", get_rollup_name("Sales Invoice", invoice.company, posting_date)
+			)
+		)
+
+		invoice.cancel()
+		cancelled = get_rollup_totals("Sales Invoice", posting_date, posting_date)
+		self.assertEqual(cancelled.invoice_count, before.invoice_count)
+		self.assertEqual(flt(cancelled.grand_total, 2), flt(before.grand_total, 2))
+
+	def test_credit_note_does_not_reduce_positive_outstanding(self):
+		"""Test credit notes net out of outstanding_amount but not of positive_outstanding"""
+		posting_date = getdate()
+		before = get_rollup_totals("Sales Invoice", posting_date, posting_date)
+
+		create_sales_invoice(qty=-1, rate=300, is_return=1, posting_date=posting_date)
+		after = get_rollup_totals("Sales Invoice", posting_date, posting_date)
+
+		self.assertEqual(flt(after.positive_outstanding, 2), flt(before.positive_outstanding, 2))
+		self.assertEqual(after.outstanding_count, before.outstanding_count)
+		self.assertLess(after.outstanding_amount, before.outstanding_amount)
+
+	def test_refresh_queues_invoice_tag_invalidation(self):
+		"""Test a bucket refresh invalidates the invoice tag once its rollup rows commit"""
+		invoice = create_sales_invoice(qty=1, rate=200)
+		frappe.local.e_mart_pending_tags = None
+
+		refresh_rollup_buckets("Sales Invoice", [(invoice.posting_date, invoice.company)])
+		self.assertIn("Sales Invoice", frappe.local.e_mart_pending_tags)
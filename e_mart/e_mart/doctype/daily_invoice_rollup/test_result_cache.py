@@ -0,0 +1,107 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from e_mart.cache import _MISS, RESULT_KEY_PREFIX, ResultCache, cached
+
+TAG = "_Test Cache Tag"
+
+calls = {"count": 0}
+
+
+@cached(ttl=300, tags=(TAG,), stale_ttl=600)
+def cached_with_stale(value):
+	calls["count"] += 1
+	return value
+
+
+@cached(ttl=300, tags=(TAG,))
+def cached_without_stale(value):
+	calls["count"] += 1
+	return value
+
+
+def get_key(func, *args):
+	return ResultCache.make_key("result", func, args, {})
+
+
+class TestResultCache(FrappeTestCase):
+	"""Test cases for the result cache"""
+
+	def setUp(self):
+		"""Start every test from an empty cache"""
+		calls["count"] = 0
+		frappe.cache().delete_keys(RESULT_KEY_PREFIX.format("result") + __name__)
+
+	def tearDown(self):
+		"""Drop the entries and locks the test wrote"""
+		frappe.cache().delete_keys(RESULT_KEY_PREFIX.format("result") + __name__)
+
+	def test_miss_then_fresh_hit(self):
+		"""Test the first call computes the result and the second reads it"""
+		self.assertEqual(cached_with_stale("a"), "a")
+		self.assertEqual(cached_with_stale("a"), "a")
+		self.assertEqual(calls["count"], 1)
+
+		value, fresh = ResultCache.read(get_key(cached_with_stale, "a"), (TAG,))
+		self.assertEqual(value, "a")
+		self.assertTrue(fresh)
+
+	def test_falsy_result_is_cached(self):
+		"""Test None and empty results are hits, not misses"""
+		self.assertIsNone(cached_with_stale(None))
+		self.assertIsNone(cached_with_stale(None))
+		self.assertEqual(cached_with_stale([]), [])
+		self.assertEqual(cached_with_stale([]), [])
+		self.assertEqual(calls["count"], 2)
+
+	def test_invalidated_entry_is_served_stale(self):
+		"""Test a bumped tag turns the entry stale while another worker recomputes it"""
+		cached_with_stale("a")
+		key = get_key(cached_with_stale, "a")
+		ResultCache.invalidate_tags(TAG)
+
+		value, fresh = ResultCache.read(key, (TAG,), stale_ttl=600)
+		self.assertEqual(value, "a")
+		self.assertFalse(fresh)
+
+		# Another worker holds the recompute lock
+		token = ResultCache.acquire(key)
+		self.assertTrue(token)
+		self.assertEqual(cached_with_stale("a"), "a")
+		self.assertEqual(calls["count"], 1)
+
+		ResultCache.release(key, token)
+		cached_with_stale("a")
+		self.assertEqual(calls["count"], 2)
+		self.assertTrue(ResultCache.read(key, (TAG,))[1])
+
+	def test_invalidated_entry_is_a_miss_without_stale_ttl(self):
+		"""Test a bumped tag turns the entry into a miss when no stale window is set"""
+		cached_without_stale("a")
+		key = get_key(cached_without_stale, "a")
+		ResultCache.invalidate_tags(TAG)
+
+		value, fresh = ResultCache.read(key, (TAG,))
+		self.assertIs(value, _MISS)
+		self.assertFalse(fresh)
+
+		cached_without_stale("a")
+		self.assertEqual(calls["count"], 2)
+
+	def test_release_keeps_lock_of_another_token(self):
+		"""Test releasing with a stale token leaves the current owner's lock in place"""
+		key = get_key(cached_with_stale, "lock")
+		token = ResultCache.acquire(key)
+		self.assertTrue(token)
+		self.assertIsNone(ResultCache.acquire(key))
+
+		ResultCache.release(key, "_Test Other Token")
+		self.assertIsNone(ResultCache.acquire(key))
+
+		ResultCache.release(key, token)
+		other = ResultCache.acquire(key)
+		self.assertTrue(other)
+		ResultCache.release(key, other)
@@ -1,13 +1,23 @@
 # Copyright (c) 2025, efeone and contributors
 # For license information, please see license.txt
 
+import json
+
 import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cint, flt, nowdate
+
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+
+# Larger approvals run as a background job
+BATCH_APPROVAL_SYNC_LIMIT = 20
 
 
 class DebitNoteLog(Document):
 	def on_submit(self):
-		if self.workflow_state == "Approved":
+		# Batch approval posts one Journal Entry for several logs itself
+		if self.workflow_state == "Approved" and not self.flags.skip_journal_entry:
 			self.create_journal_entry()
 
 	def on_update(self):
@@ -34,7 +44,7 @@ class DebitNoteLog(Document):
 		if not supplier_account:
 			frappe.throw(f"No account found for Supplier {self.supplier} in company {company}")
 
-		adjusted_account = frappe.db.get_single_value("E-mart Settings", "debit_note_adjusted_account")
+		adjusted_account = SettingsCache.get("debit_note_adjusted_account")
 		if not adjusted_account:
 			frappe.throw("Please set 'Debit Note Adjusted Account' in Lavanya Emart Settings.")
 
@@ -87,3 +97,204 @@ class DebitNoteLog(Document):
 
 		if new_status and self.status != new_status:
 			self.db_set("status", new_status)
+
+
+class DebitNoteApproval:
+	"""Batch approval of Debit Note Logs with one Journal Entry per supplier and company"""
+
+	@staticmethod
+	def get_logs(names):
+		"""
+		Load the logs to approve and resolve their companies and supplier accounts in bulk
+
+		Returns:
+			tuple: (approvable logs, {name: error})
+		"""
+		logs = frappe.get_all(
+			"Debit Note Log",
+			filters={"name": ["in", names]},
+			fields=["name", "supplier", "purchase_invoice", "discounted_amount", "docstatus"],
+		)
+		errors = {name: _("Debit Note Log not found") for name in set(names) - {log.name for log in logs}}
+
+		companies = dict(
+			frappe.get_all(
+				"Purchase Invoice",
+				filters={
+					"name": ["in", list({log.purchase_invoice for log in logs if log.purchase_invoice})]
+				},
+				fields=["name", "company"],
+				as_list=True,
+			)
+		)
+		accounts = {
+			(row.parent, row.company): row.account
+			for row in frappe.get_all(
+				"Party Account",
+				filters={
+					"parenttype": "Supplier",
+					"parent": ["in", list({log.supplier for log in logs})],
+					"company": ["in", list(set(companies.values())) or [""]],
+				},
+				fields=["parent", "company", "account"],
+			)
+		}
+
+		approvable = []
+		for log in logs:
+			log.company = companies.get(log.purchase_invoice)
+			log.supplier_account = accounts.get((log.supplier, log.company))
+			if log.docstatus != 0:
+				errors[log.name] = _("Debit Note Log is already processed")
+			elif flt(log.discounted_amount) <= 0:
+				errors[log.name] = _("Discounted Amount must be greater than 0.")
+			elif not log.company:
+				errors[log.name] = _("Company not found for Purchase Invoice {0}").format(
+					log.purchase_invoice
+				)
+			elif not log.supplier_account:
+				errors[log.name] = _("No account found for Supplier {0} in company {1}").format(
+					log.supplier, log.company
+				)
+			elif not frappe.has_permission("Debit Note Log", "submit", log.name):
+				errors[log.name] = _("Not permitted to approve Debit Note Log")
+			else:
+				approvable.append(log)
+
+		return approvable, errors
+
+	@staticmethod
+	def make_journal_entry(company, supplier, logs, adjusted_account):
+		"""
+		Post one Journal Entry for several logs of a supplier and company
+
+		Every log gets its own supplier debit line, referencing its Purchase
+		Invoice and naming the log; the adjusted account is credited once.
+
+		Returns:
+			str: Journal Entry name
+		"""
+		je = frappe.new_doc("Journal Entry")
+		je.voucher_type = "Debit Note"
+		je.posting_date = nowdate()
+		je.company = company
+		je.remark = f"Auto-created from Debit Note Logs {', '.join(log.name for log in logs)}"
+
+		for log in logs:
+			je.append(
+				"accounts",
+				{
+					"account": log.supplier_account,
+					"party_type": "Supplier",
+					"party": supplier,
+					"debit_in_account_currency": log.discounted_amount,
+					"reference_type": "Purchase Invoice",
+					"reference_name": log.purchase_invoice,
+					"user_remark": f"Debit Note Log {log.name}",
+				},
+			)
+
+		je.append(
+			"accounts",
+			{
+				"account": adjusted_account,
+				"credit_in_account_currency": sum(flt(log.discounted_amount) for log in logs),
+			},
+		)
+
+		je.insert(ignore_permissions=True)
+		je.submit()
+		return je.name
+
+	@staticmethod
+	def approve(names, commit=False):
+		"""
+		Approve and submit Debit Note Logs
+
+		Logs are grouped by supplier and company; each group gets one Journal
+		Entry and is applied in its own savepoint, so a failing group does not
+		block the others.
+
+		Args:
+			names (list): Debit Note Log names
+			commit (bool): Commit after every group (background jobs)
+
+		Returns:
+			dict: {"approved": [...], "journal_entries": {name: [logs]}, "failed": {name: error}}
+		"""
+		adjusted_account = SettingsCache.get("debit_note_adjusted_account")
+		if not adjusted_account:
+			frappe.throw(_("Please set 'Debit Note Adjusted Account' in Lavanya Emart Settings."))
+
+		logs, failed = DebitNoteApproval.get_logs(list(dict.fromkeys(names)))
+		groups = {}
+		for log in logs:
+			groups.setdefault((log.supplier, log.company), []).append(log)
+
+		has_workflow_state = frappe.get_meta("Debit Note Log").has_field("workflow_state")
+		summary = {"approved": [], "journal_entries": {}, "failed": failed}
+		for (supplier, company), group in groups.items():
+			frappe.db.savepoint("debit_note_batch")
+			try:
+				je_name = DebitNoteApproval.make_journal_entry(company, supplier, group, adjusted_account)
+				for log in group:
+					doc = frappe.get_doc("Debit Note Log", log.name)
+					doc.jv_reference = je_name
+					doc.status = "Submitted"
+					doc.flags.skip_journal_entry = True
+					if has_workflow_state:
+						doc.workflow_state = "Approved"
+					doc.submit()
+			except Exception as e:
+				frappe.db.rollback(save_point="debit_note_batch")
+				frappe.clear_messages()
+				for log in group:
+					summary["failed"][log.name] = str(e)
+				frappe.log_error(
+					f"Batch approval of Debit Note Logs for {supplier} ({company}) failed: {e!s}",
+					"E Mart Debit Note Approval Error",
+				)
+				continue
+
+			summary["journal_entries"][je_name] = [log.name for log in group]
+			summary["approved"] += [log.name for log in group]
+			if commit:
+				frappe.db.commit()
+
+		return summary
+
+
+def run_batch_approval(names, user=None):
+	"""Background job entry point for large approvals"""
+	summary = DebitNoteApproval.approve(names, commit=True)
+	if user:
+		frappe.publish_realtime("e_mart_debit_note_approval_complete", summary, user=user)
+	return summary
+
+
+@frappe.whitelist()
+def approve_debit_notes(names, background=0):
+	"""
+	Approve many Debit Note Logs at once
+
+	Args:
+		names (list | str): Debit Note Log names (JSON list accepted)
+		background (int): Force a background job; approvals of more than
+			BATCH_APPROVAL_SYNC_LIMIT logs always run in the background
+
+	Returns:
+		dict: Approval summary, or the job id when queued
+	"""
+	if isinstance(names, str):
+		names = json.loads(names)
+
+	if cint(background) or len(names) > BATCH_APPROVAL_SYNC_LIMIT:
+		job = frappe.enqueue(
+			"e_mart.e_mart.doctype.debit_note_log.debit_note_log.run_batch_approval",
+			queue="long",
+			names=names,
+			user=frappe.session.user,
+		)
+		return {"status": "queued", "job_id": job.id if job else None}
+
+	return {"status": "success", **DebitNoteApproval.approve(names)}
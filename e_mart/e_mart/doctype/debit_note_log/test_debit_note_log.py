@@ -1,16 +1,75 @@
 # Copyright (c) 2025, efeone and Contributors
 # See license.txt
 
+import os
+
 import frappe
+from erpnext.accounts.doctype.purchase_invoice.test_purchase_invoice import make_purchase_invoice
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, nowdate
+
+from e_mart.archival import LogArchiver
+from e_mart.e_mart.custom_scripts.purchase_invoice.purchase_invoice import create_debit_note_log
+from e_mart.e_mart.doctype.debit_note_log.debit_note_log import DebitNoteApproval
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+from e_mart.e_mart.doctype.monthly_commission_log.test_monthly_commission_log import (
+	get_archive_days,
+	get_archive_files,
+	get_log_rows,
+	make_old_log,
+	purge_logs,
+)
+
+SUPPLIER = "_Test Supplier"
+COMPANY = "_Test Company"
+
+ARCHIVED_PURCHASE_INVOICE = "_Test Archive PINV-1"
+DEBIT_NOTE_LOG = "_Test Archive DNL-1"
+PENDING_DEBIT_NOTE_LOG = "_Test Archive DNL-2"
+LINKED_DEBIT_NOTE_LOG = "_Test Archive DNL-3"
+JOURNAL_ENTRY = "_Test Archive JV-1"
+ARCHIVE_TEST_LOGS = [DEBIT_NOTE_LOG, PENDING_DEBIT_NOTE_LOG, LINKED_DEBIT_NOTE_LOG]
+
+
+def make_debit_note_log(discounted_amount):
+	"""Debit Note Log of a new Purchase Invoice of the test supplier, with a discount to post"""
+	invoice = make_purchase_invoice(supplier=SUPPLIER, company=COMPANY, qty=1, rate=1000)
+	name = frappe.db.get_value("Debit Note Log", {"purchase_invoice": invoice.name})
+	if not name:
+		log = frappe.get_doc(
+			{
+				"doctype": "Debit Note Log",
+				"supplier": SUPPLIER,
+				"purchase_invoice": invoice.name,
+				"status": "Pending",
+				"total_invoice_amount": invoice.total,
+			}
+		).insert(ignore_permissions=True)
+		name = log.name
+	frappe.db.set_value("Debit Note Log", name, "discounted_amount", discounted_amount)
+	return name
 
 
 class TestDebitNoteLog(FrappeTestCase):
 	"""Test cases for Debit Note Log"""
 
+	@classmethod
+	def tearDownClass(cls):
+		super().tearDownClass()
+		# Settings changed by the tests were rolled back
+		SettingsCache.bump_version()
+
 	def setUp(self):
 		"""Set up test data"""
-		pass
+		if not frappe.db.exists("Party Account", {"parent": SUPPLIER, "company": COMPANY}):
+			supplier = frappe.get_doc("Supplier", SUPPLIER)
+			supplier.append("accounts", {"company": COMPANY, "account": "_Test Payable - _TC"})
+			supplier.save()
+
+		frappe.db.set_single_value(
+			"E-mart Settings", "debit_note_adjusted_account", "_Test Account Cost for Goods Sold - _TC"
+		)
+		SettingsCache.bump_version()
 
 	def test_debit_note_log_creation(self):
 		"""Test Debit Note Log creation"""
@@ -26,6 +85,140 @@ class TestDebitNoteLog(FrappeTestCase):
 		self.assertTrue(hasattr(debit_note_log, "purchase_invoice"))
 		self.assertTrue(hasattr(debit_note_log, "status"))
 
+	def test_batch_approval_reports_missing_logs(self):
+		"""Test unknown logs are reported instead of failing the batch"""
+		logs, errors = DebitNoteApproval.get_logs(["_Test Missing Debit Note Log"])
+		self.assertEqual(logs, [])
+		self.assertIn("_Test Missing Debit Note Log", errors)
+
+	def test_batch_approval_posts_one_journal_entry_per_supplier(self):
+		"""Test logs of one supplier and company share a Journal Entry with a debit line each"""
+		names = [make_debit_note_log(100), make_debit_note_log(250)]
+
+		summary = DebitNoteApproval.approve(names)
+
+		self.assertEqual(summary["failed"], {})
+		self.assertEqual(sorted(summary["approved"]), sorted(names))
+		self.assertEqual(len(summary["journal_entries"]), 1)
+
+		je_name = next(iter(summary["journal_entries"]))
+		journal_entry = frappe.get_doc("Journal Entry", je_name)
+		self.assertEqual(journal_entry.docstatus, 1)
+		debits = [row for row in journal_entry.accounts if row.debit_in_account_currency]
+		self.assertEqual(len(debits), 2)
+		self.assertEqual(sorted(row.debit_in_account_currency for row in debits), [100, 250])
+		self.assertEqual(sum(row.credit_in_account_currency for row in journal_entry.accounts), 350)
+
+		for name in names:
+			self.assertEqual(frappe.db.get_value("Debit Note Log", name, "jv_reference"), je_name)
+			self.assertEqual(frappe.db.get_value("Debit Note Log", name, "docstatus"), 1)
+
+	def test_amended_log_does_not_inherit_journal_entry(self):
+		"""Test amending a log leaves its JV Reference behind"""
+		self.assertTrue(frappe.get_meta("Debit Note Log").get_field("jv_reference").no_copy)
+
+
+class TestDebitNoteLogArchival(FrappeTestCase):
+	"""Test cases for archiving Debit Note Logs"""
+
+	def setUp(self):
+		"""Old logs: one archivable, one Pending and one with a live Journal Entry"""
+		self.cleanup()
+		items = [{"item_name": "_Test Archive Item", "quantity": 2, "rate": 100, "discount": 10}]
+		make_old_log(
+			"Debit Note Log",
+			DEBIT_NOTE_LOG,
+			"items",
+			items,
+			supplier=SUPPLIER,
+			purchase_invoice=ARCHIVED_PURCHASE_INVOICE,
+			status="Submitted",
+		)
+		make_old_log(
+			"Debit Note Log", PENDING_DEBIT_NOTE_LOG, "items", items, supplier=SUPPLIER, status="Pending"
+		)
+		make_old_log(
+			"Debit Note Log",
+			LINKED_DEBIT_NOTE_LOG,
+			"items",
+			items,
+			supplier=SUPPLIER,
+			status="Submitted",
+			jv_reference=JOURNAL_ENTRY,
+		)
+		frappe.get_doc(
+			{
+				"doctype": "Journal Entry",
+				"name": JOURNAL_ENTRY,
+				"company": COMPANY,
+				"posting_date": "2000-01-01",
+				"docstatus": 1,
+			}
+		).db_insert()
+		frappe.db.commit()
+		self.files = get_archive_files("Debit Note Log")
+
 	def tearDown(self):
 		"""Clean up test data"""
-		pass
+		self.cleanup()
+		for path in get_archive_files("Debit Note Log") - self.files:
+			os.remove(path)
+
+	def cleanup(self):
+		frappe.db.delete("Journal Entry", {"name": JOURNAL_ENTRY})
+		purge_logs("Debit Note Log", ARCHIVE_TEST_LOGS)
+
+	def archive(self, target):
+		"""Archive the old logs and check only the archivable one left the live tables"""
+		summary = LogArchiver.archive("Debit Note Log", days=get_archive_days(), target=target, throttle=0)
+		self.assertEqual(summary["archived"], 1)
+
+		doc, children = get_log_rows("Debit Note Log", DEBIT_NOTE_LOG)
+		self.assertFalse(doc)
+		self.assertFalse(any(children.values()))
+		self.assertTrue(frappe.db.exists("Debit Note Log", PENDING_DEBIT_NOTE_LOG))
+		self.assertTrue(frappe.db.exists("Debit Note Log", LINKED_DEBIT_NOTE_LOG))
+
+		# The Purchase Invoice still counts as having a Debit Note Log
+		self.assertTrue(
+			LogArchiver.is_archived("Debit Note Log", "purchase_invoice", ARCHIVED_PURCHASE_INVOICE)
+		)
+		purchase_invoice = frappe.new_doc("Purchase Invoice")
+		purchase_invoice.name = ARCHIVED_PURCHASE_INVOICE
+		purchase_invoice.supplier = SUPPLIER
+		create_debit_note_log(purchase_invoice)
+		self.assertFalse(frappe.db.exists("Debit Note Log", {"purchase_invoice": ARCHIVED_PURCHASE_INVOICE}))
+
+	def test_pending_and_linked_logs_are_not_selected(self):
+		"""Test Pending logs and logs with a live Journal Entry are never archived"""
+		cutoff = add_days(nowdate(), -get_archive_days())
+		self.assertEqual(LogArchiver.get_batch("Debit Note Log", cutoff, "", 100), [DEBIT_NOTE_LOG])
+
+		frappe.db.set_value("Journal Entry", JOURNAL_ENTRY, "docstatus", 2)
+		self.assertEqual(
+			LogArchiver.get_batch("Debit Note Log", cutoff, "", 100), [DEBIT_NOTE_LOG, LINKED_DEBIT_NOTE_LOG]
+		)
+
+	def test_archive_to_tables_and_restore(self):
+		"""Test a log archived to tables comes back unchanged with its child rows"""
+		before = get_log_rows("Debit Note Log", DEBIT_NOTE_LOG)
+		self.archive("table")
+
+		self.assertEqual(LogArchiver.restore("Debit Note Log", [DEBIT_NOTE_LOG]), 1)
+		self.assertEqual(get_log_rows("Debit Note Log", DEBIT_NOTE_LOG), before)
+		self.assertFalse(
+			LogArchiver.is_archived("Debit Note Log", "purchase_invoice", ARCHIVED_PURCHASE_INVOICE)
+		)
+
+	def test_archive_to_ndjson_and_restore(self):
+		"""Test a log archived to an NDJSON file comes back unchanged with its child rows"""
+		before = get_log_rows("Debit Note Log", DEBIT_NOTE_LOG)
+		self.archive("ndjson")
+
+		new_files = get_archive_files("Debit Note Log") - self.files
+		self.assertEqual(len(new_files), 1)
+		self.assertEqual(LogArchiver.restore_files(new_files.pop()), 1)
+		self.assertEqual(get_log_rows("Debit Note Log", DEBIT_NOTE_LOG), before)
+		self.assertFalse(
+			LogArchiver.is_archived("Debit Note Log", "purchase_invoice", ARCHIVED_PURCHASE_INVOICE)
+		)
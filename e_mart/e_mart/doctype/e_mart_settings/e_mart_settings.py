@@ -3,10 +3,21 @@
 
 import frappe
 from frappe.model.document import Document
-from frappe.utils import validate_email_address, now, get_datetime
+from frappe.utils import cint, cstr, flt, validate_email_address, now, get_datetime
 import json
 import hashlib
 import re
+import time
+
+from e_mart.cache import CacheInvalidator, register_local_handler
+
+SETTINGS_VERSION_KEY = "e_mart_settings_version"
+# Seconds a process trusts its copy before checking the shared version again
+LOCAL_TTL = 5
+
+# Per-process settings: {site: {"version": int, "checked": float, "values": frappe._dict}}
+_local_settings = {}
+register_local_handler("settings", lambda site: _local_settings.pop(site, None))
 
 
 class EmartSettings(Document):
@@ -27,6 +38,7 @@ class EmartSettings(Document):
 		self.update_css_variables()
 		self.clear_cache()
 		self.log_settings_change()
+		SettingsCache.invalidate()
 
 	def validate_ui_settings(self):
 		"""Validate UI/UX related settings"""
@@ -92,16 +104,9 @@ class EmartSettings(Document):
 		return f"#{darkened[0]:02x}{darkened[1]:02x}{darkened[2]:02x}"
 
 	def clear_cache(self):
-		"""Clear relevant caches when settings change"""
-		frappe.clear_cache()
-		# Clear specific caches
-		cache_keys = [
-			"e_mart_settings",
-			"e_mart_css_vars",
-			"e_mart_ui_config"
-		]
-		for key in cache_keys:
-			frappe.cache().delete_value(key)
+		"""Clear the E Mart settings caches on every worker once the change is committed"""
+		# css vars were just refreshed by update_css_variables
+		CacheInvalidator.invalidate("settings", after_commit=True)
 
 	def log_settings_change(self):
 		"""Log settings changes for audit trail"""
@@ -122,16 +127,7 @@ class EmartSettings(Document):
 	@staticmethod
 	def get_settings():
 		"""Get E Mart settings with caching"""
-		settings = frappe.cache().get_value("e_mart_settings")
-		if not settings:
-			try:
-				doc = frappe.get_single("E-mart Settings")
-				settings = doc.as_dict()
-				frappe.cache().set_value("e_mart_settings", settings, expires_in_sec=300)
-			except Exception:
-				# Return default settings if doc doesn't exist
-				settings = EmartSettings.get_default_settings()
-		return settings
+		return SettingsCache.get_all()
 
 	@staticmethod
 	def get_default_settings():
@@ -224,6 +220,94 @@ class EmartSettings(Document):
 		}
 
 
+class SettingsCache:
+	"""
+	Two-tier E-mart Settings cache
+
+	Tier one is a per-process copy of the settings; tier two is a version
+	counter in Redis bumped whenever the settings are saved. A read costs at
+	most one Redis GET of the version, and none within LOCAL_TTL seconds.
+	"""
+
+	@staticmethod
+	def get_all():
+		"""
+		Get all settings values
+
+		Returns:
+			frappe._dict: Settings values (shared, do not modify)
+		"""
+		site = frappe.local.site
+		entry = _local_settings.get(site)
+		checked = time.monotonic()
+
+		if entry and checked - entry["checked"] < LOCAL_TTL:
+			return entry["values"]
+
+		version = SettingsCache.get_version()
+		if entry and entry["version"] == version:
+			entry["checked"] = checked
+			return entry["values"]
+
+		try:
+			values = frappe._dict(frappe.get_single("E-mart Settings").as_dict())
+		except Exception:
+			# Return default settings if doc doesn't exist
+			values = frappe._dict(EmartSettings.get_default_settings())
+
+		_local_settings[site] = {"version": version, "checked": checked, "values": values}
+		return values
+
+	@staticmethod
+	def get(fieldname, default=None):
+		"""Get a single settings value"""
+		value = SettingsCache.get_all().get(fieldname)
+		return default if value in (None, "") else value
+
+	@staticmethod
+	def get_str(fieldname, default=""):
+		"""Get a settings value as a string"""
+		return cstr(SettingsCache.get(fieldname, default))
+
+	@staticmethod
+	def get_int(fieldname, default=0):
+		"""Get a settings value as an integer"""
+		return cint(SettingsCache.get(fieldname, default))
+
+	@staticmethod
+	def get_float(fieldname, default=0.0):
+		"""Get a settings value as a float"""
+		return flt(SettingsCache.get(fieldname, default))
+
+	@staticmethod
+	def get_bool(fieldname, default=False):
+		"""Get a Check settings value as a boolean"""
+		return bool(cint(SettingsCache.get(fieldname, default)))
+
+	@staticmethod
+	def get_version():
+		"""Get the shared settings version from Redis"""
+		value = frappe.cache().get(frappe.cache().make_key(SETTINGS_VERSION_KEY))
+		return cint(value.decode() if isinstance(value, bytes) else value)
+
+	@staticmethod
+	def invalidate():
+		"""
+		Drop this process's copy now and bump the shared version on commit
+
+		The version is bumped after commit so other workers cannot reload and
+		pin the old values under the new version.
+		"""
+		_local_settings.pop(frappe.local.site, None)
+		frappe.db.after_commit.add(SettingsCache.bump_version)
+
+	@staticmethod
+	def bump_version():
+		"""Make every process reload the settings on its next version check"""
+		frappe.cache().incr(frappe.cache().make_key(SETTINGS_VERSION_KEY))
+		_local_settings.pop(frappe.local.site, None)
+
+
 # API methods for frontend access
 @frappe.whitelist()
 def get_e_mart_settings():
@@ -4,10 +4,18 @@
 import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+
 
 class TestEmartSettings(FrappeTestCase):
 	"""Test cases for E Mart Settings"""
 
+	@classmethod
+	def tearDownClass(cls):
+		super().tearDownClass()
+		# Settings changed by the tests were rolled back
+		SettingsCache.bump_version()
+
 	def setUp(self):
 		"""Set up test data"""
 		pass
@@ -25,6 +33,16 @@ class TestEmartSettings(FrappeTestCase):
 		self.assertTrue(hasattr(settings, "scrap_warehouse"))
 		self.assertTrue(hasattr(settings, "buyback_posting_account"))
 
+	def test_settings_cache_reloads_after_save(self):
+		"""Test saved settings are visible through the settings cache"""
+		settings = frappe.get_single("E-mart Settings")
+		settings.sync_frequency_minutes = 30
+		settings.save()
+		# The shared version is bumped on commit, which the test transaction never reaches
+		SettingsCache.bump_version()
+
+		self.assertEqual(SettingsCache.get_int("sync_frequency_minutes"), 30)
+
 	def tearDown(self):
 		"""Clean up test data"""
 		pass
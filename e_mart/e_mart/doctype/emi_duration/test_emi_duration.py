@@ -0,0 +1,25 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import datetime
+
+from frappe.tests.utils import FrappeTestCase
+
+from e_mart.emi import EmiSchedule
+
+
+class TestEMIDuration(FrappeTestCase):
+	"""Test cases for EMI schedule generation"""
+
+	def test_installments_add_up_exactly(self):
+		"""Test the last installment absorbs the rounding residue"""
+		amounts = EmiSchedule.split_amount(1000, 3)
+		self.assertEqual(amounts, [333.33, 333.33, 333.34])
+		self.assertEqual(round(sum(amounts), 2), 1000)
+
+	def test_dates_clamp_to_month_end(self):
+		"""Test installment dates keep the start day where the month allows"""
+		dates = EmiSchedule.get_dates("2025-01-31", 3)
+		self.assertEqual(
+			dates, [datetime.date(2025, 1, 31), datetime.date(2025, 2, 28), datetime.date(2025, 3, 31)]
+		)
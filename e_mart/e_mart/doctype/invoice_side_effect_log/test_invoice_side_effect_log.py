@@ -0,0 +1,97 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import frappe
+from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+from e_mart.side_effects import EFFECTS, InvoiceSideEffects
+
+SCRAP_WAREHOUSE = "_Test Warehouse - _TC"
+
+
+def set_scrap_warehouse(warehouse):
+	frappe.db.set_single_value("E-mart Settings", "scrap_warehouse", warehouse)
+	SettingsCache.bump_version()
+
+
+def make_buyback_invoice():
+	"""Submitted Sales Invoice with a buyback item, which needs a Scrap Stock Entry"""
+	invoice = create_sales_invoice(qty=1, rate=1000, do_not_submit=True)
+	invoice.append("buyback_items", {"item": "_Test Item", "qty": 1, "rate": 100})
+	invoice.submit()
+	return invoice
+
+
+class TestInvoiceSideEffectLog(FrappeTestCase):
+	"""Test cases for Invoice Side Effect Log"""
+
+	@classmethod
+	def tearDownClass(cls):
+		super().tearDownClass()
+		# Settings changed by the tests were rolled back
+		SettingsCache.bump_version()
+
+	def setUp(self):
+		"""Set up test data"""
+		set_scrap_warehouse(SCRAP_WAREHOUSE)
+
+	def get_log(self, job_key):
+		return frappe.db.get_value(
+			"Invoice Side Effect Log", job_key, ["status", "attempts", "error"], as_dict=True
+		)
+
+	def test_job_key_is_per_invoice_and_effect(self):
+		"""Test every effect of an invoice gets its own stable key"""
+		keys = {InvoiceSideEffects.get_job_key("SINV-0001", effect) for effect in EFFECTS}
+		self.assertEqual(len(keys), len(EFFECTS))
+		self.assertEqual(
+			InvoiceSideEffects.get_job_key("SINV-0001", "Demo Tasks"),
+			InvoiceSideEffects.get_job_key("SINV-0001", "Demo Tasks"),
+		)
+
+	def test_plain_invoice_needs_no_side_effects(self):
+		"""Test an invoice without buyback, demo items or sales team enqueues nothing"""
+		invoice = frappe.new_doc("Sales Invoice")
+		self.assertEqual(InvoiceSideEffects.enqueue(invoice), [])
+
+	def test_effect_runs_after_submit(self):
+		"""Test the submit only queues the effect, and running it twice applies it once"""
+		invoice = make_buyback_invoice()
+		job_key = InvoiceSideEffects.get_job_key(invoice.name, "Scrap Stock Entry")
+		self.assertEqual(self.get_log(job_key).status, "Queued")
+		self.assertEqual(self.get_log(job_key).attempts, 0)
+
+		self.assertEqual(InvoiceSideEffects.run(job_key), "Completed")
+		self.assertEqual(InvoiceSideEffects.run(job_key), "Completed")
+		self.assertEqual(self.get_log(job_key).attempts, 1)
+
+	def test_failed_effect_is_retried_by_reconcile(self):
+		"""Test a failing effect leaves the invoice alone and is retried once its backoff passed"""
+		invoice = make_buyback_invoice()
+		job_key = InvoiceSideEffects.get_job_key(invoice.name, "Scrap Stock Entry")
+
+		set_scrap_warehouse(None)
+		self.assertEqual(InvoiceSideEffects.run(job_key), "Failed")
+		log = self.get_log(job_key)
+		self.assertEqual(log.status, "Failed")
+		self.assertEqual(log.attempts, 1)
+		self.assertIn("Scrap Warehouse", log.error)
+		self.assertEqual(frappe.db.get_value("Sales Invoice", invoice.name, "docstatus"), 1)
+
+		# Still backing off
+		self.assertNotIn(job_key, InvoiceSideEffects.get_pending())
+
+		set_scrap_warehouse(SCRAP_WAREHOUSE)
+		frappe.db.set_value(
+			"Invoice Side Effect Log", job_key, "last_attempt", add_to_date(now_datetime(), minutes=-5)
+		)
+		results = InvoiceSideEffects.reconcile(run_now=True)
+
+		self.assertEqual(results.get(job_key), "Completed")
+		log = self.get_log(job_key)
+		self.assertEqual(log.status, "Completed")
+		self.assertEqual(log.attempts, 2)
+		self.assertFalse(log.error)
@@ -4,11 +4,154 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import getdate
+from frappe.utils import flt, get_first_day, get_last_day, getdate, now
+
+from e_mart.cache import queue_tag_invalidation
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
 
 
 class MonthlyCommissionLog(Document):
-	pass
+	def validate(self):
+		self.total_amount = sum(flt(row.total_amount) for row in self.monthly_commission_log)
+		self.total_incentives = sum(flt(row.incentives) for row in self.monthly_commission_log)
+
+
+def add_invoice_commissions(invoice):
+	"""
+	Append one commission row per sales team member of a submitted Sales Invoice
+
+	Sales Person → Employee links are resolved in one query, and rows are
+	inserted directly instead of saving the whole log, so the cost of a
+	submit does not grow with the number of rows already in the log.
+
+	Args:
+		invoice: Sales Invoice document
+
+	Returns:
+		list: Names of the logs that were updated
+	"""
+	sales_people = {row.sales_person for row in invoice.sales_team if row.sales_person}
+	if not sales_people:
+		return []
+
+	employees = dict(
+		frappe.get_all(
+			"Sales Person",
+			filters={"name": ["in", list(sales_people)]},
+			fields=["name", "employee"],
+			as_list=True,
+		)
+	)
+
+	posting_date = getdate(invoice.posting_date)
+	updated = []
+	for row in invoice.sales_team:
+		employee = employees.get(row.sales_person)
+		if not employee:
+			frappe.log_error(
+				f"Sales Person {row.sales_person} has no linked Employee.", "Monthly Commission Log"
+			)
+			continue
+
+		log_name = get_or_create_log(employee, posting_date)
+		append_commission_row(
+			log_name,
+			{
+				"sales_invoice": invoice.name,
+				"date": posting_date,
+				"total_amount": flt(invoice.base_grand_total),
+				"incentives": flt(row.incentive),
+			},
+		)
+		if log_name not in updated:
+			updated.append(log_name)
+
+	return updated
+
+
+def get_or_create_log(employee, date):
+	"""
+	Get the draft Monthly Commission Log of an employee for the month of `date`
+
+	Submitted logs are never appended to; once the month's log is submitted,
+	later commissions of that month go to a new draft.
+	"""
+	month_start = get_first_day(date)
+	month_end = get_last_day(date)
+
+	log_name = frappe.db.get_value(
+		"Monthly Commission Log",
+		{"employee": employee, "start_date": month_start, "end_date": month_end, "docstatus": 0},
+	)
+	if log_name:
+		return log_name
+
+	log = frappe.new_doc("Monthly Commission Log")
+	log.employee = employee
+	log.log_month = date.strftime("%B")
+	log.start_date = month_start
+	log.end_date = month_end
+	log.insert(ignore_permissions=True)
+	return log.name
+
+
+def append_commission_row(log_name, values):
+	"""
+	Insert a single detail row and bump the running totals of its log
+
+	The log row is locked first, so concurrent submits are serialised while
+	the next idx is read, and its docstatus is checked under that lock: a log
+	submitted in the meantime raises instead of gaining rows. The last idx is
+	a locking read too, so it sees rows committed by submits that held the
+	log before this one, not the transaction's snapshot.
+	"""
+	docstatus = frappe.db.sql(
+		"SELECT docstatus FROM `tabMonthly Commission Log` WHERE name = %s FOR UPDATE", log_name
+	)
+	if not docstatus or docstatus[0][0] != 0:
+		frappe.throw(_("Monthly Commission Log {0} is not a draft").format(log_name))
+
+	frappe.db.sql(
+		"""
+		UPDATE `tabMonthly Commission Log`
+		SET total_amount = COALESCE(total_amount, 0) + %(total_amount)s,
+			total_incentives = COALESCE(total_incentives, 0) + %(incentives)s,
+			modified = %(modified)s
+		WHERE name = %(name)s
+	""",
+		{
+			"name": log_name,
+			"total_amount": values["total_amount"],
+			"incentives": values["incentives"],
+			"modified": now(),
+		},
+	)
+
+	last = frappe.db.sql(
+		"""
+		SELECT idx
+		FROM `tabMonthly Commission Logs`
+		WHERE parent = %s AND parenttype = 'Monthly Commission Log' AND parentfield = 'monthly_commission_log'
+		ORDER BY idx DESC
+		LIMIT 1
+		FOR UPDATE
+	""",
+		log_name,
+	)
+	idx = last[0][0] if last else 0
+
+	row = frappe.get_doc(
+		{
+			"doctype": "Monthly Commission Logs",
+			"parent": log_name,
+			"parenttype": "Monthly Commission Log",
+			"parentfield": "monthly_commission_log",
+			"idx": idx + 1,
+			**values,
+		}
+	)
+	row.db_insert()
+	queue_tag_invalidation("Monthly Commission Log")
 
 
 @frappe.whitelist()
@@ -25,7 +168,7 @@ def create_additional_salary_from_commission(log_name):
 	latest_date = max(getdate(row.date) for row in log.monthly_commission_log if row.date)
 
 	total_incentive = sum(row.incentives for row in log.monthly_commission_log if row.incentives)
-	salary_component = frappe.db.get_single_value("E-mart Settings", "additional_salary_component")
+	salary_component = SettingsCache.get("additional_salary_component")
 	if not salary_component:
 		frappe.throw(
 			_("Please set the Additional Salary Component in E-mart Settings before proceeding."),
@@ -1,8 +1,100 @@
 # Copyright (c) 2025, efeone and Contributors
 # See license.txt
 
+import glob
+import os
+
 import frappe
+from erpnext.setup.doctype.employee.test_employee import make_employee
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, date_diff, getdate, nowdate
+
+from e_mart.archival import LogArchiver
+from e_mart.e_mart.doctype.monthly_commission_log.monthly_commission_log import (
+	add_invoice_commissions,
+	append_commission_row,
+	get_or_create_log,
+)
+
+SALES_PERSON = "_Test Commission Sales Person"
+
+# Older than anything else on the test site, so only the test logs are archived
+ARCHIVE_CREATION = "2000-01-01 10:00:00"
+COMMISSION_LOG = "_Test Archive MCL-1"
+DRAFT_COMMISSION_LOG = "_Test Archive MCL-2"
+ADDITIONAL_SALARY = "_Test Archive HR-ADS-1"
+
+
+def make_sales_person():
+	"""Sales Person linked to a test Employee"""
+	employee = make_employee("test_commission_log@example.com", company="_Test Company")
+	if not frappe.db.exists("Sales Person", SALES_PERSON):
+		frappe.get_doc(
+			{
+				"doctype": "Sales Person",
+				"sales_person_name": SALES_PERSON,
+				"parent_sales_person": "Sales Team",
+				"employee": employee,
+			}
+		).insert()
+	else:
+		frappe.db.set_value("Sales Person", SALES_PERSON, "employee", employee)
+	return employee
+
+
+def get_archive_days():
+	"""Archive age that selects only logs created before 2000-01-02"""
+	return date_diff(nowdate(), "2000-01-02")
+
+
+def make_old_log(doctype, name, parentfield, rows, docstatus=1, **fields):
+	"""Insert an old log with its child rows, bypassing validation like a migrated record"""
+	doc = frappe.get_doc(
+		{
+			"doctype": doctype,
+			"name": name,
+			"docstatus": docstatus,
+			"creation": ARCHIVE_CREATION,
+			"modified": ARCHIVE_CREATION,
+			**fields,
+		}
+	)
+	for idx, row in enumerate(rows, start=1):
+		doc.append(parentfield, {"name": f"{name}-{idx}", "docstatus": docstatus, **row})
+	doc.db_insert()
+	for row in doc.get(parentfield):
+		row.db_insert()
+
+
+def get_log_rows(doctype, name):
+	"""Parent row and child rows of a log as stored in the live tables"""
+	doc = frappe.db.sql(f"SELECT * FROM `tab{doctype}` WHERE name = %s", name, as_dict=True)
+	children = {
+		child: frappe.db.sql(
+			f"SELECT * FROM `tab{child}` WHERE parenttype = %s AND parent = %s ORDER BY idx",
+			(doctype, name),
+			as_dict=True,
+		)
+		for child in LogArchiver.get_child_doctypes(doctype)
+	}
+	return doc, children
+
+
+def get_archive_files(doctype):
+	return set(glob.glob(frappe.get_site_path("private", "archives", frappe.scrub(doctype), "*.ndjson.gz")))
+
+
+def purge_logs(doctype, names):
+	"""Remove test logs from the live and archive tables; archival commits, so rollback cannot"""
+	children = LogArchiver.get_child_doctypes(doctype)
+	tables = [(f"tab{doctype}", "name"), (LogArchiver.get_archive_table(doctype), "name")]
+	for child in children:
+		tables += [(f"tab{child}", "parent"), (LogArchiver.get_archive_table(child), "parent")]
+	for table, key in tables:
+		if LogArchiver.table_exists(table):
+			frappe.db.sql(f"DELETE FROM `{table}` WHERE `{key}` IN %s", (tuple(names),))
+	LogArchiver.delete_tombstones(doctype, names)
+	frappe.db.commit()
 
 
 class TestMonthlyCommissionLog(FrappeTestCase):
@@ -27,6 +119,164 @@ class TestMonthlyCommissionLog(FrappeTestCase):
 		self.assertTrue(hasattr(commission_log, "start_date"))
 		self.assertTrue(hasattr(commission_log, "end_date"))
 
+	def test_totals_follow_detail_rows(self):
+		"""Test running totals are recomputed from detail rows on validate"""
+		commission_log = frappe.new_doc("Monthly Commission Log")
+		commission_log.append("monthly_commission_log", {"total_amount": 1000, "incentives": 50})
+		commission_log.append("monthly_commission_log", {"total_amount": 500, "incentives": 25})
+		commission_log.validate()
+		self.assertEqual(commission_log.total_amount, 1500)
+		self.assertEqual(commission_log.total_incentives, 75)
+
+	def test_append_commission_row_to_draft(self):
+		"""Test rows are appended after the last idx and bump the running totals"""
+		posting_date = getdate("2025-08-10")
+		log_name = get_or_create_log(make_sales_person(), posting_date)
+		append_commission_row(
+			log_name,
+			{"sales_invoice": None, "date": posting_date, "total_amount": 1000, "incentives": 50},
+		)
+		append_commission_row(
+			log_name,
+			{"sales_invoice": None, "date": posting_date, "total_amount": 500, "incentives": 25},
+		)
+
+		commission_log = frappe.get_doc("Monthly Commission Log", log_name)
+		self.assertEqual([row.idx for row in commission_log.monthly_commission_log], [1, 2])
+		self.assertEqual([row.total_amount for row in commission_log.monthly_commission_log], [1000, 500])
+		self.assertEqual(commission_log.total_amount, 1500)
+		self.assertEqual(commission_log.total_incentives, 75)
+
+	def test_add_invoice_commissions(self):
+		"""Test a Sales Invoice adds one row per sales team member to the month's draft log"""
+		posting_date = getdate("2025-09-10")
+		employee = make_sales_person()
+		invoice = frappe._dict(
+			name="_Test Commission SINV-1",
+			posting_date=posting_date,
+			base_grand_total=1200,
+			sales_team=[frappe._dict(sales_person=SALES_PERSON, incentive=60)],
+		)
+
+		updated = add_invoice_commissions(invoice)
+
+		self.assertEqual(updated, [get_or_create_log(employee, posting_date)])
+		commission_log = frappe.get_doc("Monthly Commission Log", updated[0])
+		rows = [row for row in commission_log.monthly_commission_log if row.sales_invoice == invoice.name]
+		self.assertEqual(len(rows), 1)
+		self.assertEqual(rows[0].total_amount, 1200)
+		self.assertEqual(rows[0].incentives, 60)
+
+	def test_submitted_log_is_refused(self):
+		"""Test rows are never appended to a submitted log"""
+		posting_date = getdate("2025-10-10")
+		employee = make_sales_person()
+		log_name = get_or_create_log(employee, posting_date)
+		frappe.db.set_value("Monthly Commission Log", log_name, "docstatus", 1)
+
+		with self.assertRaises(frappe.ValidationError):
+			append_commission_row(
+				log_name,
+				{"sales_invoice": None, "date": posting_date, "total_amount": 1000, "incentives": 50},
+			)
+		self.assertEqual(frappe.db.count("Monthly Commission Logs", {"parent": log_name}), 0)
+		# Later commissions of the month go to a new draft
+		self.assertNotEqual(get_or_create_log(employee, posting_date), log_name)
+
 	def tearDown(self):
 		"""Clean up test data"""
 		pass
+
+
+class TestMonthlyCommissionLogArchival(FrappeTestCase):
+	"""Test cases for archiving Monthly Commission Logs"""
+
+	def setUp(self):
+		"""An old submitted log and an old draft"""
+		purge_logs("Monthly Commission Log", [COMMISSION_LOG, DRAFT_COMMISSION_LOG])
+		rows = [
+			{"sales_invoice": None, "date": "2000-01-01", "total_amount": 1000, "incentives": 50},
+			{"sales_invoice": None, "date": "2000-01-01", "total_amount": 500, "incentives": 25},
+		]
+		make_old_log(
+			"Monthly Commission Log",
+			COMMISSION_LOG,
+			"monthly_commission_log",
+			rows,
+			total_amount=1500,
+			total_incentives=75,
+		)
+		make_old_log(
+			"Monthly Commission Log", DRAFT_COMMISSION_LOG, "monthly_commission_log", rows, docstatus=0
+		)
+		self.files = get_archive_files("Monthly Commission Log")
+
+	def tearDown(self):
+		"""Clean up test data"""
+		purge_logs("Monthly Commission Log", [COMMISSION_LOG, DRAFT_COMMISSION_LOG])
+		for path in get_archive_files("Monthly Commission Log") - self.files:
+			os.remove(path)
+		if frappe.db.table_exists("Additional Salary"):
+			frappe.db.delete("Additional Salary", {"name": ADDITIONAL_SALARY})
+			frappe.db.commit()
+
+	def archive(self, target):
+		summary = LogArchiver.archive(
+			"Monthly Commission Log", days=get_archive_days(), target=target, throttle=0
+		)
+		self.assertEqual(summary["archived"], 1)
+		doc, children = get_log_rows("Monthly Commission Log", COMMISSION_LOG)
+		self.assertFalse(doc)
+		self.assertFalse(any(children.values()))
+		self.assertTrue(frappe.db.exists("Monthly Commission Log", DRAFT_COMMISSION_LOG))
+
+	def test_drafts_are_not_selected(self):
+		"""Test draft logs are never archived"""
+		cutoff = add_days(nowdate(), -get_archive_days())
+		self.assertEqual(LogArchiver.get_batch("Monthly Commission Log", cutoff, "", 100), [COMMISSION_LOG])
+
+	def test_logs_paid_out_are_not_selected(self):
+		"""Test a log stays live while an Additional Salary of its employee and month is not cancelled"""
+		if not frappe.db.table_exists("Additional Salary"):
+			self.skipTest("HRMS is not installed")
+
+		employee = make_employee("test_commission_log@example.com", company="_Test Company")
+		frappe.db.set_value(
+			"Monthly Commission Log",
+			COMMISSION_LOG,
+			{"employee": employee, "start_date": "2000-01-01", "end_date": "2000-01-31"},
+		)
+		frappe.get_doc(
+			{
+				"doctype": "Additional Salary",
+				"name": ADDITIONAL_SALARY,
+				"employee": employee,
+				"payroll_date": "2000-01-31",
+				"amount": 75,
+				"docstatus": 1,
+			}
+		).db_insert()
+		cutoff = add_days(nowdate(), -get_archive_days())
+
+		self.assertEqual(LogArchiver.get_batch("Monthly Commission Log", cutoff, "", 100), [])
+
+		frappe.db.set_value("Additional Salary", ADDITIONAL_SALARY, "docstatus", 2)
+		self.assertEqual(LogArchiver.get_batch("Monthly Commission Log", cutoff, "", 100), [COMMISSION_LOG])
+
+	def test_archive_to_tables_and_restore(self):
+		"""Test a log archived to tables comes back unchanged with its child rows"""
+		before = get_log_rows("Monthly Commission Log", COMMISSION_LOG)
+		self.archive("table")
+
+		self.assertEqual(LogArchiver.restore("Monthly Commission Log", [COMMISSION_LOG]), 1)
+		self.assertEqual(get_log_rows("Monthly Commission Log", COMMISSION_LOG), before)
+
+	def test_archive_to_ndjson_and_restore(self):
+		"""Test a log archived to an NDJSON file comes back unchanged with its child rows"""
+		before = get_log_rows("Monthly Commission Log", COMMISSION_LOG)
+		self.archive("ndjson")
+
+		new_files = get_archive_files("Monthly Commission Log") - self.files
+		self.assertEqual(len(new_files), 1)
+		self.assertEqual(LogArchiver.restore_files(new_files.pop()), 1)
+		self.assertEqual(get_log_rows("Monthly Commission Log", COMMISSION_LOG), before)
@@ -0,0 +1,59 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from e_mart.offline_sync import OfflineSyncEngine
+
+
+class TestOfflineSyncLog(FrappeTestCase):
+	"""Test cases for Offline Sync Log"""
+
+	def test_idempotency_key_is_stable(self):
+		"""Test records without a client key get a key derived from device, timestamp and content"""
+		record = {
+			"type": "sales_invoice",
+			"client_timestamp": "2025-08-21 10:15:00",
+			"data": {"customer": "Test Customer", "items": []},
+		}
+		key = OfflineSyncEngine.get_idempotency_key(record, "device-1")
+		self.assertEqual(key, OfflineSyncEngine.get_idempotency_key(dict(record), "device-1"))
+		self.assertEqual(OfflineSyncEngine.get_idempotency_key({**record, "idempotency_key": "abc"}), "abc")
+
+	def test_identical_sales_get_different_keys(self):
+		"""Test identical records made at different times or on different devices are not deduplicated"""
+		record = {
+			"type": "sales_invoice",
+			"client_timestamp": "2025-08-21 10:15:00",
+			"data": {"customer": "Test Customer", "items": []},
+		}
+		key = OfflineSyncEngine.get_idempotency_key(record, "device-1")
+		later = {**record, "client_timestamp": "2025-08-21 10:16:00"}
+		self.assertNotEqual(key, OfflineSyncEngine.get_idempotency_key(later, "device-1"))
+		self.assertNotEqual(key, OfflineSyncEngine.get_idempotency_key(record, "device-2"))
+
+	def test_record_without_key_or_timestamp_is_synced_without_dedup(self):
+		"""Test records of older clients, without a key or timestamp, are still processed"""
+		record = {"type": "sales_invoice", "data": {"customer": "_Test Missing Customer", "items": []}}
+		self.assertIsNone(OfflineSyncEngine.get_idempotency_key(record))
+
+		results = OfflineSyncEngine.sync([record, dict(record)])
+
+		# Two identical records stay two records and reach validation
+		self.assertEqual(len(results), 2)
+		for result in results.values():
+			self.assertEqual(result["status"], "Invalid")
+			self.assertIn("_Test Missing Customer", result["message"])
+			self.assertFalse(result["deduplicated"])
+
+	def test_log_names_are_scoped(self):
+		"""Test the same client key of different users or devices maps to different logs"""
+		name = OfflineSyncEngine.get_log_name("abc", "device-1", "a@example.com")
+		self.assertNotEqual(name, OfflineSyncEngine.get_log_name("abc", "device-2", "a@example.com"))
+		self.assertNotEqual(name, OfflineSyncEngine.get_log_name("abc", "device-1", "b@example.com"))
+
+	def test_unknown_record_type_is_rejected(self):
+		"""Test unknown record types are reported without touching the database"""
+		results = OfflineSyncEngine.sync([{"type": "unknown", "idempotency_key": "test-unknown"}])
+		self.assertEqual(results["test-unknown"]["status"], "Invalid")
@@ -0,0 +1,132 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+import frappe
+from frappe.permissions import add_user_permission
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_datetime
+
+from e_mart.serial_provenance import ProvenanceStore, trace_serial, update_provenance_on_cancel
+
+SERIAL = "_Test EM Provenance Serial"
+
+
+def make_bundle(name, type_of_transaction, posting_date, warehouse=None, serial_no=SERIAL, insert=False):
+	"""A submitted Serial and Batch Bundle moving one serial, optionally stored in the database"""
+	doc = frappe.get_doc(
+		{
+			"doctype": "Serial and Batch Bundle",
+			"name": name,
+			"item_code": "_Test EM Item",
+			"warehouse": warehouse,
+			"type_of_transaction": type_of_transaction,
+			"voucher_type": "Purchase Receipt" if type_of_transaction == "Inward" else "Delivery Note",
+			"voucher_no": f"{name}-VOUCHER",
+			"posting_date": posting_date,
+			"posting_time": "10:00:00",
+			"docstatus": 1,
+			"is_cancelled": 0,
+			"entries": [
+				{
+					"name": f"{name}-1",
+					"serial_no": serial_no,
+					"warehouse": warehouse,
+					"qty": 1 if type_of_transaction == "Inward" else -1,
+					"purchase_category": "Special",
+				}
+			],
+		}
+	)
+	if insert:
+		doc.db_insert()
+		for entry in doc.entries:
+			entry.docstatus = 1
+			entry.db_insert()
+	return doc
+
+
+class TestSerialProvenance(FrappeTestCase):
+	"""Test cases for Serial Provenance"""
+
+	def get_provenance(self):
+		return ProvenanceStore.get(serial_no=SERIAL)
+
+	def test_serial_and_batch_keys_do_not_collide(self):
+		"""Test a serial and a batch with the same number get separate rows"""
+		self.assertNotEqual(
+			ProvenanceStore.get_key("serial_no", "X-001"), ProvenanceStore.get_key("batch_no", "X-001")
+		)
+
+	def test_unknown_serial_has_no_provenance(self):
+		"""Test lookups of unknown numbers return nothing"""
+		self.assertIsNone(ProvenanceStore.get(serial_no="_Test Unknown Serial"))
+		self.assertEqual(ProvenanceStore.get_many("batch_no", ["_Test Unknown Batch"]), {})
+
+	def test_rebuild_drops_values_without_movements(self):
+		"""Test rebuilding a number without submitted bundles removes its row"""
+		key = ProvenanceStore.get_key("serial_no", "_Test Orphan Serial")
+		ProvenanceStore.write(
+			[{"provenance_key": key, "provenance_type": "Serial No", "serial_no": "_Test Orphan Serial"}]
+		)
+		self.assertEqual(ProvenanceStore.rebuild_values("serial_no", ["_Test Orphan Serial"]), 0)
+		self.assertFalse(frappe.db.exists("Serial Provenance", key))
+
+	def test_record_bundle_tracks_movements(self):
+		"""Test inward then outward bundles move the serial, and a backdated bundle changes nothing"""
+		ProvenanceStore.record_bundle(make_bundle("_Test EM SABB IN", "Inward", "2025-01-10", "_Test EM WH"))
+		row = self.get_provenance()
+		self.assertEqual(row.warehouse, "_Test EM WH")
+		self.assertEqual(row.first_voucher_no, "_Test EM SABB IN-VOUCHER")
+		self.assertEqual(get_datetime(row.last_movement), get_datetime("2025-01-10 10:00:00"))
+		self.assertEqual(row.purchase_category, "Special")
+
+		ProvenanceStore.record_bundle(
+			make_bundle("_Test EM SABB OUT", "Outward", "2025-01-20", "_Test EM WH")
+		)
+		row = self.get_provenance()
+		self.assertIsNone(row.warehouse)
+		self.assertEqual(row.last_transaction, "Outward")
+		self.assertEqual(row.last_bundle, "_Test EM SABB OUT")
+		self.assertEqual(get_datetime(row.last_movement), get_datetime("2025-01-20 10:00:00"))
+		self.assertEqual(row.first_voucher_no, "_Test EM SABB IN-VOUCHER")
+
+		ProvenanceStore.record_bundle(
+			make_bundle("_Test EM SABB OLD", "Inward", "2025-01-15", "_Test EM WH 2")
+		)
+		row = self.get_provenance()
+		self.assertIsNone(row.warehouse)
+		self.assertEqual(row.last_bundle, "_Test EM SABB OUT")
+		self.assertEqual(get_datetime(row.last_movement), get_datetime("2025-01-20 10:00:00"))
+
+	def test_cancel_restores_previous_movement(self):
+		"""Test cancelling the latest bundle falls back to the previous one, and the last one drops the row"""
+		inward = make_bundle("_Test EM SABB C-IN", "Inward", "2025-02-01", "_Test EM WH", insert=True)
+		outward = make_bundle("_Test EM SABB C-OUT", "Outward", "2025-02-05", "_Test EM WH", insert=True)
+		ProvenanceStore.record_bundle(inward)
+		ProvenanceStore.record_bundle(outward)
+		self.assertEqual(self.get_provenance().last_bundle, "_Test EM SABB C-OUT")
+
+		frappe.db.set_value("Serial and Batch Bundle", outward.name, {"docstatus": 2, "is_cancelled": 1})
+		update_provenance_on_cancel(outward)
+		row = self.get_provenance()
+		self.assertEqual(row.last_bundle, "_Test EM SABB C-IN")
+		self.assertEqual(row.last_transaction, "Inward")
+		self.assertEqual(row.warehouse, "_Test EM WH")
+
+		frappe.db.set_value("Serial and Batch Bundle", inward.name, {"docstatus": 2, "is_cancelled": 1})
+		update_provenance_on_cancel(inward)
+		self.assertIsNone(self.get_provenance())
+
+	def test_trace_history_applies_user_permissions(self):
+		"""Test the history of a restricted user leaves out bundles of other warehouses"""
+		make_bundle("_Test EM SABB P-IN", "Inward", "2025-03-01", "_Test Warehouse - _TC", insert=True)
+		make_bundle("_Test EM SABB P-OUT", "Outward", "2025-03-05", "_Test Warehouse 1 - _TC", insert=True)
+
+		user = "test@example.com"
+		frappe.get_doc("User", user).add_roles("Stock User")
+		add_user_permission("Warehouse", "_Test Warehouse - _TC", user)
+
+		frappe.set_user(user)
+		self.addCleanup(frappe.set_user, "Administrator")
+		history = trace_serial(serial_no=SERIAL, with_history=1)["data"]["history"]
+		self.assertEqual([row.bundle for row in history], ["_Test EM SABB P-IN"])
@@ -0,0 +1,152 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+EMI module for E Mart app
+Builds EMI schedules with exact rounding and projects EMI receivables per month
+"""
+
+import calendar
+from decimal import ROUND_HALF_UP, Decimal
+
+import frappe
+from frappe import _
+from frappe.desk.reportview import get_match_cond
+from frappe.utils import add_days, add_months, cint, flt, get_last_day, getdate
+
+from e_mart.analytics import BUCKET_SQL, TimeBucketAggregator
+
+
+class EmiSchedule:
+	"""EMI schedule calculation and projection"""
+
+	@staticmethod
+	def split_amount(amount, installments, precision=2):
+		"""
+		Split an amount into installments in exact minor units (paise)
+
+		Every installment gets the rounded-down share and the last one absorbs
+		the residue, so the installments always add up to `amount`.
+
+		Args:
+			amount (float): Total EMI amount
+			installments (int): Number of installments
+			precision (int): Currency precision
+
+		Returns:
+			list: Installment amounts
+		"""
+		installments = cint(installments)
+		if installments <= 0:
+			return []
+
+		scale = Decimal(10) ** precision
+		units = int((Decimal(str(flt(amount))) * scale).to_integral_value(ROUND_HALF_UP))
+		share = units // installments
+		last = units - share * (installments - 1)
+
+		return [float(Decimal(share) / scale)] * (installments - 1) + [float(Decimal(last) / scale)]
+
+	@staticmethod
+	def get_dates(start_date, installments):
+		"""
+		Get monthly installment dates, keeping the start day where the month allows
+
+		Args:
+			start_date: First installment date
+			installments (int): Number of installments
+
+		Returns:
+			list: Installment dates
+		"""
+		start_date = getdate(start_date)
+		month_index = start_date.year * 12 + start_date.month - 1
+
+		dates = []
+		for offset in range(cint(installments)):
+			year, month = divmod(month_index + offset, 12)
+			day = min(start_date.day, calendar.monthrange(year, month + 1)[1])
+			dates.append(start_date.replace(year=year, month=month + 1, day=day))
+		return dates
+
+	@staticmethod
+	def build(start_date, amount, installments, precision=2):
+		"""
+		Build EMI Duration rows
+
+		Returns:
+			list: [{"date": date, "amount": float}]
+		"""
+		return [
+			{"date": date, "amount": installment}
+			for date, installment in zip(
+				EmiSchedule.get_dates(start_date, installments),
+				EmiSchedule.split_amount(amount, installments, precision),
+				strict=True,
+			)
+		]
+
+	@staticmethod
+	def project_receivables(from_date=None, months=12, company=None):
+		"""
+		Get EMI installments falling due per month across all submitted EMI invoices
+
+		Reads the EMI Duration rows directly with one grouped query, so no
+		invoice document is loaded. User permissions and permission query
+		conditions of Sales Invoice are applied, so a user restricted to some
+		companies only sees their receivables.
+
+		Args:
+			from_date: First month of the projection (default: current month)
+			months (int): Number of months to project
+			company (str): Optional company filter
+
+		Returns:
+			list: [{"month": date, "amount": float, "installments": int, "invoices": int}]
+		"""
+		months = cint(months) or 12
+		if months > 120:
+			frappe.throw(_("Projection is limited to 120 months"))
+
+		from_date = TimeBucketAggregator.bucket_start(from_date or getdate(), "month")
+		to_date = get_last_day(add_days(add_months(from_date, months), -1))
+
+		bucket_sql = BUCKET_SQL.get(frappe.db.db_type, BUCKET_SQL["mariadb"])["month"]
+		conditions = [
+			"emi.parenttype = 'Sales Invoice'",
+			"emi.parentfield = 'emi_duration'",
+			"emi.`date` BETWEEN %(from_date)s AND %(to_date)s",
+			"`tabSales Invoice`.docstatus = 1",
+			"`tabSales Invoice`.sales_type = 'EMI'",
+			"`tabSales Invoice`.outstanding_amount > 0",
+		]
+		values = {"from_date": from_date, "to_date": to_date}
+		if company:
+			conditions.append("`tabSales Invoice`.company = %(company)s")
+			values["company"] = company
+
+		rows = frappe.db.sql(
+			f"""
+			SELECT {bucket_sql.format(field="emi.`date`")} as month,
+				SUM(emi.amount) as amount,
+				COUNT(*) as installments,
+				COUNT(DISTINCT emi.parent) as invoices
+			FROM `tabEMI Duration` emi
+			INNER JOIN `tabSales Invoice` ON `tabSales Invoice`.name = emi.parent
+			WHERE {" AND ".join(conditions)}{get_match_cond("Sales Invoice")}
+			GROUP BY month
+		""",
+			values,
+			as_dict=True,
+		)
+
+		totals = {getdate(row.month): row for row in rows}
+		return [
+			{
+				"month": month,
+				"amount": flt(totals[month].amount) if month in totals else 0.0,
+				"installments": cint(totals[month].installments) if month in totals else 0,
+				"invoices": cint(totals[month].invoices) if month in totals else 0,
+			}
+			for month in TimeBucketAggregator.get_buckets(from_date, to_date, "month")
+		]
@@ -0,0 +1,341 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Streaming data export module for E Mart app
+Reads records in keyset chunks and writes CSV, XLSX or NDJSON incrementally,
+so memory use stays constant regardless of the number of rows.
+Small JSON exports keep returning the rows in the response body.
+"""
+
+import csv
+import json
+import os
+import tempfile
+
+import frappe
+from frappe import _
+from frappe.utils import cint, cstr, now_datetime
+
+CHUNK_SIZE = 5000
+SYNC_ROW_LIMIT = 50000
+STATUS_TTL = 24 * 60 * 60
+
+FORMATS = {
+	"csv": ("csv", "text/csv"),
+	"excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+	"xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+	# Only queued JSON exports are written to a file, small ones return the rows
+	"json": ("ndjson", "application/x-ndjson"),
+	"ndjson": ("ndjson", "application/x-ndjson"),
+}
+
+
+class CsvWriter:
+	"""Incremental CSV writer"""
+
+	def __init__(self, path, fields):
+		self.file = open(path, "w", newline="", encoding="utf-8")
+		self.writer = csv.writer(self.file)
+		self.writer.writerow(fields)
+
+	def write(self, rows):
+		self.writer.writerows(rows)
+
+	def close(self):
+		self.file.close()
+
+
+class NdjsonWriter:
+	"""Incremental newline-delimited JSON writer"""
+
+	def __init__(self, path, fields):
+		self.file = open(path, "w", encoding="utf-8")
+		self.fields = fields
+
+	def write(self, rows):
+		for row in rows:
+			self.file.write(json.dumps(dict(zip(self.fields, row, strict=False)), default=cstr))
+			self.file.write("\n")
+
+	def close(self):
+		self.file.close()
+
+
+class XlsxWriter:
+	"""Incremental XLSX writer using openpyxl's write-only mode"""
+
+	def __init__(self, path, fields):
+		from openpyxl import Workbook
+
+		self.path = path
+		self.workbook = Workbook(write_only=True)
+		self.sheet = self.workbook.create_sheet("Data")
+		self.sheet.append(fields)
+
+	def write(self, rows):
+		for row in rows:
+			self.sheet.append(row)
+
+	def close(self):
+		self.workbook.save(self.path)
+
+
+WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter, "ndjson": NdjsonWriter}
+
+
+class DataExporter:
+	"""Chunked, constant-memory exports"""
+
+	@staticmethod
+	def get_fields(doctype, fields=None):
+		"""
+		Validate requested fields against the table columns
+
+		Args:
+			doctype (str): DocType to export
+			fields (list): Requested fields (default: all columns)
+
+		Returns:
+			list: Column names to export
+		"""
+		columns = frappe.get_meta(doctype).get_valid_columns()
+		if not fields or fields == ["*"]:
+			return columns
+
+		invalid = [field for field in fields if field not in columns]
+		if invalid:
+			frappe.throw(_("Invalid fields for {0}: {1}").format(doctype, ", ".join(invalid)))
+		return list(fields)
+
+	@staticmethod
+	def iter_chunks(doctype, filters=None, fields=None, chunk_size=CHUNK_SIZE):
+		"""
+		Yield rows in keyset chunks ordered by name
+
+		Each chunk is a separate bounded query, so no cursor is held open
+		between chunks and memory use is bounded by `chunk_size`.
+		"""
+		fields = list(fields)
+		query_fields = fields if "name" in fields else [*fields, "name"]
+		name_index = query_fields.index("name")
+		last_name = None
+
+		while True:
+			chunk_filters = list(DataExporter._as_list(filters))
+			if last_name is not None:
+				chunk_filters.append([doctype, "name", ">", last_name])
+
+			rows = frappe.get_all(
+				doctype,
+				filters=chunk_filters,
+				fields=query_fields,
+				order_by="name asc",
+				limit=chunk_size,
+				as_list=True,
+			)
+			if not rows:
+				return
+
+			last_name = rows[-1][name_index]
+			yield [row[: len(fields)] for row in rows]
+
+			if len(rows) < chunk_size:
+				return
+
+	@staticmethod
+	def write_export(doctype, path, filters=None, fields=None, extension="csv", job_id=None):
+		"""
+		Write records to `path` chunk by chunk
+
+		Args:
+			doctype (str): DocType to export
+			path (str): Output file path
+			filters (dict | list): Standard frappe filters
+			fields (list): Fields to export
+			extension (str): csv, xlsx or ndjson
+			job_id (str): Background job id used for progress reporting
+
+		Returns:
+			int: Number of rows written
+		"""
+		fields = DataExporter.get_fields(doctype, fields)
+		total = frappe.db.count(doctype, filters=filters) if job_id else 0
+
+		written = 0
+		writer = WRITERS[extension](path, fields)
+		try:
+			for rows in DataExporter.iter_chunks(doctype, filters, fields):
+				writer.write(rows)
+				written += len(rows)
+				DataExporter.set_status(job_id, "Running", written, total)
+		finally:
+			writer.close()
+
+		return written
+
+	@staticmethod
+	def export_to_file(doctype, filters=None, fields=None, file_format="csv", job_id=None):
+		"""
+		Export records to a private File
+
+		Returns:
+			dict: {"file_url": str, "rows": int}
+		"""
+		extension, _mimetype = DataExporter.get_format(file_format)
+		file_name = DataExporter.get_file_name(doctype, extension)
+		path = frappe.get_site_path("private", "files", file_name)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+
+		written = DataExporter.write_export(doctype, path, filters, fields, extension, job_id)
+
+		file_doc = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": file_name,
+				"file_url": f"/private/files/{file_name}",
+				"is_private": 1,
+			}
+		)
+		file_doc.insert(ignore_permissions=True)
+
+		result = {"file_url": file_doc.file_url, "rows": written}
+		DataExporter.set_status(job_id, "Completed", written, written, **result)
+		return result
+
+	@staticmethod
+	def export_to_response(doctype, filters=None, fields=None, file_format="csv"):
+		"""
+		Export records to a temporary file and stream it as the HTTP response
+
+		The temporary file is removed once the response has been sent.
+		"""
+		extension, mimetype = DataExporter.get_format(file_format)
+		file_name = DataExporter.get_file_name(doctype, extension)
+
+		handle, path = tempfile.mkstemp(suffix=f".{extension}")
+		os.close(handle)
+		try:
+			DataExporter.write_export(doctype, path, filters, fields, extension)
+		except Exception:
+			os.remove(path)
+			raise
+
+		from werkzeug.wrappers import Response
+		from werkzeug.wsgi import wrap_file
+
+		response = Response(
+			wrap_file(frappe.local.request.environ, open(path, "rb")),
+			mimetype=mimetype,
+			direct_passthrough=True,
+		)
+		response.headers["Content-Disposition"] = f'attachment; filename="{file_name}"'
+		response.call_on_close(lambda: os.remove(path))
+		return response
+
+	@staticmethod
+	def export_to_json(doctype, filters=None, fields=None):
+		"""
+		Export records as the JSON response body
+
+		Returns:
+			dict: {"data": list of dicts, "format": "json"}
+		"""
+		fields = DataExporter.get_fields(doctype, fields)
+		data = []
+		for rows in DataExporter.iter_chunks(doctype, filters, fields):
+			data += [frappe._dict(zip(fields, row, strict=True)) for row in rows]
+		return {"data": data, "format": "json"}
+
+	@staticmethod
+	def get_file_name(doctype, extension):
+		"""Unique export file name"""
+		timestamp = now_datetime().strftime("%Y%m%d%H%M%S")
+		return f"{frappe.scrub(doctype)}-{timestamp}-{frappe.generate_hash(length=6)}.{extension}"
+
+	@staticmethod
+	def set_status(job_id, status, processed=0, total=0, owner=None, **extra):
+		"""Store export progress in cache and notify the user"""
+		if not job_id:
+			return
+
+		key = f"e_mart_export:{job_id}"
+		owner = owner or (frappe.cache().get_value(key) or {}).get("owner")
+		data = {
+			"job_id": job_id,
+			"status": status,
+			"processed": processed,
+			"total": total,
+			"owner": owner,
+			**extra,
+		}
+		frappe.cache().set_value(key, data, expires_in_sec=STATUS_TTL)
+		if total:
+			frappe.publish_progress(
+				processed * 100 / total, title=_("Exporting"), description=f"{processed}/{total}"
+			)
+
+	@staticmethod
+	def get_format(file_format):
+		"""Get (extension, mimetype) for a requested format"""
+		file_format = (file_format or "csv").lower()
+		if file_format not in FORMATS:
+			frappe.throw(_("Unsupported export format: {0}").format(file_format))
+		return FORMATS[file_format]
+
+	@staticmethod
+	def _as_list(filters):
+		"""Normalise dict filters to list filters so extra conditions can be appended"""
+		if not filters:
+			return []
+		if isinstance(filters, dict):
+			return [
+				[key, *value] if isinstance(value, list | tuple) else [key, "=", value]
+				for key, value in filters.items()
+			]
+		return filters
+
+
+def run_export_job(doctype, filters=None, fields=None, file_format="csv", job_id=None, user=None):
+	"""Background job entry point for queued exports"""
+	try:
+		result = DataExporter.export_to_file(doctype, filters, fields, file_format, job_id)
+		frappe.db.commit()
+		if user:
+			frappe.publish_realtime("e_mart_export_complete", {"job_id": job_id, **result}, user=user)
+	except Exception as e:
+		DataExporter.set_status(job_id, "Failed", error=str(e))
+		frappe.log_error(f"Export job {job_id} failed: {e!s}", "E Mart Export Error")
+		raise
+
+
+@frappe.whitelist()
+def get_export_status(job_id):
+	"""Get progress of a background export started by the current user"""
+	status = frappe.cache().get_value(f"e_mart_export:{job_id}")
+	if not status or status.get("owner") != frappe.session.user:
+		return {"status": "error", "message": "Export job not found"}
+	return {"status": "success", "data": status}
+
+
+def queue_export(doctype, filters=None, fields=None, file_format="csv"):
+	"""Queue an export on the long worker queue"""
+	job_id = frappe.generate_hash(length=12)
+	DataExporter.set_status(job_id, "Queued", owner=frappe.session.user)
+	frappe.enqueue(
+		"e_mart.exporter.run_export_job",
+		queue="long",
+		timeout=4 * 60 * 60,
+		doctype=doctype,
+		filters=filters,
+		fields=fields,
+		file_format=file_format,
+		job_id=job_id,
+		user=frappe.session.user,
+	)
+	return job_id
+
+
+def should_run_in_background(doctype, filters=None, background=False):
+	"""Decide whether an export is too large to produce within the request"""
+	return cint(background) or frappe.db.count(doctype, filters=filters) > SYNC_ROW_LIMIT
@@ -86,7 +86,7 @@ doctype_js = {
 # ------------
 
 after_install = "e_mart.setup.after_install"
-after_migrate = "e_mart.setup.after_migrate"
+after_migrate = ["e_mart.setup.after_migrate", "e_mart.indexes.ensure_indexes"]
 
 # Uninstallation
 # ------------
@@ -143,9 +143,10 @@ before_uninstall = "e_mart.setup.before_uninstall"
 doc_events = {
 	"Serial and Batch Bundle": {
 		"on_submit": [
-			"e_mart.e_mart.custom_scripts.serial_and_batch_bundle.serial_and_batch_bundle.set_purchase_category_from_voucher",
-			"e_mart.e_mart.custom_scripts.serial_and_batch_bundle.serial_and_batch_bundle.set_purchase_category_on_creation",
-		]
+			"e_mart.e_mart.custom_scripts.serial_and_batch_bundle.serial_and_batch_bundle.propagate_purchase_category",
+			"e_mart.serial_provenance.update_provenance_on_submit",
+		],
+		"on_cancel": "e_mart.serial_provenance.update_provenance_on_cancel",
 	},
 	"Purchase Receipt": {
 		"before_insert": "e_mart.e_mart.custom_scripts.purchase_order.purchase_order.fetch_purchase_category"
@@ -155,7 +156,14 @@ doc_events = {
 		"on_submit": [
 			"e_mart.e_mart.custom_scripts.purchase_invoice.purchase_invoice.on_submit",
 			"e_mart.series_manager.PurchaseSeriesHandler.on_submit",
+			"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.update_invoice_rollup",
+			"e_mart.cache.invalidate_doc_tags",
+		],
+		"on_cancel": [
+			"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.update_invoice_rollup",
+			"e_mart.cache.invalidate_doc_tags",
 		],
+		"on_update_after_submit": "e_mart.cache.invalidate_doc_tags",
 	},
 	"Sales Invoice": {
 		"validate": [
@@ -168,13 +176,55 @@ doc_events = {
 		"on_submit": [
 			"e_mart.e_mart.custom_scripts.sales_invoice.sales_invoice.on_submit",
 			"e_mart.e_mart.custom_scripts.sales_invoice.sales_invoice.map_commission_to_sales_team",
+			"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.update_invoice_rollup",
+			"e_mart.cache.invalidate_doc_tags",
 		],
+		"on_cancel": [
+			"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.update_invoice_rollup",
+			"e_mart.cache.invalidate_doc_tags",
+		],
+		"on_update_after_submit": "e_mart.cache.invalidate_doc_tags",
 		"before_save": [
 			"e_mart.e_mart.custom_scripts.sales_invoice.sales_invoice.map_commission_to_sales_team"
 		],
 	},
+	"Supplier": {
+		"on_update": "e_mart.purchase_category.invalidate_supplier_category",
+		"after_rename": "e_mart.purchase_category.invalidate_supplier_category",
+		"on_trash": "e_mart.purchase_category.invalidate_supplier_category",
+	},
+	"Supplier Group": {
+		"on_update": "e_mart.purchase_category.invalidate_supplier_group_categories",
+		"after_rename": "e_mart.purchase_category.invalidate_supplier_group_categories",
+		"on_trash": "e_mart.purchase_category.invalidate_supplier_group_categories",
+	},
 	"Payment Entry": {
-		"on_submit": "e_mart.e_mart.custom_scripts.payment_entry.payment_entry.update_down_payment_status"
+		"on_submit": [
+			"e_mart.e_mart.custom_scripts.payment_entry.payment_entry.update_down_payment_status",
+			"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.update_rollup_from_payment",
+			"e_mart.cache.invalidate_doc_tags",
+		],
+		"on_cancel": [
+			"e_mart.e_mart.custom_scripts.payment_entry.payment_entry.update_down_payment_status",
+			"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.update_rollup_from_payment",
+			"e_mart.cache.invalidate_doc_tags",
+		],
+	},
+	"Journal Entry": {
+		"on_submit": "e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.update_rollup_from_journal_entry",
+		"on_cancel": "e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.update_rollup_from_journal_entry",
+	},
+	"Bin": {
+		"on_update": "e_mart.cache.invalidate_doc_tags",
+		"on_trash": "e_mart.cache.invalidate_doc_tags",
+	},
+	"Monthly Commission Log": {
+		"on_submit": "e_mart.cache.invalidate_doc_tags",
+		"on_cancel": "e_mart.cache.invalidate_doc_tags",
+	},
+	"Stock Ledger Entry": {
+		"on_submit": "e_mart.cache.invalidate_stock_tags",
+		"on_cancel": "e_mart.cache.invalidate_stock_tags",
 	},
 }
 
@@ -199,6 +249,15 @@ doc_events = {
 # 	],
 # }
 
+scheduler_events = {
+	"all": [
+		"e_mart.side_effects.retry_failed_side_effects",
+	],
+	"daily": [
+		"e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup.refresh_modified_rollups",
+	],
+}
+
 # Testing
 # -------
 
@@ -232,6 +291,9 @@ override_doctype_dashboards = {
 # before_request = ["e_mart.utils.before_request"]
 # after_request = ["e_mart.utils.after_request"]
 
+before_request = ["e_mart.cache.ensure_listener", "e_mart.profiling.before_request"]
+after_request = ["e_mart.profiling.after_request"]
+
 # Job Events
 # ----------
 # before_job = ["e_mart.utils.before_job"]
@@ -0,0 +1,252 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Index management module for E Mart app
+Composite indexes for the query patterns E Mart issues, created on migrate,
+and an EXPLAIN based advisor reporting patterns that still scan full tables
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+# Full scans over fewer estimated rows than this are not reported
+FULL_SCAN_MIN_ROWS = 1000
+
+# Each index lists the query pattern it serves; the advisor EXPLAINs these probes
+INDEXES = [
+	{
+		"doctype": "Sales Invoice",
+		"columns": ["docstatus", "posting_date"],
+		"name": "em_si_docstatus_posting_date",
+		"probe": "SELECT name FROM `tabSales Invoice` WHERE docstatus = 1 ORDER BY posting_date DESC LIMIT 20",
+	},
+	{
+		"doctype": "Sales Invoice",
+		"columns": ["docstatus", "customer"],
+		"name": "em_si_docstatus_customer",
+		"probe": "SELECT name FROM `tabSales Invoice` WHERE docstatus = 1 AND customer = %(value)s",
+	},
+	{
+		"doctype": "Sales Invoice",
+		"columns": ["sales_type", "docstatus"],
+		"name": "em_si_sales_type_docstatus",
+		"probe": "SELECT name FROM `tabSales Invoice` WHERE sales_type = 'EMI' AND docstatus = 1",
+	},
+	{
+		"doctype": "Sales Invoice",
+		"columns": ["docstatus", "outstanding_amount"],
+		"name": "em_si_docstatus_outstanding",
+		"probe": "SELECT name FROM `tabSales Invoice` WHERE docstatus = 1 AND outstanding_amount > 0",
+	},
+	{
+		"doctype": "Monthly Commission Log",
+		"columns": ["employee", "log_month", "start_date"],
+		"name": "em_mcl_employee_month_start",
+		"probe": """SELECT name FROM `tabMonthly Commission Log`
+			WHERE employee = %(value)s AND log_month = %(value)s AND start_date = '2025-01-01'""",
+	},
+	{
+		"doctype": "Serial and Batch Entry",
+		"columns": ["serial_no", "creation"],
+		"name": "em_sbe_serial_no_creation",
+		"probe": "SELECT parent FROM `tabSerial and Batch Entry` WHERE serial_no = %(value)s ORDER BY creation",
+	},
+	{
+		"doctype": "Serial and Batch Entry",
+		"columns": ["batch_no", "creation"],
+		"name": "em_sbe_batch_no_creation",
+		"probe": "SELECT parent FROM `tabSerial and Batch Entry` WHERE batch_no = %(value)s ORDER BY creation",
+	},
+	{
+		"doctype": "Task",
+		"columns": ["invoice_reference"],
+		"name": "em_task_invoice_reference",
+		"probe": "SELECT name FROM `tabTask` WHERE invoice_reference = %(value)s",
+	},
+	{
+		"doctype": "Debit Note Log",
+		"columns": ["purchase_invoice"],
+		"name": "em_dnl_purchase_invoice",
+		"probe": "SELECT name FROM `tabDebit Note Log` WHERE purchase_invoice = %(value)s",
+	},
+]
+
+
+class IndexManager:
+	"""Creates and reports the E Mart composite indexes"""
+
+	@staticmethod
+	def get_applicable(doctype=None):
+		"""
+		Get the index definitions whose table and columns exist on this site
+
+		Columns added by custom fields (e.g. sales_type) may be missing, in
+		which case their index is skipped rather than failing the migration.
+
+		Args:
+			doctype (str): Only indexes of this doctype
+
+		Returns:
+			list: Index definitions
+		"""
+		applicable = []
+		for index in INDEXES:
+			if doctype and index["doctype"] != doctype:
+				continue
+			if not frappe.db.table_exists(index["doctype"]):
+				continue
+			if all(frappe.db.has_column(index["doctype"], column) for column in index["columns"]):
+				applicable.append(index)
+		return applicable
+
+	@staticmethod
+	def ensure_indexes(doctype=None):
+		"""
+		Create missing indexes
+
+		Uses frappe.db.add_index, which issues the right DDL for MariaDB and
+		Postgres and skips indexes that already exist.
+
+		Args:
+			doctype (str): Only indexes of this doctype
+
+		Returns:
+			list: Names of the indexes created
+		"""
+		created = []
+		for index in IndexManager.get_applicable(doctype):
+			table = f"tab{index['doctype']}"
+			if frappe.db.has_index(table, index["name"]):
+				continue
+			try:
+				frappe.db.add_index(index["doctype"], index["columns"], index["name"])
+				created.append(index["name"])
+			except Exception as e:
+				frappe.log_error(
+					f"Failed to create index {index['name']} on {table}: {e!s}", "E Mart Index Error"
+				)
+		return created
+
+	@staticmethod
+	def get_status():
+		"""
+		Get the state of every index definition
+
+		Returns:
+			list: [{"doctype", "name", "columns", "status"}] with status
+				Present, Missing or Not Applicable
+		"""
+		applicable = {index["name"] for index in IndexManager.get_applicable()}
+		status = []
+		for index in INDEXES:
+			if index["name"] not in applicable:
+				state = "Not Applicable"
+			elif frappe.db.has_index(f"tab{index['doctype']}", index["name"]):
+				state = "Present"
+			else:
+				state = "Missing"
+			status.append(
+				{
+					"doctype": index["doctype"],
+					"name": index["name"],
+					"columns": index["columns"],
+					"status": state,
+				}
+			)
+		return status
+
+
+class QueryAdvisor:
+	"""EXPLAIN based detection of full table scans"""
+
+	@staticmethod
+	def explain(query, values=None):
+		"""
+		EXPLAIN a query
+
+		Returns:
+			list: EXPLAIN rows (MariaDB) or plan lines (Postgres)
+		"""
+		if not query.lstrip().upper().startswith("SELECT"):
+			frappe.throw(_("Only SELECT queries can be explained"))
+		return frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True)
+
+	@staticmethod
+	def find_full_scans(plan, min_rows=FULL_SCAN_MIN_ROWS):
+		"""
+		Get the full table scans of an EXPLAIN result
+
+		Returns:
+			list: [{"table", "rows", "detail"}]
+		"""
+		scans = []
+		for row in plan:
+			if "QUERY PLAN" in row:
+				line = row["QUERY PLAN"]
+				if "Seq Scan on" in line:
+					rows = cint(line.split("rows=")[1].split()[0]) if "rows=" in line else 0
+					if rows >= min_rows:
+						scans.append(
+							{"table": line.split("Seq Scan on")[1].split()[0], "rows": rows, "detail": line}
+						)
+			elif row.get("type") == "ALL" and cint(row.get("rows")) >= min_rows:
+				scans.append(
+					{"table": row.get("table"), "rows": cint(row.get("rows")), "detail": row.get("Extra")}
+				)
+		return scans
+
+	@staticmethod
+	def advise(queries=None, min_rows=FULL_SCAN_MIN_ROWS):
+		"""
+		Report full scans in E Mart query patterns
+
+		Args:
+			queries (dict): {label: SQL} to check instead of the index probes
+			min_rows (int): Ignore scans over fewer estimated rows
+
+		Returns:
+			list: [{"query", "index", "full_scans"}] for queries that scan
+		"""
+		if queries:
+			checks = [(label, sql, None) for label, sql in queries.items()]
+		else:
+			checks = [(index["name"], index["probe"], index) for index in IndexManager.get_applicable()]
+
+		report = []
+		for label, sql, index in checks:
+			try:
+				scans = QueryAdvisor.find_full_scans(QueryAdvisor.explain(sql, {"value": ""}), min_rows)
+			except Exception as e:
+				report.append({"query": label, "error": str(e)})
+				continue
+			if scans:
+				report.append(
+					{
+						"query": label,
+						"index": index and {"doctype": index["doctype"], "columns": index["columns"]},
+						"full_scans": scans,
+					}
+				)
+		return report
+
+
+def ensure_indexes():
+	"""after_migrate hook"""
+	created = IndexManager.ensure_indexes()
+	if created:
+		print(f"E Mart: created indexes {', '.join(created)}")
+
+
+@frappe.whitelist()
+def get_index_report(min_rows=FULL_SCAN_MIN_ROWS):
+	"""Get index status and full scans of E Mart query patterns"""
+	frappe.only_for("System Manager")
+	return {
+		"status": "success",
+		"data": {
+			"indexes": IndexManager.get_status(),
+			"full_scans": QueryAdvisor.advise(min_rows=cint(min_rows)),
+		},
+	}
@@ -0,0 +1,255 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+List query engine for E Mart app
+Parameterized, keyset-paginated list queries driven by whitelisted specs
+"""
+
+import base64
+import json
+
+import frappe
+from frappe import _
+from frappe.desk.reportview import get_match_cond
+from frappe.utils import cint
+
+MAX_PAGE_LENGTH = 500
+
+
+def encode_cursor(values):
+	"""Encode keyset values into an opaque pagination cursor"""
+	return base64.urlsafe_b64encode(frappe.as_json(values, indent=None).encode()).decode()
+
+
+def decode_cursor(cursor):
+	"""Decode a pagination cursor created by `encode_cursor`"""
+	try:
+		return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+	except Exception:
+		frappe.throw(_("Invalid pagination cursor"))
+
+
+class ListQuery:
+	"""
+	Whitelisted list query over a single table
+
+	Args:
+		doctype (str): DocType to list
+		fields (dict): {output name: SQL expression} that callers may project
+		default_fields (list): Fields returned when the caller requests none
+		filters (dict): {filter key: SQL condition using %(filter key)s}
+		order_by (tuple): Keyset columns, e.g. ("posting_date", "name")
+		descending (bool): Sort direction of the keyset
+		conditions (list): Conditions always applied
+		page_length (int): Default page length
+	"""
+
+	def __init__(
+		self,
+		doctype,
+		fields,
+		default_fields,
+		filters,
+		order_by=("posting_date", "name"),
+		descending=True,
+		conditions=None,
+		page_length=50,
+	):
+		self.doctype = doctype
+		self.fields = fields
+		self.default_fields = default_fields
+		self.filters = filters
+		self.order_by = order_by
+		self.descending = descending
+		self.conditions = conditions or []
+		self.page_length = page_length
+
+	def run(self, filters=None, fields=None, cursor=None, limit=None):
+		"""
+		Run the query
+
+		The session user needs read permission on the doctype, and user
+		permissions and permission query conditions are applied to the rows.
+
+		Args:
+			filters (dict | str): Filter values keyed by the spec's filter keys
+			fields (list | str): Requested output fields
+			cursor (str): `next_cursor` of the previous page
+			limit (int): Page length (capped at MAX_PAGE_LENGTH)
+
+		Returns:
+			dict: {"data": rows, "next_cursor": str | None, "has_more": bool}
+		"""
+		frappe.has_permission(self.doctype, "read", throw=True)
+
+		filters = self._parse(filters) or {}
+		fields = self._parse(fields) or self.default_fields
+		if isinstance(fields, str):
+			fields = [field.strip() for field in fields.split(",") if field.strip()]
+
+		limit = min(cint(limit) or self.page_length, MAX_PAGE_LENGTH)
+
+		unknown = [field for field in fields if field not in self.fields]
+		if unknown:
+			frappe.throw(_("Fields not allowed: {0}").format(", ".join(unknown)))
+
+		# Keyset columns are always projected so the next cursor can be built
+		projection = list(dict.fromkeys([*fields, *self.order_by]))
+
+		conditions = list(self.conditions)
+		values = {"limit": limit + 1}
+		for key, value in filters.items():
+			if key not in self.filters:
+				frappe.throw(_("Filter not allowed: {0}").format(key))
+			if value in (None, ""):
+				continue
+			conditions.append(self.filters[key])
+			values[key] = value
+
+		if cursor:
+			conditions.append(self._keyset_condition(decode_cursor(cursor), values))
+
+		direction = "DESC" if self.descending else "ASC"
+		rows = frappe.db.sql(
+			f"""
+			SELECT {", ".join(f"{self.fields[field]} as `{field}`" for field in projection)}
+			FROM `tab{self.doctype}`
+			WHERE {" AND ".join(conditions) or "1=1"}{get_match_cond(self.doctype)}
+			ORDER BY {", ".join(f"{self.fields[column]} {direction}" for column in self.order_by)}
+			LIMIT %(limit)s
+		""",
+			values,
+			as_dict=True,
+		)
+
+		has_more = len(rows) > limit
+		rows = rows[:limit]
+		next_cursor = (
+			encode_cursor({column: rows[-1][column] for column in self.order_by}) if has_more else None
+		)
+
+		return {"data": rows, "next_cursor": next_cursor, "has_more": has_more}
+
+	def _keyset_condition(self, after, values):
+		"""Build `(a, b) < (x, y)` style conditions that work on every database"""
+		operator = "<" if self.descending else ">"
+		clauses = []
+		for index, column in enumerate(self.order_by):
+			values[f"after_{column}"] = after.get(column)
+			equal = [f"{self.fields[prev]} = %(after_{prev})s" for prev in self.order_by[:index]]
+			clauses.append(
+				"(" + " AND ".join([*equal, f"{self.fields[column]} {operator} %(after_{column})s"]) + ")"
+			)
+		return "(" + " OR ".join(clauses) + ")"
+
+	@staticmethod
+	def _parse(value):
+		"""Accept JSON strings from HTTP requests"""
+		if isinstance(value, str) and value[:1] in ("{", "["):
+			return json.loads(value)
+		return value
+
+
+SALES_INVOICE_LIST = ListQuery(
+	"Sales Invoice",
+	fields={
+		field: f"`{field}`"
+		for field in (
+			"name",
+			"customer",
+			"customer_name",
+			"posting_date",
+			"grand_total",
+			"outstanding_amount",
+			"status",
+			"company",
+			"docstatus",
+		)
+	},
+	default_fields=["name", "customer", "posting_date", "grand_total", "status"],
+	filters={
+		"customer": "`customer` = %(customer)s",
+		"from_date": "`posting_date` >= %(from_date)s",
+		"to_date": "`posting_date` <= %(to_date)s",
+		"status": "`status` = %(status)s",
+		"company": "`company` = %(company)s",
+		"docstatus": "`docstatus` = %(docstatus)s",
+	},
+)
+
+PURCHASE_INVOICE_LIST = ListQuery(
+	"Purchase Invoice",
+	fields={
+		field: f"`{field}`"
+		for field in (
+			"name",
+			"supplier",
+			"supplier_name",
+			"posting_date",
+			"grand_total",
+			"outstanding_amount",
+			"status",
+			"company",
+			"docstatus",
+			"series_number",
+			"purchase_category",
+			"special_scheme",
+		)
+	},
+	default_fields=[
+		"name",
+		"supplier",
+		"posting_date",
+		"grand_total",
+		"status",
+		"series_number",
+		"purchase_category",
+		"special_scheme",
+	],
+	filters={
+		"supplier": "`supplier` = %(supplier)s",
+		"from_date": "`posting_date` >= %(from_date)s",
+		"to_date": "`posting_date` <= %(to_date)s",
+		"status": "`status` = %(status)s",
+		"company": "`company` = %(company)s",
+		"purchase_category": "`purchase_category` = %(purchase_category)s",
+		"docstatus": "`docstatus` = %(docstatus)s",
+	},
+)
+
+_BIN_QTY = "(SELECT COALESCE(SUM(b.{0}), 0) FROM `tabBin` b WHERE b.item_code = `tabItem`.name)"
+
+INVENTORY_ITEM_LIST = ListQuery(
+	"Item",
+	fields={
+		"name": "`tabItem`.`name`",
+		"item_code": "`tabItem`.`item_code`",
+		"item_name": "`tabItem`.`item_name`",
+		"item_group": "`tabItem`.`item_group`",
+		"brand": "`tabItem`.`brand`",
+		"stock_uom": "`tabItem`.`stock_uom`",
+		"actual_qty": _BIN_QTY.format("actual_qty"),
+		"reserved_qty": _BIN_QTY.format("reserved_qty"),
+		"available_qty": "(SELECT COALESCE(SUM(b.actual_qty - b.reserved_qty), 0) FROM `tabBin` b WHERE b.item_code = `tabItem`.name)",
+	},
+	default_fields=[
+		"item_code",
+		"item_name",
+		"item_group",
+		"brand",
+		"stock_uom",
+		"actual_qty",
+		"reserved_qty",
+		"available_qty",
+	],
+	filters={
+		"item_group": "`tabItem`.`item_group` = %(item_group)s",
+		"brand": "`tabItem`.`brand` = %(brand)s",
+		"search": "(`tabItem`.`item_name` LIKE CONCAT('%%', %(search)s, '%%') OR `tabItem`.`item_code` LIKE CONCAT('%%', %(search)s, '%%'))",
+	},
+	order_by=("item_name", "name"),
+	descending=False,
+	conditions=["`tabItem`.`is_stock_item` = 1"],
+	page_length=100,
+)
@@ -9,7 +9,10 @@ import json
 
 import frappe
 from frappe import _
-from frappe.utils import getdate, now_datetime
+from frappe.utils import cint, flt, getdate, now_datetime
+
+from e_mart.delta_sync import DeltaSync
+from e_mart.list_query import decode_cursor, encode_cursor
 
 
 @frappe.whitelist()
@@ -231,57 +234,108 @@ def get_mobile_customers(search_term=None, limit=20):
 
 
 @frappe.whitelist()
-def get_mobile_items(search_term=None, limit=20):
-	"""Get items for mobile app"""
+def get_mobile_items(search_term=None, limit=20, cursor=None, with_warehouses=False):
+	"""
+	Get items with stock for mobile app
+
+	Args:
+		search_term (str): Filter on item name
+		limit (int): Page size
+		cursor (str): Opaque cursor returned as `next_cursor` by the previous page
+		with_warehouses (bool): Include a per-warehouse stock breakdown
+	"""
 	try:
-		filters = {"disabled": 0}
+		limit = min(cint(limit) or 20, 100)
+		conditions = ["i.disabled = 0"]
+		values = {"limit": limit + 1}
 
 		if search_term:
-			filters["item_name"] = ["like", f"%{search_term}%"]
-
-		items = frappe.get_all(
-			"Item", filters=filters, fields=["name", "item_name", "item_group", "stock_uom"], limit=limit
+			conditions.append("i.item_name LIKE %(search_term)s")
+			values["search_term"] = f"%{search_term}%"
+
+		if cursor:
+			# Keyset pagination on (item_name, name)
+			after = decode_cursor(cursor)
+			conditions.append(
+				"(i.item_name > %(after_item_name)s OR (i.item_name = %(after_item_name)s AND i.name > %(after_name)s))"
+			)
+			values.update(after_item_name=after.get("item_name") or "", after_name=after.get("name") or "")
+
+		# Page of items first, so stock is only aggregated for the items returned
+		items = frappe.db.sql(
+			f"""
+			SELECT i.name, i.item_name, i.item_group, i.stock_uom
+			FROM `tabItem` i
+			WHERE {" AND ".join(conditions)}
+			ORDER BY i.item_name, i.name
+			LIMIT %(limit)s
+		""",
+			values,
+			as_dict=True,
 		)
 
-		# Add stock information
-		for item in items:
-			stock_info = frappe.db.sql(
-				"""
-				SELECT SUM(actual_qty) as total_qty
-				FROM `tabBin`
-				WHERE item_code = %s
-			""",
-				(item["name"],),
+		has_more = len(items) > limit
+		items = items[:limit]
+
+		names = [item.name for item in items]
+		available = {}
+		if names:
+			available = dict(
+				frappe.db.sql(
+					"""
+					SELECT item_code, SUM(actual_qty)
+					FROM `tabBin`
+					WHERE item_code IN %(names)s
+					GROUP BY item_code
+				""",
+					{"names": names},
+				)
 			)
+		for item in items:
+			item["available_qty"] = flt(available.get(item.name))
+
+		if cint(with_warehouses) and names:
+			warehouses = {}
+			for row in frappe.get_all(
+				"Bin",
+				filters={"item_code": ["in", names]},
+				fields=["item_code", "warehouse", "actual_qty"],
+			):
+				warehouses.setdefault(row.item_code, []).append(
+					{"warehouse": row.warehouse, "actual_qty": row.actual_qty}
+				)
+			for item in items:
+				item["warehouses"] = warehouses.get(item.name, [])
+
+		next_cursor = (
+			encode_cursor({"item_name": items[-1].item_name, "name": items[-1].name}) if has_more else None
+		)
 
-			item["available_qty"] = stock_info[0][0] if stock_info and stock_info[0][0] else 0
-
-		return {"status": "success", "data": items}
+		return {"status": "success", "data": items, "next_cursor": next_cursor, "has_more": has_more}
 	except Exception as e:
 		return {"status": "error", "message": str(e)}
 
 
 @frappe.whitelist()
-def sync_mobile_data():
-	"""Sync data for mobile app"""
-	try:
-		# Get last sync timestamp
-		last_sync = frappe.cache().get_value("mobile_last_sync")
-
-		# Get updated records since last sync
-		updated_invoices = frappe.get_all(
-			"Sales Invoice",
-			filters={"modified": [">", last_sync] if last_sync else ["!=", ""]},
-			fields=["name", "modified"],
-			limit=100,
-		)
+def sync_mobile_data(device_id=None, cursor=None, limit=None, doctypes=None):
+	"""
+	Get changes since the device's last acknowledged sync
 
-		# Update sync timestamp
-		frappe.cache().set_value("mobile_last_sync", now_datetime())
+	Send the returned `next_cursor` on the next call; keep calling while
+	`has_more` is true.
+	"""
+	try:
+		if isinstance(doctypes, str):
+			doctypes = json.loads(doctypes)
 
-		return {
-			"status": "success",
-			"data": {"updated_invoices": len(updated_invoices), "sync_timestamp": now_datetime()},
-		}
+		result = DeltaSync.get_changes(device_id, cursor=cursor, limit=limit, doctypes=doctypes)
+		return {"status": "success", "data": {**result, "sync_timestamp": now_datetime()}}
 	except Exception as e:
 		return {"status": "error", "message": str(e)}
+
+
+@frappe.whitelist()
+def reset_mobile_sync(device_id):
+	"""Force a full resync of a device"""
+	DeltaSync.reset_watermark(device_id)
+	return {"status": "success"}
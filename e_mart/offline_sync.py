@@ -0,0 +1,327 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Offline sync module for E Mart app
+Replays invoices captured offline in validated, idempotent batches,
+committed per chunk with a savepoint per record
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe import _
+
+BACKGROUND_THRESHOLD = 50
+CHUNK_SIZE = 20
+UNKEYED_PREFIX = "unkeyed-"
+
+RECORD_TYPES = {
+	"sales_invoice": {"doctype": "Sales Invoice", "party_doctype": "Customer", "party_field": "customer"},
+	"purchase_invoice": {
+		"doctype": "Purchase Invoice",
+		"party_doctype": "Supplier",
+		"party_field": "supplier",
+	},
+}
+
+
+class OfflineSyncEngine:
+	"""Batch sync of offline records with idempotency keys"""
+
+	@staticmethod
+	def get_idempotency_key(record, device_id=None):
+		"""
+		Get the idempotency key of a record, as the client knows it
+
+		Clients should send `idempotency_key`. Without one, the key is a hash of
+		the device, the client timestamp of the record and its content, so two
+		identical sales made at different times stay two sales. Records with
+		neither a key nor a timestamp, as older app versions send them, get no
+		key and are synced without deduplication.
+
+		Returns:
+			str: Client idempotency key, or None
+		"""
+		key = record.get("idempotency_key") or record.get("client_id")
+		if key:
+			return str(key)[:140]
+
+		timestamp = record.get("client_timestamp") or record.get("timestamp")
+		if not timestamp:
+			return None
+
+		payload = json.dumps(
+			{
+				"device_id": device_id,
+				"timestamp": timestamp,
+				"type": record.get("type"),
+				"data": record.get("data"),
+			},
+			sort_keys=True,
+			default=str,
+		)
+		return hashlib.sha1(payload.encode()).hexdigest()
+
+	@staticmethod
+	def get_log_name(key, device_id=None, user=None):
+		"""
+		Name of the Offline Sync Log of a client key
+
+		Keys are scoped to the user and device, so different clients may reuse
+		the same key without their records being taken for duplicates.
+		"""
+		scope = "\n".join((user or frappe.session.user, device_id or "", key))
+		return hashlib.sha1(scope.encode()).hexdigest()
+
+	@staticmethod
+	def sync(records, device_id=None, user=None):
+		"""
+		Sync a batch of offline records
+
+		Args:
+			records (list): [{"type", "data", "idempotency_key"}]
+			device_id (str): Optional device identifier; idempotency keys are scoped to it
+			user (str): User the records belong to (default: session user)
+
+		Returns:
+			dict: {idempotency_key: {"status", "name", "message"}}; records
+				without a key are reported under a generated one, with
+				"deduplicated": False
+		"""
+		user = user or frappe.session.user
+		results = {}
+		pending = []
+		unkeyed = set()
+
+		for record in records:
+			key = OfflineSyncEngine.get_idempotency_key(record, device_id)
+			if not key:
+				# Nothing identifies a retry of this record, so it is never taken for one
+				key = UNKEYED_PREFIX + frappe.generate_hash(length=20)
+				unkeyed.add(key)
+			if key in results or any(key == other[0] for other in pending):
+				results[key] = {"status": "Duplicate", "message": _("Repeated in batch")}
+				continue
+			if record.get("type") not in RECORD_TYPES:
+				results[key] = {"status": "Invalid", "message": _("Unknown record type")}
+				continue
+			pending.append((key, record))
+
+		if not pending:
+			return results
+
+		# Skip records that were already synced
+		log_names = {key: OfflineSyncEngine.get_log_name(key, device_id, user) for key, _record in pending}
+		synced = {
+			row.name: row
+			for row in frappe.get_all(
+				"Offline Sync Log",
+				filters={"name": ["in", list(log_names.values())], "status": "Synced"},
+				fields=["name", "reference_name"],
+			)
+		}
+		for key, _record in pending:
+			if log_names[key] in synced:
+				results[key] = {"status": "Duplicate", "name": synced[log_names[key]].reference_name}
+		pending = [(key, record) for key, record in pending if log_names[key] not in synced]
+
+		# Validate parties and items for the whole batch up front
+		errors = OfflineSyncEngine.validate(pending)
+		for key, message in errors.items():
+			results[key] = {"status": "Invalid", "message": message}
+			OfflineSyncEngine.log(log_names[key], key, None, "Failed", device_id, user, error=message)
+		pending = [(key, record) for key, record in pending if key not in errors]
+		frappe.db.commit()
+
+		for start in range(0, len(pending), CHUNK_SIZE):
+			chunk = pending[start : start + CHUNK_SIZE]
+			results.update(OfflineSyncEngine.process_chunk(chunk, log_names, device_id, user))
+
+		for key in unkeyed:
+			results[key]["deduplicated"] = False
+		return results
+
+	@staticmethod
+	def process_chunk(chunk, log_names, device_id=None, user=None):
+		"""
+		Process a chunk of records in one transaction
+
+		Every record runs in a savepoint of its own, so a failing record is
+		rolled back alone and the chunk is committed once. If the transaction
+		itself is lost, e.g. to a deadlock, the whole chunk is rolled back and
+		reported as failed, to be retried with the same keys.
+
+		Returns:
+			dict: {idempotency_key: result}
+		"""
+		results = {}
+		try:
+			for key, record in chunk:
+				results[key] = OfflineSyncEngine.process(log_names[key], key, record, device_id, user)
+			frappe.db.commit()
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.clear_messages()
+			frappe.log_error(f"Offline sync chunk failed: {e!s}", "E Mart Offline Sync Error")
+			results = {key: {"status": "Failed", "message": str(e)} for key, _record in chunk}
+		return results
+
+	@staticmethod
+	def validate(pending):
+		"""
+		Check every referenced party and item with one query per doctype
+
+		Returns:
+			dict: {idempotency_key: error message}
+		"""
+		parties = {"Customer": set(), "Supplier": set()}
+		item_codes = set()
+
+		for _key, record in pending:
+			config = RECORD_TYPES[record["type"]]
+			data = record.get("data") or {}
+			parties[config["party_doctype"]].add(data.get(config["party_field"]))
+			item_codes.update(item.get("item_code") for item in data.get("items") or [])
+
+		existing = {
+			doctype: set(
+				frappe.get_all(doctype, filters={"name": ["in", list(names - {None})]}, pluck="name")
+			)
+			if names - {None}
+			else set()
+			for doctype, names in parties.items()
+		}
+		existing_items = (
+			set(frappe.get_all("Item", filters={"name": ["in", list(item_codes - {None})]}, pluck="name"))
+			if item_codes - {None}
+			else set()
+		)
+
+		errors = {}
+		for key, record in pending:
+			config = RECORD_TYPES[record["type"]]
+			data = record.get("data") or {}
+			party = data.get(config["party_field"])
+			items = data.get("items") or []
+
+			if not party or party not in existing[config["party_doctype"]]:
+				errors[key] = _("{0} {1} not found").format(config["party_doctype"], party)
+			elif not items:
+				errors[key] = _("Items are required")
+			else:
+				missing = [
+					item.get("item_code") for item in items if item.get("item_code") not in existing_items
+				]
+				if missing:
+					errors[key] = _("Items not found: {0}").format(", ".join(map(str, missing)))
+
+		return errors
+
+	@staticmethod
+	def process(name, key, record, device_id=None, user=None):
+		"""
+		Create one document inside a savepoint of its own
+
+		A failure is rolled back to the savepoint, so it never leaves part of
+		a document behind nor undoes another record of the chunk.
+
+		A retried key is claimed before the document is built: the log of the
+		previous attempt is locked, so a concurrent retry waits and then finds
+		it Synced. A new key has no log to lock; its log name is unique, so the
+		second of two concurrent first attempts fails to insert it and rolls
+		its document back.
+		"""
+		from e_mart.api import make_purchase_invoice, make_sales_invoice
+
+		builders = {"sales_invoice": make_sales_invoice, "purchase_invoice": make_purchase_invoice}
+
+		frappe.db.savepoint("offline_sync_record")
+		try:
+			if frappe.db.exists("Offline Sync Log", name):
+				previous = frappe.db.get_value(
+					"Offline Sync Log", name, ["status", "reference_name"], as_dict=True, for_update=True
+				)
+				if previous.status == "Synced":
+					return {"status": "Duplicate", "name": previous.reference_name}
+
+			doc = builders[record["type"]](record.get("data") or {})
+			OfflineSyncEngine.log(name, key, record, "Synced", device_id, user, doc=doc)
+			return {"status": "Synced", "name": doc.name}
+		except frappe.DuplicateEntryError:
+			# A concurrent batch synced the same key first
+			frappe.db.rollback(save_point="offline_sync_record")
+			frappe.clear_messages()
+			return {
+				"status": "Duplicate",
+				"name": frappe.db.get_value("Offline Sync Log", name, "reference_name"),
+			}
+		except Exception as e:
+			frappe.db.rollback(save_point="offline_sync_record")
+			frappe.clear_messages()
+			OfflineSyncEngine.log(name, key, record, "Failed", device_id, user, error=str(e))
+			return {"status": "Failed", "message": str(e)}
+
+	@staticmethod
+	def log(name, key, record, status, device_id=None, user=None, doc=None, error=None):
+		"""Insert or update the sync log of an idempotency key"""
+		values = {
+			"record_type": (record or {}).get("type"),
+			"status": status,
+			"device_id": device_id,
+			"reference_doctype": doc.doctype if doc else None,
+			"reference_name": doc.name if doc else None,
+			"error": error,
+		}
+
+		previous = frappe.db.get_value("Offline Sync Log", name, "status")
+		if status == "Failed" and previous:
+			# Never overwrite a concurrent attempt that synced the key
+			if previous != "Synced":
+				frappe.db.set_value("Offline Sync Log", name, values)
+			return
+
+		if status == "Synced" and previous == "Failed":
+			# Retry of a previously failed record
+			frappe.db.set_value("Offline Sync Log", name, values)
+			return
+
+		frappe.get_doc(
+			{
+				"doctype": "Offline Sync Log",
+				"idempotency_key": name,
+				"client_key": key,
+				"user": user or frappe.session.user,
+				**values,
+			}
+		).insert(ignore_permissions=True)
+
+
+def run_sync_job(records, device_id=None, user=None):
+	"""Background job entry point for large batches"""
+	results = OfflineSyncEngine.sync(records, device_id, user)
+	if user:
+		frappe.publish_realtime("e_mart_offline_sync_complete", {"results": results}, user=user)
+	return results
+
+
+@frappe.whitelist()
+def get_sync_results(idempotency_keys, device_id=None):
+	"""Get the sync status of records the session user pushed earlier from a device"""
+	if isinstance(idempotency_keys, str):
+		idempotency_keys = json.loads(idempotency_keys)
+
+	keys = {OfflineSyncEngine.get_log_name(key, device_id): key for key in idempotency_keys}
+	rows = frappe.get_all(
+		"Offline Sync Log",
+		filters={"name": ["in", list(keys)]},
+		fields=["name", "status", "reference_name", "error"],
+	)
+	return {
+		"success": True,
+		"data": {
+			keys[row.name]: {"status": row.status, "name": row.reference_name, "message": row.error}
+			for row in rows
+		},
+	}
@@ -0,0 +1,5 @@
+from e_mart.archival import LogArchiver
+
+
+def execute():
+	LogArchiver.backfill_tombstones()
@@ -0,0 +1,17 @@
+import frappe
+
+
+def execute():
+	frappe.db.sql(
+		"""
+		UPDATE `tabMonthly Commission Log` log
+		SET total_amount = (
+				SELECT COALESCE(SUM(row.total_amount), 0) FROM `tabMonthly Commission Logs` row
+				WHERE row.parent = log.name AND row.parenttype = 'Monthly Commission Log'
+			),
+			total_incentives = (
+				SELECT COALESCE(SUM(row.incentives), 0) FROM `tabMonthly Commission Logs` row
+				WHERE row.parent = log.name AND row.parenttype = 'Monthly Commission Log'
+			)
+	"""
+	)
@@ -0,0 +1,5 @@
+from e_mart.e_mart.doctype.daily_invoice_rollup.daily_invoice_rollup import rebuild_invoice_rollup
+
+
+def execute():
+	rebuild_invoice_rollup()
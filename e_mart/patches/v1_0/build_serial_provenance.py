@@ -0,0 +1,6 @@
+import frappe
+
+
+def execute():
+	# Large stock histories take a while; build the table outside the migration
+	frappe.enqueue("e_mart.serial_provenance.rebuild_serial_provenance", queue="long", timeout=6 * 60 * 60)
@@ -10,7 +10,10 @@ from functools import wraps
 
 import frappe
 from frappe import _
-from frappe.utils import now_datetime
+
+from e_mart.archival import archive_old_logs
+from e_mart.cache import CacheInvalidator, cached
+from e_mart.indexes import IndexManager
 
 
 class PerformanceMonitor:
@@ -35,25 +38,9 @@ class PerformanceMonitor:
 		return wrapper
 
 	@staticmethod
-	def cache_result(ttl=3600):
-		"""Decorator to cache function results"""
-
-		def decorator(func):
-			@wraps(func)
-			def wrapper(*args, **kwargs):
-				cache_key = f"{func.__name__}:{hash(str(args) + str(kwargs))}"
-				cached_result = frappe.cache().get_value(cache_key)
-
-				if cached_result is not None:
-					return cached_result
-
-				result = func(*args, **kwargs)
-				frappe.cache().set_value(cache_key, result, expires_in_sec=ttl)
-				return result
-
-			return wrapper
-
-		return decorator
+	def cache_result(ttl=3600, tags=(), stale_ttl=0):
+		"""Decorator to cache function results (see `e_mart.cache.cached`)"""
+		return cached(ttl=ttl, tags=tags, stale_ttl=stale_ttl)
 
 
 class QueryOptimizer:
@@ -61,20 +48,8 @@ class QueryOptimizer:
 
 	@staticmethod
 	def optimize_sales_invoice_query():
-		"""Optimize sales invoice queries with proper indexing"""
-		# Add indexes for frequently queried fields
-		indexes = [
-			"CREATE INDEX IF NOT EXISTS idx_sales_invoice_posting_date ON `tabSales Invoice` (posting_date)",
-			"CREATE INDEX IF NOT EXISTS idx_sales_invoice_customer ON `tabSales Invoice` (customer)",
-			"CREATE INDEX IF NOT EXISTS idx_sales_invoice_status ON `tabSales Invoice` (status)",
-			"CREATE INDEX IF NOT EXISTS idx_sales_invoice_emi_schedule ON `tabSales Invoice` (emi_schedule)",
-		]
-
-		for index in indexes:
-			try:
-				frappe.db.sql(index)
-			except Exception as e:
-				frappe.logger().error(f"Index creation failed: {e}")
+		"""Create the Sales Invoice indexes (see `e_mart.indexes`)"""
+		return IndexManager.ensure_indexes("Sales Invoice")
 
 	@staticmethod
 	def batch_process_records(doctype, batch_size=1000):
@@ -92,31 +67,18 @@ class DatabaseOptimizer:
 	"""Database optimization utilities"""
 
 	@staticmethod
-	def cleanup_old_logs(days=90):
-		"""Clean up old log entries to improve performance"""
-		from datetime import timedelta
-
-		cutoff_date = now_datetime() - timedelta(days=days)
-
-		# Clean up old commission logs
-		frappe.db.sql(
-			"""
-			DELETE FROM `tabMonthly Commission Log`
-			WHERE creation < %s
-		""",
-			(cutoff_date,),
-		)
-
-		# Clean up old debit note logs
-		frappe.db.sql(
-			"""
-			DELETE FROM `tabDebit Note Log`
-			WHERE creation < %s
-		""",
-			(cutoff_date,),
-		)
-
-		frappe.db.commit()
+	def cleanup_old_logs(days=90, target="table"):
+		"""
+		Archive old commission and debit note logs in small batches (see `e_mart.archival`)
+
+		Args:
+			days (int): Archive logs created more than this many days ago
+			target (str): "table" or "ndjson"
+
+		Returns:
+			list: Summary per doctype
+		"""
+		return archive_old_logs(days=days, target=target)
 
 	@staticmethod
 	def optimize_tables():
@@ -141,9 +103,8 @@ class MemoryOptimizer:
 
 	@staticmethod
 	def clear_cache():
-		"""Clear application cache"""
-		frappe.clear_cache()
-		frappe.cache().clear()
+		"""Clear E Mart caches on every worker without flushing framework caches"""
+		CacheInvalidator.invalidate_all()
 
 	@staticmethod
 	def monitor_memory_usage():
@@ -0,0 +1,374 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Request profiling module for E Mart app
+Per-endpoint latency histograms, DB and Redis counters for whitelisted E Mart
+methods, and an optional sampling profiler for slow requests
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+import frappe
+from frappe.utils import add_days, cint, flt, getdate, now
+
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+
+# Only methods of these modules are instrumented
+INSTRUMENTED_PREFIXES = ("e_mart.api.", "e_mart.mobile.", "e_mart.series_manager.")
+
+STATS_KEY = "e_mart_endpoint_stats:{date}:{endpoint}"
+ENDPOINTS_KEY = "e_mart_endpoint_stats:{date}"
+PROFILES_KEY = "e_mart_slow_request_profiles"
+STATS_RETENTION_DAYS = 8
+MAX_PROFILES = 100
+
+# Upper bounds of the latency buckets in milliseconds (the last bucket is open)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Reference count of the profiled requests sharing the `frappe.cache` patch
+_cache_patch = {"requests": 0, "original": None}
+_cache_patch_lock = threading.Lock()
+
+
+class RequestProfiler:
+	"""Per-request telemetry for whitelisted E Mart endpoints"""
+
+	@staticmethod
+	def get_endpoint():
+		"""
+		Get the dotted method path of the current request, if it is instrumented
+
+		Only paths that resolve to a whitelisted function are recorded, so
+		requests for made-up method names cannot add endpoints to the stats.
+		"""
+		request = getattr(frappe.local, "request", None)
+		if not request:
+			return None
+
+		path = request.path or ""
+		for prefix in ("/api/method/", "/api/v2/method/"):
+			if path.startswith(prefix):
+				method = path[len(prefix) :]
+				break
+		else:
+			method = frappe.form_dict.get("cmd") or ""
+
+		if not method.startswith(INSTRUMENTED_PREFIXES):
+			return None
+
+		try:
+			function = frappe.get_attr(method)
+		except Exception:
+			return None
+		return method if function in frappe.whitelisted else None
+
+	@staticmethod
+	def start(endpoint):
+		"""Start measuring the current request"""
+		profile = {
+			"endpoint": endpoint,
+			"start": time.perf_counter(),
+			"db_queries": 0,
+			"db_ms": 0.0,
+			"redis_calls": 0,
+			"sampler": None,
+		}
+		profile["cache"] = RequestProfiler.get_counted_cache(profile)
+		frappe.local.e_mart_profile = profile
+		RequestProfiler.install_cache_patch()
+		profile["cache_patched"] = True
+
+		db = frappe.local.db
+		previous = db.__dict__.get("sql")
+		original = previous or db.sql
+
+		def timed_sql(*args, **kwargs):
+			started = time.perf_counter()
+			try:
+				return original(*args, **kwargs)
+			finally:
+				profile["db_queries"] += 1
+				profile["db_ms"] += (time.perf_counter() - started) * 1000
+
+		db.sql = timed_sql
+		profile["restore_sql"] = (db, previous)
+
+		sample_rate = flt(frappe.conf.get("e_mart_profile_sample_rate"))
+		if sample_rate and random.random() < sample_rate:
+			profile["sampler"] = StackSampler(threading.get_ident())
+			profile["sampler"].start()
+
+	@staticmethod
+	def finish(status_code=None):
+		"""Stop measuring and record the request"""
+		profile = getattr(frappe.local, "e_mart_profile", None)
+		if not profile:
+			return
+		frappe.local.e_mart_profile = None
+		if profile.get("cache_patched"):
+			RequestProfiler.remove_cache_patch()
+
+		wall_ms = (time.perf_counter() - profile["start"]) * 1000
+
+		db, previous = profile["restore_sql"]
+		if previous:
+			db.sql = previous
+		else:
+			db.__dict__.pop("sql", None)
+
+		stacks = profile["sampler"].stop() if profile["sampler"] else None
+
+		try:
+			RequestProfiler.record(profile, wall_ms, status_code)
+			threshold = cint(frappe.conf.get("e_mart_profile_threshold_ms")) or 1000
+			if stacks and wall_ms >= threshold:
+				RequestProfiler.save_stacks(profile["endpoint"], wall_ms, stacks)
+		except Exception as e:
+			frappe.logger().warning(f"E Mart profiling failed for {profile['endpoint']}: {e!s}")
+
+	@staticmethod
+	def record(profile, wall_ms, status_code=None):
+		"""Add a request to its endpoint's daily counters with one pipelined round trip"""
+		cache = frappe.cache()
+		date = getdate().isoformat()
+		key = cache.make_key(STATS_KEY.format(date=date, endpoint=profile["endpoint"]))
+		index_key = cache.make_key(ENDPOINTS_KEY.format(date=date))
+		bucket = next((str(bound) for bound in BUCKETS_MS if wall_ms <= bound), "inf")
+		ttl = STATS_RETENTION_DAYS * 24 * 60 * 60
+
+		pipe = cache.pipeline(transaction=False)
+		pipe.hincrby(key, "count", 1)
+		pipe.hincrby(key, f"b{bucket}", 1)
+		pipe.hincrbyfloat(key, "wall_ms", round(wall_ms, 3))
+		pipe.hincrby(key, "db_queries", profile["db_queries"])
+		pipe.hincrbyfloat(key, "db_ms", round(profile["db_ms"], 3))
+		pipe.hincrby(key, "redis_calls", profile["redis_calls"])
+		if status_code and cint(status_code) >= 500:
+			pipe.hincrby(key, "errors", 1)
+		pipe.expire(key, ttl)
+		pipe.sadd(index_key, profile["endpoint"])
+		pipe.expire(index_key, ttl)
+		pipe.execute()
+
+	@staticmethod
+	def save_stacks(endpoint, wall_ms, stacks):
+		"""Keep the collapsed stacks of a slow request, newest first"""
+		cache = frappe.cache()
+		key = cache.make_key(PROFILES_KEY)
+		entry = {
+			"endpoint": endpoint,
+			"wall_ms": round(wall_ms, 1),
+			"timestamp": now(),
+			"user": frappe.session.user,
+			"stacks": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+		}
+		pipe = cache.pipeline(transaction=False)
+		pipe.lpush(key, json.dumps(entry))
+		pipe.ltrim(key, 0, MAX_PROFILES - 1)
+		pipe.execute()
+
+	@staticmethod
+	def get_stats(days=1):
+		"""
+		Aggregate endpoint counters over the last `days` days
+
+		Returns:
+			list: Per-endpoint count, p50/p95/p99 and DB/Redis averages, slowest p95 first
+		"""
+		cache = frappe.cache()
+		today = getdate()
+		totals = {}
+
+		for offset in range(max(cint(days), 1)):
+			date = add_days(today, -offset).isoformat()
+			endpoints = cache.smembers(cache.make_key(ENDPOINTS_KEY.format(date=date)))
+			for endpoint in endpoints:
+				endpoint = endpoint.decode() if isinstance(endpoint, bytes) else endpoint
+				values = cache.hgetall(cache.make_key(STATS_KEY.format(date=date, endpoint=endpoint)))
+				merged = totals.setdefault(endpoint, Counter())
+				for field, value in values.items():
+					field = field.decode() if isinstance(field, bytes) else field
+					merged[field] += flt(value.decode() if isinstance(value, bytes) else value)
+
+		stats = []
+		for endpoint, values in totals.items():
+			count = cint(values["count"])
+			if not count:
+				continue
+			stats.append(
+				{
+					"endpoint": endpoint,
+					"count": count,
+					"errors": cint(values["errors"]),
+					"avg_ms": flt(values["wall_ms"] / count, 2),
+					"p50_ms": RequestProfiler.percentile(values, count, 0.50),
+					"p95_ms": RequestProfiler.percentile(values, count, 0.95),
+					"p99_ms": RequestProfiler.percentile(values, count, 0.99),
+					"avg_db_queries": flt(values["db_queries"] / count, 2),
+					"avg_db_ms": flt(values["db_ms"] / count, 2),
+					"avg_redis_calls": flt(values["redis_calls"] / count, 2),
+				}
+			)
+
+		# An open-ended p95 (None) sorts as the slowest
+		return sorted(stats, key=lambda row: row["p95_ms"] or float("inf"), reverse=True)
+
+	@staticmethod
+	def percentile(values, count, quantile):
+		"""
+		Approximate a percentile as the upper bound of the bucket that contains it
+
+		Returns:
+			int: Bucket bound in milliseconds, or None past the last bound
+		"""
+		target = quantile * count
+		seen = 0
+		for bound in BUCKETS_MS:
+			seen += values[f"b{bound}"]
+			if seen >= target:
+				return bound
+		return None
+
+	@staticmethod
+	def get_counted_cache(profile):
+		"""
+		Redis client of one profiled request, counting the commands it issues
+
+		It shares the connection pool of `frappe.cache()`, and only this
+		instance's execute_command is wrapped; RedisWrapper is left untouched.
+		"""
+		cache = frappe.cache()
+		counted = type(cache)(connection_pool=cache.connection_pool)
+		execute_command = counted.execute_command
+
+		def counted_execute_command(*args, **kwargs):
+			profile["redis_calls"] += 1
+			return execute_command(*args, **kwargs)
+
+		counted.execute_command = counted_execute_command
+		return counted
+
+	@staticmethod
+	def install_cache_patch():
+		"""
+		Make `frappe.cache()` return the counted client while a request is profiled
+
+		The patch is installed by the first profiled request of the process and
+		removed again by the last one to finish, so `frappe.cache` is the
+		framework's own function whenever no profiled request is running.
+		Only calls made through `frappe.cache()` are counted; code holding a
+		client it fetched earlier bypasses the counter.
+		"""
+		with _cache_patch_lock:
+			_cache_patch["requests"] += 1
+			if _cache_patch["requests"] > 1:
+				return
+
+			get_cache = frappe.cache
+			_cache_patch["original"] = get_cache
+
+			@wraps(get_cache)
+			def cache():
+				profile = getattr(frappe.local, "e_mart_profile", None)
+				return profile["cache"] if profile else get_cache()
+
+			frappe.cache = cache
+
+	@staticmethod
+	def remove_cache_patch():
+		"""Restore `frappe.cache` once no profiled request is running"""
+		with _cache_patch_lock:
+			_cache_patch["requests"] -= 1
+			if _cache_patch["requests"] > 0:
+				return
+
+			frappe.cache = _cache_patch["original"]
+			_cache_patch["original"] = None
+
+
+class StackSampler:
+	"""
+	Samples the stack of one thread at a fixed interval
+
+	Stacks are collapsed into "frame;frame;frame" strings, the input format of
+	flamegraph.pl and speedscope.
+	"""
+
+	def __init__(self, thread_id, interval=None):
+		self.thread_id = thread_id
+		self.interval = interval or (cint(frappe.conf.get("e_mart_profile_interval_ms")) or 5) / 1000
+		self.stacks = Counter()
+		self.stopped = threading.Event()
+		self.thread = threading.Thread(target=self.run, daemon=True)
+
+	def start(self):
+		self.thread.start()
+
+	def stop(self):
+		"""Stop sampling and return the collapsed stack counts"""
+		self.stopped.set()
+		self.thread.join(timeout=1)
+		return self.stacks
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			frame = sys._current_frames().get(self.thread_id)
+			if frame is None:
+				continue
+
+			frames = []
+			while frame is not None:
+				code = frame.f_code
+				frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+				frame = frame.f_back
+			self.stacks[";".join(reversed(frames))] += 1
+
+
+def before_request():
+	"""before_request hook starting telemetry for instrumented endpoints"""
+	try:
+		if not SettingsCache.get_bool("enable_performance_monitoring"):
+			return
+		endpoint = RequestProfiler.get_endpoint()
+		if endpoint:
+			RequestProfiler.start(endpoint)
+	except Exception as e:
+		frappe.logger().warning(f"E Mart profiling could not start: {e!s}")
+
+
+def after_request(response=None, request=None):
+	"""after_request hook recording telemetry"""
+	RequestProfiler.finish(getattr(response, "status_code", None))
+
+
+@frappe.whitelist()
+def get_endpoint_stats(days=1):
+	"""Get latency percentiles and DB/Redis usage per endpoint"""
+	frappe.only_for("System Manager")
+	return {"status": "success", "data": RequestProfiler.get_stats(days)}
+
+
+@frappe.whitelist()
+def get_slow_request_profiles(limit=20):
+	"""Get sampled stacks of slow requests in collapsed flame graph format"""
+	frappe.only_for("System Manager")
+	cache = frappe.cache()
+	entries = cache.lrange(cache.make_key(PROFILES_KEY), 0, max(cint(limit), 1) - 1)
+	return {"status": "success", "data": [json.loads(entry) for entry in entries]}
+
+
+@frappe.whitelist()
+def reset_endpoint_stats():
+	"""Drop all endpoint counters and slow request profiles"""
+	frappe.only_for("System Manager")
+	cache = frappe.cache()
+	cache.delete_keys("e_mart_endpoint_stats:*")
+	cache.delete(cache.make_key(PROFILES_KEY))
+	return {"status": "success"}
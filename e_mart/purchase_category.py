@@ -0,0 +1,142 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Purchase category resolution module for E Mart app
+Resolves "Normal"/"Special" purchase categories for suppliers and purchase
+orders in batches, with a per-request cache and a shared supplier cache
+"""
+
+import pickle
+
+import frappe
+
+SUPPLIER_CACHE_KEY = "e_mart_supplier_purchase_category"
+
+
+class PurchaseCategoryResolver:
+	"""Batched, cached purchase category lookups"""
+
+	@staticmethod
+	def _request_cache():
+		"""Per-request cache, discarded together with frappe.local"""
+		if not hasattr(frappe.local, "e_mart_purchase_category"):
+			frappe.local.e_mart_purchase_category = {"supplier": {}, "purchase_order": {}}
+		return frappe.local.e_mart_purchase_category
+
+	@staticmethod
+	def classify_supplier_group(supplier_group):
+		"""
+		Classify a supplier group
+
+		Args:
+			supplier_group (str): Supplier Group name
+
+		Returns:
+			str: "Special" or "Normal"
+		"""
+		if supplier_group and "special" in supplier_group.lower():
+			return "Special"
+		return "Normal"
+
+	@staticmethod
+	def get_supplier_category(supplier):
+		"""
+		Get the purchase category implied by a supplier's group
+
+		Args:
+			supplier (str): Supplier name
+
+		Returns:
+			str: "Special" or "Normal"
+		"""
+		return PurchaseCategoryResolver.get_supplier_categories([supplier]).get(supplier, "Normal")
+
+	@staticmethod
+	def get_supplier_categories(suppliers):
+		"""
+		Get purchase categories for several suppliers with at most one query
+
+		Args:
+			suppliers (list): Supplier names
+
+		Returns:
+			dict: {supplier: "Special" | "Normal"}
+		"""
+		local_cache = PurchaseCategoryResolver._request_cache()["supplier"]
+		suppliers = {supplier for supplier in suppliers if supplier}
+
+		missing = [supplier for supplier in suppliers if supplier not in local_cache]
+		if missing:
+			for supplier, category in zip(missing, get_cached_categories(missing), strict=True):
+				if category:
+					local_cache[supplier] = category
+
+			missing = [supplier for supplier in missing if supplier not in local_cache]
+
+		if missing:
+			rows = frappe.get_all(
+				"Supplier",
+				filters={"name": ["in", missing]},
+				fields=["name", "supplier_group"],
+			)
+			for row in rows:
+				category = PurchaseCategoryResolver.classify_supplier_group(row.supplier_group)
+				local_cache[row.name] = category
+				frappe.cache().hset(SUPPLIER_CACHE_KEY, row.name, category)
+
+		return {supplier: local_cache.get(supplier, "Normal") for supplier in suppliers}
+
+	@staticmethod
+	def get_purchase_order_categories(purchase_orders):
+		"""
+		Get purchase categories for several purchase orders with one IN (...) query
+
+		Args:
+			purchase_orders (list): Purchase Order names
+
+		Returns:
+			dict: {purchase_order: purchase_category}, without orders that have none
+		"""
+		local_cache = PurchaseCategoryResolver._request_cache()["purchase_order"]
+		purchase_orders = {po for po in purchase_orders if po}
+
+		missing = [po for po in purchase_orders if po not in local_cache]
+		if missing:
+			rows = frappe.get_all(
+				"Purchase Order",
+				filters={"name": ["in", missing]},
+				fields=["name", "purchase_category"],
+			)
+			for po in missing:
+				local_cache[po] = None
+			for row in rows:
+				local_cache[row.name] = row.purchase_category
+
+		return {po: local_cache[po] for po in purchase_orders if local_cache.get(po)}
+
+
+def get_cached_categories(suppliers):
+	"""
+	Read the shared categories of several suppliers with one HMGET
+
+	Values are stored pickled by RedisWrapper.hset, under the site-scoped key.
+
+	Returns:
+		list: Category or None, in the order of `suppliers`
+	"""
+	cache = frappe.cache()
+	values = cache.hmget(cache.make_key(SUPPLIER_CACHE_KEY), suppliers)
+	return [pickle.loads(value) if value is not None else None for value in values]
+
+
+def invalidate_supplier_category(doc, method=None):
+	"""Drop the cached category of a Supplier when it changes"""
+	frappe.cache().hdel(SUPPLIER_CACHE_KEY, doc.name)
+	PurchaseCategoryResolver._request_cache()["supplier"].pop(doc.name, None)
+
+
+def invalidate_supplier_group_categories(doc, method=None):
+	"""Drop every cached supplier category when a Supplier Group changes"""
+	frappe.cache().delete_value(SUPPLIER_CACHE_KEY)
+	PurchaseCategoryResolver._request_cache()["supplier"].clear()
@@ -0,0 +1,480 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Serial and batch provenance module for E Mart app
+Maintains the Serial Provenance table (purchase category, first inbound
+voucher, last movement and current warehouse per serial or batch number) on
+bundle submit and cancel, and resolves purchase categories from it, falling
+back to one windowed query per kind over Serial and Batch Entry
+"""
+
+import frappe
+from frappe import _
+from frappe.desk.reportview import get_match_cond
+from frappe.utils import cint, get_datetime
+
+LOOKUP_CHUNK_SIZE = 1000
+REBUILD_CHUNK_SIZE = 1000
+TRACE_HISTORY_LIMIT = 50
+FIELDS = ("serial_no", "batch_no")
+
+# Provenance key prefix and type of each lookup field
+KEY_PREFIXES = {"serial_no": "SN", "batch_no": "BN"}
+PROVENANCE_TYPES = {"serial_no": "Serial No", "batch_no": "Batch No"}
+
+PROVENANCE_FIELDS = [
+	"provenance_key",
+	"provenance_type",
+	"serial_no",
+	"batch_no",
+	"item_code",
+	"purchase_category",
+	"warehouse",
+	"first_voucher_type",
+	"first_voucher_no",
+	"first_inbound",
+	"last_voucher_type",
+	"last_voucher_no",
+	"last_bundle",
+	"last_transaction",
+	"last_movement",
+]
+
+
+class ProvenanceResolver:
+	"""Batched purchase category lookups for serial and batch numbers"""
+
+	@staticmethod
+	def get_latest(field, values, exclude_parent=None):
+		"""
+		Purchase category of the latest Serial and Batch Entry of each value
+
+		Values with a categorised Serial Provenance row are answered from it;
+		only the rest are looked up in Serial and Batch Entry.
+
+		Args:
+			field (str): "serial_no" or "batch_no"
+			values (iterable): Serial or batch numbers
+			exclude_parent (str): Bundle whose entries are ignored
+
+		Returns:
+			dict: {value: purchase category}; values without entries are absent
+		"""
+		if field not in FIELDS:
+			frappe.throw(f"Cannot resolve provenance by {field}")
+
+		values = {value for value in values if value}
+		latest = {
+			value: row.purchase_category
+			for value, row in ProvenanceStore.get_many(field, values).items()
+			if row.purchase_category and row.last_bundle != exclude_parent
+		}
+
+		values = sorted(values - set(latest))
+		for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+			rows = frappe.db.sql(
+				f"""
+				SELECT `{field}`, purchase_category
+				FROM (
+					SELECT `{field}`, purchase_category,
+						ROW_NUMBER() OVER (PARTITION BY `{field}` ORDER BY creation DESC) AS rn
+					FROM `tabSerial and Batch Entry`
+					WHERE `{field}` IN %(values)s AND parent != %(parent)s
+				) ranked
+				WHERE rn = 1
+			""",
+				{"values": tuple(values[start : start + LOOKUP_CHUNK_SIZE]), "parent": exclude_parent or ""},
+			)
+			latest.update(rows)
+		return latest
+
+	@staticmethod
+	def resolve(entries, exclude_parent=None):
+		"""
+		Purchase category of each entry from earlier entries of its serial, else its batch
+
+		Serials are resolved first and batches only for the entries still
+		without a category, so at most two windowed queries are needed.
+
+		Args:
+			entries (list): Rows with name, serial_no and batch_no
+			exclude_parent (str): Bundle whose entries are ignored
+
+		Returns:
+			dict: {entry name: purchase category}
+		"""
+		by_serial = ProvenanceResolver.get_latest(
+			"serial_no", [entry.serial_no for entry in entries if entry.serial_no], exclude_parent
+		)
+		categories = {
+			entry.name: by_serial[entry.serial_no]
+			for entry in entries
+			if entry.serial_no and by_serial.get(entry.serial_no)
+		}
+
+		unresolved = [entry for entry in entries if entry.name not in categories and entry.batch_no]
+		if unresolved:
+			by_batch = ProvenanceResolver.get_latest(
+				"batch_no", [entry.batch_no for entry in unresolved], exclude_parent
+			)
+			for entry in unresolved:
+				if by_batch.get(entry.batch_no):
+					categories[entry.name] = by_batch[entry.batch_no]
+
+		return categories
+
+
+class ProvenanceStore:
+	"""Serial Provenance rows, keyed by serial or batch number"""
+
+	@staticmethod
+	def get_key(field, value):
+		"""Name of the Serial Provenance row of a serial or batch number"""
+		return f"{KEY_PREFIXES[field]}:{value}"
+
+	@staticmethod
+	def get(serial_no=None, batch_no=None):
+		"""
+		Provenance of one serial or batch number, read by primary key
+
+		Returns:
+			frappe._dict: Serial Provenance values, or None
+		"""
+		field, value = ("serial_no", serial_no) if serial_no else ("batch_no", batch_no)
+		if not value:
+			return None
+		return frappe.db.get_value(
+			"Serial Provenance", ProvenanceStore.get_key(field, value), PROVENANCE_FIELDS, as_dict=True
+		)
+
+	@staticmethod
+	def get_many(field, values):
+		"""
+		Provenance of many serial or batch numbers, one primary key query per chunk
+
+		Returns:
+			dict: {value: frappe._dict}
+		"""
+		values = sorted({value for value in values if value})
+		rows = {}
+		for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+			keys = [
+				ProvenanceStore.get_key(field, value) for value in values[start : start + LOOKUP_CHUNK_SIZE]
+			]
+			for row in frappe.get_all(
+				"Serial Provenance", filters={"name": ["in", keys]}, fields=PROVENANCE_FIELDS
+			):
+				rows[row[field]] = row
+		return rows
+
+	@staticmethod
+	def write(rows):
+		"""
+		Insert or update Serial Provenance rows with one upsert
+
+		Rows are written in key order with INSERT ... ON DUPLICATE KEY UPDATE,
+		so concurrent bundles moving the same batch update its row in place
+		instead of deleting and re-inserting it under gap locks.
+		"""
+		if not rows:
+			return
+
+		timestamp = get_datetime()
+		user = frappe.session.user
+		columns = ["name", "owner", "modified_by", "creation", "modified", "docstatus", *PROVENANCE_FIELDS]
+		meta = [user, user, timestamp, timestamp, 0]
+		values = [
+			[row["provenance_key"], *meta, *(row.get(field) for field in PROVENANCE_FIELDS)]
+			for row in sorted(rows, key=lambda row: row["provenance_key"])
+		]
+		update_fields = ["modified", "modified_by", *PROVENANCE_FIELDS[1:]]
+
+		if frappe.db.db_type == "postgres":
+			on_conflict = "ON CONFLICT (name) DO UPDATE SET " + ", ".join(
+				f"{field} = EXCLUDED.{field}" for field in update_fields
+			)
+		else:
+			on_conflict = "ON DUPLICATE KEY UPDATE " + ", ".join(
+				f"`{field}` = VALUES(`{field}`)" for field in update_fields
+			)
+
+		placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(values))
+		frappe.db.sql(
+			f"""
+			INSERT INTO `tabSerial Provenance` ({", ".join(f"`{column}`" for column in columns)})
+			VALUES {placeholders}
+			{on_conflict}
+		""",
+			[value for row in values for value in row],
+		)
+
+	@staticmethod
+	def delete(keys):
+		"""Delete Serial Provenance rows"""
+		if keys:
+			frappe.db.sql("DELETE FROM `tabSerial Provenance` WHERE name IN %s", (tuple(keys),))
+
+	@staticmethod
+	def record_bundle(doc):
+		"""
+		Apply a submitted bundle to the provenance of its serials and batches
+
+		Existing rows are read with one query per kind and upserted in bulk.
+		A backdated bundle does not replace a later last movement.
+
+		Args:
+			doc: Serial and Batch Bundle document
+		"""
+		moved_at = get_datetime(f"{doc.posting_date} {doc.posting_time or '00:00:00'}")
+		inward = doc.type_of_transaction == "Inward"
+
+		rows = {}
+		for field in FIELDS:
+			values = {entry.get(field) for entry in doc.entries if entry.get(field)}
+			if not values:
+				continue
+
+			existing = ProvenanceStore.get_many(field, values)
+			for entry in doc.entries:
+				value = entry.get(field)
+				key = value and ProvenanceStore.get_key(field, value)
+				if not value or key in rows:
+					continue
+
+				row = dict(existing.get(value) or {})
+				row.update(
+					{
+						"provenance_key": key,
+						"provenance_type": PROVENANCE_TYPES[field],
+						field: value,
+						"item_code": doc.item_code,
+						"purchase_category": entry.purchase_category or row.get("purchase_category"),
+					}
+				)
+				if field == "serial_no" and entry.batch_no:
+					row["batch_no"] = entry.batch_no
+
+				if inward and (not row.get("first_inbound") or moved_at < get_datetime(row["first_inbound"])):
+					row.update(
+						{
+							"first_voucher_type": doc.voucher_type,
+							"first_voucher_no": doc.voucher_no,
+							"first_inbound": moved_at,
+						}
+					)
+
+				if not row.get("last_movement") or moved_at >= get_datetime(row["last_movement"]):
+					row.update(
+						{
+							"last_voucher_type": doc.voucher_type,
+							"last_voucher_no": doc.voucher_no,
+							"last_bundle": doc.name,
+							"last_transaction": doc.type_of_transaction,
+							"last_movement": moved_at,
+							# A serial that went out is in no warehouse; a batch keeps its last one
+							"warehouse": None
+							if field == "serial_no" and not inward
+							else entry.get("warehouse") or doc.warehouse,
+						}
+					)
+				rows[key] = row
+
+		ProvenanceStore.write(list(rows.values()))
+
+	@staticmethod
+	def rebuild_values(field, values):
+		"""
+		Recompute the provenance of serial or batch numbers from the submitted bundles
+
+		Two window functions pick the first inbound and the last movement of
+		every value in a single query; values without movements lose their row.
+
+		Args:
+			field (str): "serial_no" or "batch_no"
+			values (list): Serial or batch numbers, at most LOOKUP_CHUNK_SIZE
+
+		Returns:
+			int: Rows written
+		"""
+		if not values:
+			return 0
+
+		movements = frappe.db.sql(
+			f"""
+			SELECT * FROM (
+				SELECT e.`{field}` AS value, e.batch_no, e.purchase_category,
+					COALESCE(e.warehouse, b.warehouse) AS warehouse,
+					b.name AS bundle, b.item_code, b.voucher_type, b.voucher_no,
+					b.type_of_transaction, b.posting_date, b.posting_time,
+					ROW_NUMBER() OVER (
+						PARTITION BY e.`{field}`
+						ORDER BY CASE WHEN b.type_of_transaction = 'Inward' THEN 0 ELSE 1 END,
+							b.posting_date, b.posting_time, e.creation
+					) AS first_rank,
+					ROW_NUMBER() OVER (
+						PARTITION BY e.`{field}`
+						ORDER BY b.posting_date DESC, b.posting_time DESC, e.creation DESC
+					) AS last_rank
+				FROM `tabSerial and Batch Entry` e
+				INNER JOIN `tabSerial and Batch Bundle` b ON b.name = e.parent
+				WHERE e.`{field}` IN %(values)s AND b.docstatus = 1 AND b.is_cancelled = 0
+			) ranked
+			WHERE first_rank = 1 OR last_rank = 1
+		""",
+			{"values": tuple(values)},
+			as_dict=True,
+		)
+
+		first, last = {}, {}
+		for row in movements:
+			if row.first_rank == 1:
+				first[row.value] = row
+			if row.last_rank == 1:
+				last[row.value] = row
+
+		rows = []
+		for value, latest in last.items():
+			earliest = first[value]
+			inward = earliest.type_of_transaction == "Inward"
+			rows.append(
+				{
+					"provenance_key": ProvenanceStore.get_key(field, value),
+					"provenance_type": PROVENANCE_TYPES[field],
+					field: value,
+					"batch_no": latest.batch_no,
+					"item_code": latest.item_code,
+					"purchase_category": latest.purchase_category or earliest.purchase_category,
+					"first_voucher_type": earliest.voucher_type if inward else None,
+					"first_voucher_no": earliest.voucher_no if inward else None,
+					"first_inbound": get_datetime(f"{earliest.posting_date} {earliest.posting_time}")
+					if inward
+					else None,
+					"last_voucher_type": latest.voucher_type,
+					"last_voucher_no": latest.voucher_no,
+					"last_bundle": latest.bundle,
+					"last_transaction": latest.type_of_transaction,
+					"last_movement": get_datetime(f"{latest.posting_date} {latest.posting_time}"),
+					"warehouse": None
+					if field == "serial_no" and latest.type_of_transaction != "Inward"
+					else latest.warehouse,
+				}
+			)
+
+		ProvenanceStore.delete(
+			[ProvenanceStore.get_key(field, value) for value in values if value not in last]
+		)
+		ProvenanceStore.write(rows)
+		return len(rows)
+
+	@staticmethod
+	def rebuild(chunk_size=REBUILD_CHUNK_SIZE):
+		"""
+		Rebuild the whole table
+
+		Serial and batch numbers are walked in keyset chunks over the
+		(serial_no, creation) and (batch_no, creation) indexes, and every chunk
+		is committed on its own.
+
+		Returns:
+			int: Rows written
+		"""
+		frappe.db.sql("DELETE FROM `tabSerial Provenance`")
+		frappe.db.commit()
+
+		written = 0
+		for field in FIELDS:
+			after = ""
+			while True:
+				values = frappe.db.sql_list(
+					f"""
+					SELECT DISTINCT `{field}` FROM `tabSerial and Batch Entry`
+					WHERE `{field}` > %(after)s
+					ORDER BY `{field}`
+					LIMIT %(limit)s
+				""",
+					{"after": after, "limit": cint(chunk_size)},
+				)
+				if not values:
+					break
+
+				written += ProvenanceStore.rebuild_values(field, values)
+				frappe.db.commit()
+				after = values[-1]
+
+		return written
+
+
+def update_provenance_on_submit(doc, method=None):
+	"""Serial and Batch Bundle on_submit hook"""
+	ProvenanceStore.record_bundle(doc)
+
+
+def update_provenance_on_cancel(doc, method=None):
+	"""
+	Serial and Batch Bundle on_cancel hook
+
+	The bundle is already saved as cancelled, so recomputing its serials and
+	batches from the submitted bundles drops its movement.
+	"""
+	for field in FIELDS:
+		values = sorted({entry.get(field) for entry in doc.entries if entry.get(field)})
+		for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+			ProvenanceStore.rebuild_values(field, values[start : start + LOOKUP_CHUNK_SIZE])
+
+
+def rebuild_serial_provenance():
+	"""Background job rebuilding the Serial Provenance table"""
+	return ProvenanceStore.rebuild()
+
+
+@frappe.whitelist()
+def trace_serial(serial_no=None, batch_no=None, with_history=0):
+	"""
+	Trace a serial or batch number for warranty and buyback desks
+
+	Needs read access to the Serial No or Batch No; the history only lists
+	bundles the user's permissions on warehouse and company allow.
+
+	Args:
+		serial_no (str): Serial number
+		batch_no (str): Batch number, when no serial number is given
+		with_history (int): Also return the latest movements
+
+	Returns:
+		dict: Provenance and optionally the movement history
+	"""
+	frappe.has_permission("Serial and Batch Bundle", "read", throw=True)
+	if not (serial_no or batch_no):
+		frappe.throw(_("Serial No or Batch No is required"))
+
+	field, value = ("serial_no", serial_no) if serial_no else ("batch_no", batch_no)
+	doctype = PROVENANCE_TYPES[field]
+	frappe.has_permission(
+		doctype, "read", doc=value if frappe.db.exists(doctype, value) else None, throw=True
+	)
+
+	provenance = ProvenanceStore.get(serial_no=serial_no, batch_no=batch_no)
+	result = {"status": "success", "data": {"provenance": provenance}}
+
+	if cint(with_history):
+		# No alias on the bundle table, get_match_cond refers to it by table name
+		result["data"]["history"] = frappe.db.sql(
+			f"""
+			SELECT `tabSerial and Batch Bundle`.name AS bundle, `tabSerial and Batch Bundle`.voucher_type,
+				`tabSerial and Batch Bundle`.voucher_no, `tabSerial and Batch Bundle`.type_of_transaction,
+				`tabSerial and Batch Bundle`.posting_date, `tabSerial and Batch Bundle`.posting_time,
+				COALESCE(e.warehouse, `tabSerial and Batch Bundle`.warehouse) AS warehouse,
+				e.qty, e.purchase_category
+			FROM `tabSerial and Batch Entry` e
+			INNER JOIN `tabSerial and Batch Bundle` ON `tabSerial and Batch Bundle`.name = e.parent
+			WHERE e.`{field}` = %(value)s AND `tabSerial and Batch Bundle`.docstatus = 1
+				AND `tabSerial and Batch Bundle`.is_cancelled = 0{get_match_cond("Serial and Batch Bundle")}
+			ORDER BY e.creation DESC
+			LIMIT %(limit)s
+		""",
+			{"value": value, "limit": TRACE_HISTORY_LIMIT},
+			as_dict=True,
+		)
+
+	return result
@@ -0,0 +1,228 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Series allocation module for E Mart app
+Hands out purchase series numbers with a single atomic increment per
+allocation, optionally leasing blocks of numbers to each worker process
+"""
+
+import atexit
+import threading
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+# Per-process leases: {(site, mapping_name): {"next": int, "end": int, "epoch": int}}
+_leases = {}
+_lock = threading.Lock()
+
+# Reservation connections, one per thread and site: {site: Database}
+_connections = threading.local()
+
+
+class SeriesAllocator:
+	"""Atomic, lease-based allocator for Purchase Series Mapping counters"""
+
+	@staticmethod
+	def allocate(purchase_category):
+		"""
+		Allocate the next series number for a purchase category
+
+		Args:
+			purchase_category (str): "Normal" or "Special"
+
+		Returns:
+			tuple: (number, mapping) where mapping is the series mapping row
+		"""
+		mapping = SeriesAllocator.get_mapping(purchase_category)
+		if not mapping:
+			frappe.throw(_("No series mapping found for category: {0}").format(purchase_category))
+
+		lease_size = max(cint(mapping.series_lease_size), 1)
+		if lease_size == 1:
+			return SeriesAllocator._reserve(mapping.name, 1), mapping
+
+		key = (frappe.local.site, mapping.name)
+		epoch = SeriesAllocator.get_epoch(mapping.name)
+
+		with _lock:
+			lease = _leases.get(key)
+			if not lease or lease["epoch"] != epoch or lease["next"] > lease["end"]:
+				start = SeriesAllocator._reserve(mapping.name, lease_size)
+				lease = {"next": start, "end": start + lease_size - 1, "epoch": epoch}
+				_leases[key] = lease
+
+			number = lease["next"]
+			lease["next"] += 1
+
+		return number, mapping
+
+	@staticmethod
+	def get_mapping(purchase_category):
+		"""
+		Get the series mapping row for a purchase category
+
+		Args:
+			purchase_category (str): "Normal" or "Special"
+
+		Returns:
+			dict: Mapping row or None
+		"""
+		return frappe.db.get_value(
+			"Purchase Series Mapping",
+			{"purchase_category": purchase_category},
+			["name", "series_prefix", "series_current", "series_format", "series_lease_size"],
+			as_dict=True,
+		)
+
+	@staticmethod
+	def _reserve(mapping_name, count):
+		"""
+		Atomically advance the mapping counter by `count`
+
+		The counter is bumped in a single UPDATE so concurrent workers can never
+		read the same value. The UPDATE runs and commits on a reservation
+		connection of its own, so the row lock is released at once and the
+		caller's transaction, e.g. a Purchase Invoice being submitted, is
+		neither committed early nor able to roll the reservation back. The
+		connection is kept open for the thread, so only the first reservation
+		pays for connecting.
+
+		Args:
+			mapping_name (str): Name of the series mapping row
+			count (int): Number of series numbers to reserve
+
+		Returns:
+			int: First number of the reserved block
+		"""
+		try:
+			result = SeriesAllocator._increment(SeriesAllocator._get_connection(), mapping_name, count)
+		except Exception:
+			# The kept connection may have been dropped by the server; the
+			# failed transaction was not committed, so retry once on a new one
+			SeriesAllocator._close_connection()
+			result = SeriesAllocator._increment(SeriesAllocator._get_connection(), mapping_name, count)
+
+		if not result or not result[0][0]:
+			frappe.throw(_("Series mapping {0} could not be reserved").format(mapping_name))
+
+		return cint(result[0][0]) - count
+
+	@staticmethod
+	def _increment(db, mapping_name, count):
+		"""
+		Bump the counter and commit on the reservation connection
+
+		Returns:
+			tuple: ((new series_current,),), or empty when no mapping row matched
+		"""
+		try:
+			if frappe.db.db_type == "postgres":
+				result = db.sql(
+					"""
+					UPDATE `tabPurchase Series Mapping`
+					SET series_current = series_current + %s
+					WHERE name = %s
+					RETURNING series_current
+				""",
+					(count, mapping_name),
+				)
+			else:
+				db.sql(
+					"""
+					UPDATE `tabPurchase Series Mapping`
+					SET series_current = LAST_INSERT_ID(series_current + %s)
+					WHERE name = %s
+				""",
+					(count, mapping_name),
+				)
+				# LAST_INSERT_ID() keeps the connection's previous value when no row
+				# matched, e.g. for an unknown mapping, so the row count is checked too
+				value, matched = db.sql("SELECT LAST_INSERT_ID(), ROW_COUNT()")[0]
+				result = ((value,),) if matched else ()
+			db.commit()
+			return result
+		except Exception:
+			db.rollback()
+			raise
+
+	@staticmethod
+	def _get_connection():
+		"""Reservation connection of this thread to the site database, separate from `frappe.db`"""
+		from frappe.database import get_db
+
+		site = frappe.local.site
+		connections = _connections.__dict__.setdefault("by_site", {})
+		if site not in connections:
+			conf = frappe.local.conf
+			connections[site] = get_db(
+				socket=conf.db_socket,
+				host=conf.db_host,
+				port=conf.db_port,
+				user=conf.db_user or conf.db_name,
+				password=conf.db_password,
+				cur_db_name=conf.db_name,
+			)
+		return connections[site]
+
+	@staticmethod
+	def _close_connection():
+		"""Close and forget this thread's reservation connection of the current site"""
+		db = _connections.__dict__.get("by_site", {}).pop(frappe.local.site, None)
+		if db:
+			try:
+				db.close()
+			except Exception:
+				pass
+
+	@staticmethod
+	def get_epoch(mapping_name):
+		"""Get the lease epoch of a mapping, bumped whenever its series is reset"""
+		return cint(frappe.cache().get_value(f"e_mart_series_epoch:{mapping_name}"))
+
+	@staticmethod
+	def invalidate_leases(mapping_name):
+		"""
+		Invalidate leases held by every worker for a mapping
+
+		Args:
+			mapping_name (str): Name of the series mapping row
+		"""
+		frappe.cache().set_value(
+			f"e_mart_series_epoch:{mapping_name}", SeriesAllocator.get_epoch(mapping_name) + 1
+		)
+		with _lock:
+			_leases.pop((frappe.local.site, mapping_name), None)
+
+	@staticmethod
+	def release_leases():
+		"""
+		Give unused lease numbers back to the counter
+
+		A block is only handed back when nobody has reserved past it, so this
+		never creates duplicates; otherwise the unused tail stays as a gap.
+		"""
+		with _lock:
+			leases = [(key, lease) for key, lease in _leases.items() if lease["next"] <= lease["end"]]
+			_leases.clear()
+
+		for (site, mapping_name), lease in leases:
+			if getattr(frappe.local, "site", None) != site or not getattr(frappe.local, "db", None):
+				continue
+			try:
+				frappe.db.sql(
+					"""
+					UPDATE `tabPurchase Series Mapping`
+					SET series_current = %s
+					WHERE name = %s AND series_current = %s
+				""",
+					(lease["next"], mapping_name, lease["end"] + 1),
+				)
+				frappe.db.commit()
+			except Exception as e:
+				frappe.logger().warning(f"Series lease release failed for {mapping_name}: {e!s}")
+
+
+atexit.register(SeriesAllocator.release_leases)
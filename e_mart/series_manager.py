@@ -13,6 +13,9 @@ import frappe
 from frappe import _
 from frappe.utils import getdate, now_datetime
 
+from e_mart.purchase_category import PurchaseCategoryResolver
+from e_mart.series_allocator import SeriesAllocator
+
 
 class SeriesManager:
 	"""Manages automatic series generation for purchases"""
@@ -30,26 +33,11 @@ class SeriesManager:
 			str: Next series number
 		"""
 		try:
-			# Get series mapping for the category
-			series_mapping = frappe.get_all(
-				"Purchase Series Mapping",
-				filters={"purchase_category": purchase_category},
-				fields=["*"],
-				limit=1,
-			)
-
-			if not series_mapping:
-				frappe.throw(_("No series mapping found for category: {0}").format(purchase_category))
-
-			mapping = series_mapping[0]
+			# Atomically allocate the next number (possibly from this worker's lease)
+			number, mapping = SeriesAllocator.allocate(purchase_category)
 
-			# Generate next series number
-			next_series = SeriesManager._generate_series_number(mapping)
-
-			# Update current series number
-			SeriesManager._update_series_number(mapping.name, mapping.series_current + 1)
-
-			return next_series
+			# Generate series number from the allocated number
+			return SeriesManager._generate_series_number(mapping, number)
 
 		except frappe.exceptions.DoesNotExistError as e:
 			frappe.log_error(f"Series mapping not found: {e!s}", "Series Manager Error")
@@ -62,18 +50,19 @@ class SeriesManager:
 			frappe.throw(_("An unexpected error occurred while generating series number: {0}").format(str(e)))
 
 	@staticmethod
-	def _generate_series_number(mapping):
+	def _generate_series_number(mapping, number=None):
 		"""
 		Generate series number based on mapping configuration
 
 		Args:
 			mapping (dict): Series mapping configuration
+			number (int): Allocated number (defaults to the mapping's current number)
 
 		Returns:
 			str: Generated series number
 		"""
 		prefix = mapping.get("series_prefix", "")
-		current_num = mapping.get("series_current", 1)
+		current_num = number if number is not None else mapping.get("series_current", 1)
 		series_format = mapping.get("series_format", "YYYYMMDD-####")
 
 		# Generate number part based on format
@@ -122,21 +111,6 @@ class SeriesManager:
 			# Default format
 			return f"{number:04d}"
 
-	@staticmethod
-	def _update_series_number(mapping_name, new_number):
-		"""
-		Update the current series number in the mapping
-
-		Args:
-			mapping_name (str): Name of the series mapping
-			new_number (int): New current number
-		"""
-		try:
-			frappe.db.set_value("Purchase Series Mapping", mapping_name, "series_current", new_number)
-			frappe.db.commit()
-		except Exception as e:
-			frappe.log_error(f"Failed to update series number: {e!s}", "Series Manager Error")
-
 	@staticmethod
 	def reset_series(purchase_category, new_start_number=1):
 		"""
@@ -159,6 +133,8 @@ class SeriesManager:
 					"Purchase Series Mapping", series_mapping[0].name, "series_current", new_start_number
 				)
 				frappe.db.commit()
+				# Drop numbers leased by workers before the reset
+				SeriesAllocator.invalidate_leases(series_mapping[0].name)
 				frappe.msgprint(_("Series reset successfully for {0}").format(purchase_category))
 			else:
 				frappe.throw(_("No series mapping found for category: {0}").format(purchase_category))
@@ -250,8 +226,7 @@ class PurchaseSeriesHandler:
 
 		# Check for special supplier indicators
 		if hasattr(doc, "supplier") and doc.supplier:
-			supplier_group = frappe.db.get_value("Supplier", doc.supplier, "supplier_group")
-			if supplier_group and "special" in supplier_group.lower():
+			if PurchaseCategoryResolver.get_supplier_category(doc.supplier) == "Special":
 				return "Special"
 
 		# Default to normal
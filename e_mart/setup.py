@@ -5,6 +5,8 @@ import frappe
 from frappe import _
 from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 
+from e_mart.archival import LogArchiver
+
 
 def after_install():
 	create_custom_fields(get_purchase_order_custom_fields(), ignore_validate=True, update=True)
@@ -24,6 +26,7 @@ def after_install():
 	create_custom_fields(get_sales_team_custom_fields(), ignore_validate=True, update=True)
 
 	create_property_setters(get_property_setters())
+	LogArchiver.ensure_tombstone_table()
 
 
 def after_migrate():
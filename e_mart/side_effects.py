@@ -0,0 +1,268 @@
+# Copyright (c) 2025, efeone and Contributors
+# See license.txt
+
+"""
+Invoice side effect pipeline for E Mart app
+Runs Sales Invoice submit side effects as idempotent background jobs after
+the submit has been committed, with retries and a per-invoice status record
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, flt, now_datetime
+
+from e_mart.e_mart.doctype.e_mart_settings.e_mart_settings import SettingsCache
+
+MAX_ATTEMPTS = 5
+STALE_MINUTES = 30
+
+_HANDLERS = "e_mart.e_mart.custom_scripts.sales_invoice.sales_invoice"
+
+# {effect: (handler path, predicate telling whether the invoice needs it)}
+EFFECTS = {
+	"Scrap Stock Entry": (
+		f"{_HANDLERS}.create_scrap_stock_entry",
+		lambda doc: bool(doc.get("buyback_items")),
+	),
+	"Buyback Journal Entry": (
+		f"{_HANDLERS}.create_buyback_journal_entry",
+		lambda doc: bool(doc.get("is_buyback")) and flt(doc.get("buyback_amount")) > 0,
+	),
+	"Demo Tasks": (
+		f"{_HANDLERS}.create_demo_tasks_on_submit",
+		lambda doc: any(item.get("is_demo_reqd") for item in doc.items),
+	),
+	"Commission Log": (f"{_HANDLERS}.update_monthly_commission_log", lambda doc: bool(doc.get("sales_team"))),
+}
+
+
+class InvoiceSideEffects:
+	"""Deferred, idempotent Sales Invoice side effects"""
+
+	@staticmethod
+	def get_job_key(sales_invoice, effect):
+		"""Idempotency key of one side effect of an invoice"""
+		return f"{sales_invoice}::{frappe.scrub(effect)}"
+
+	@staticmethod
+	def validate_settings(doc):
+		"""
+		Check the settings the side effects need while the user can still act on it
+
+		Args:
+			doc: Sales Invoice document
+		"""
+		if doc.get("buyback_items") and not SettingsCache.get("scrap_warehouse"):
+			frappe.throw(_("Please set the Scrap Warehouse in E-mart Settings."))
+
+		if EFFECTS["Buyback Journal Entry"][1](doc) and not SettingsCache.get("buyback_posting_account"):
+			frappe.throw(_("Please set 'Buyback Posting Account' in E-mart Settings."))
+
+	@staticmethod
+	def enqueue(doc):
+		"""
+		Record and enqueue every side effect an invoice needs
+
+		Jobs are enqueued after the submit commits, so they never see an
+		uncommitted invoice and a rolled back submit enqueues nothing.
+
+		Args:
+			doc: Sales Invoice document
+
+		Returns:
+			list: Job keys
+		"""
+		job_keys = []
+		for effect, (_handler, applies) in EFFECTS.items():
+			if not applies(doc):
+				continue
+
+			job_key = InvoiceSideEffects.get_job_key(doc.name, effect)
+			if not frappe.db.exists("Invoice Side Effect Log", job_key):
+				frappe.get_doc(
+					{
+						"doctype": "Invoice Side Effect Log",
+						"job_key": job_key,
+						"sales_invoice": doc.name,
+						"effect": effect,
+						"status": "Queued",
+					}
+				).insert(ignore_permissions=True)
+
+			InvoiceSideEffects.enqueue_job(job_key)
+			job_keys.append(job_key)
+
+		return job_keys
+
+	@staticmethod
+	def enqueue_job(job_key):
+		"""
+		Enqueue a side effect job, deduplicated by its key
+
+		The job is always enqueued after the current transaction commits, also
+		in tests, so an effect never runs inside the invoice's own on_submit.
+		"""
+		frappe.enqueue(
+			"e_mart.side_effects.run_side_effect",
+			queue="short",
+			job_id=job_key,
+			deduplicate=True,
+			enqueue_after_commit=True,
+			job_key=job_key,
+		)
+
+	@staticmethod
+	def run(job_key, commit=False):
+		"""
+		Run one side effect
+
+		The status row is locked for the whole job, and the artifacts and the
+		"Completed" status are written in the same transaction, so an effect
+		can never be applied twice even if the job is delivered more than once.
+		A failing effect is rolled back to a savepoint, so the rest of the
+		transaction survives and the "Failed" status is kept.
+
+		Args:
+			job_key (str): Invoice Side Effect Log name
+			commit (bool): Commit the outcome; only the job entry points do
+
+		Returns:
+			str: Final status
+		"""
+		log = frappe.db.get_value(
+			"Invoice Side Effect Log",
+			job_key,
+			["name", "sales_invoice", "effect", "status", "attempts"],
+			as_dict=True,
+			for_update=True,
+		)
+		if not log or log.status in ("Completed", "Skipped"):
+			return log.status if log else None
+
+		attempts = cint(log.attempts) + 1
+		doc = frappe.get_doc("Sales Invoice", log.sales_invoice)
+		if doc.docstatus != 1:
+			status, error = "Skipped", _("Sales Invoice is not submitted")
+		else:
+			frappe.db.savepoint("invoice_side_effect")
+			try:
+				frappe.get_attr(EFFECTS[log.effect][0])(doc, "on_submit")
+				status, error = "Completed", None
+			except Exception as e:
+				frappe.db.rollback(save_point="invoice_side_effect")
+				frappe.clear_messages()
+				status, error = "Failed", str(e)
+				frappe.log_error(
+					f"{log.effect} for Sales Invoice {log.sales_invoice} failed (attempt {attempts}): {e!s}",
+					"E Mart Invoice Side Effect Error",
+				)
+
+		InvoiceSideEffects.set_status(job_key, status, attempts, error)
+		if commit:
+			frappe.db.commit()
+		return status
+
+	@staticmethod
+	def set_status(job_key, status, attempts, error=None):
+		"""Update the status row of a side effect"""
+		frappe.db.set_value(
+			"Invoice Side Effect Log",
+			job_key,
+			{"status": status, "attempts": attempts, "last_attempt": now_datetime(), "error": error},
+			update_modified=True,
+		)
+
+	@staticmethod
+	def get_pending(include_exhausted=False):
+		"""
+		Get side effects that need to be run again
+
+		Failed effects are retried with exponential backoff until MAX_ATTEMPTS;
+		effects queued for longer than STALE_MINUTES lost their job and are
+		enqueued again.
+
+		Args:
+			include_exhausted (bool): Also return failures past MAX_ATTEMPTS
+
+		Returns:
+			list: Job keys
+		"""
+		now = now_datetime()
+		failed = frappe.get_all(
+			"Invoice Side Effect Log",
+			filters={"status": "Failed"},
+			fields=["name", "attempts", "last_attempt"],
+		)
+		pending = [
+			row.name
+			for row in failed
+			if include_exhausted
+			or (
+				cint(row.attempts) < MAX_ATTEMPTS
+				and (
+					not row.last_attempt
+					or add_to_date(row.last_attempt, minutes=2 ** cint(row.attempts), as_datetime=True) <= now
+				)
+			)
+		]
+
+		pending += frappe.get_all(
+			"Invoice Side Effect Log",
+			filters={
+				"status": "Queued",
+				"modified": ["<", add_to_date(now, minutes=-STALE_MINUTES, as_datetime=True)],
+			},
+			pluck="name",
+		)
+		return pending
+
+	@staticmethod
+	def reconcile(include_exhausted=False, run_now=False, commit=False):
+		"""
+		Re-run failed and stale side effects
+
+		Args:
+			include_exhausted (bool): Also retry failures past MAX_ATTEMPTS
+			run_now (bool): Run in the current process instead of enqueueing
+			commit (bool): Commit after every effect run now
+
+		Returns:
+			dict: {job_key: status} when run now, else {job_key: "Queued"}
+		"""
+		results = {}
+		for job_key in InvoiceSideEffects.get_pending(include_exhausted):
+			if run_now:
+				results[job_key] = InvoiceSideEffects.run(job_key, commit=commit)
+			else:
+				InvoiceSideEffects.enqueue_job(job_key)
+				results[job_key] = "Queued"
+		return results
+
+
+def enqueue_invoice_side_effects(doc, method=None):
+	"""Sales Invoice on_submit hook"""
+	InvoiceSideEffects.validate_settings(doc)
+	InvoiceSideEffects.enqueue(doc)
+
+
+def run_side_effect(job_key):
+	"""Background job entry point"""
+	return InvoiceSideEffects.run(job_key, commit=True)
+
+
+def retry_failed_side_effects():
+	"""Scheduler entry point retrying failed side effects with backoff"""
+	InvoiceSideEffects.reconcile()
+	frappe.db.commit()
+
+
+@frappe.whitelist()
+def get_invoice_side_effects(sales_invoice):
+	"""Get the side effect status of a Sales Invoice"""
+	frappe.has_permission("Sales Invoice", "read", sales_invoice, throw=True)
+	return frappe.get_all(
+		"Invoice Side Effect Log",
+		filters={"sales_invoice": sales_invoice},
+		fields=["effect", "status", "attempts", "last_attempt", "error"],
+		order_by="creation asc",
+	)